@@ -0,0 +1,231 @@
+__all__ = ("ConnectionCache", "NegativeCache")
+
+import threading
+import time
+from typing import Dict, List, Optional
+
+from sjbillingclient.utils import QueryDict
+
+
+class ConnectionCache:
+    """
+    A thread-safe cache for values that are only valid for the lifetime of a billing
+    connection (billing config, feature support, ...).
+
+    Values are stored by key until :meth:`clear` is called, typically when the billing
+    service disconnects. Concurrent callers asking for a key that is still being fetched
+    share the in-flight request instead of issuing their own.
+
+    ::
+
+        cache = ConnectionCache()
+        cache.request("config", start_request, on_value, on_error)
+        cache.get_or_compute(("feature", name), compute)
+        cache.clear()
+    """
+
+    def __init__(self) -> None:
+        self.__lock = threading.Lock()
+        self.__values = {}
+        self.__pending = {}
+        self.__computing = {}
+        self.__generation = 0
+
+    def get(self, key, default=None):
+        """
+        Returns the cached value for `key`, or `default` if it is not cached.
+        """
+        with self.__lock:
+            return self.__values.get(key, default)
+
+    def __contains__(self, key) -> bool:
+        with self.__lock:
+            return key in self.__values
+
+    def invalidate(self, key) -> None:
+        """
+        Drops the cached value for `key`. An in-flight request for the key is not
+        affected and its result will still be delivered to its waiters.
+        """
+        with self.__lock:
+            self.__values.pop(key, None)
+
+    def clear(self) -> None:
+        """
+        Drops every cached value. Results of requests that were started before the
+        call are delivered to their waiters but not stored, and later callers do not
+        join those requests but issue a new one.
+        """
+        with self.__lock:
+            self.__values.clear()
+            self.__pending.clear()
+            self.__generation += 1
+
+    def request(self, key, start_request, callback, on_error) -> None:
+        """
+        Delivers the value for `key` to `callback`, fetching it asynchronously if needed.
+
+        If the value is cached, `callback` is invoked immediately. If a request for the
+        key is already in flight, `callback` is queued and invoked when it completes.
+        Otherwise `start_request(resolve)` is called to issue the request; it must call
+        ``resolve(value, cache=True)`` when the result is available. Calls after the
+        first are ignored.
+
+        If `start_request` raises, the exception propagates to the caller that issued
+        the request, and the callbacks that joined it in the meantime are invoked with
+        ``on_error(exception)`` instead; nothing is cached.
+
+        :param key: The cache key.
+        :param start_request: A callable issuing the request and taking the resolve
+            function as its only argument.
+        :param callback: A callable invoked with the value.
+        :param on_error: A callable converting the exception raised by `start_request`
+            into the value delivered to the joined callbacks.
+        :return: None
+        """
+        with self.__lock:
+            cached = key in self.__values
+            if cached:
+                value = self.__values[key]
+            elif key in self.__pending:
+                self.__pending[key].append(callback)
+                return
+            else:
+                waiters = self.__pending[key] = [callback]
+                generation = self.__generation
+        if cached:
+            callback(value)
+            return
+
+        def resolve(result, cache: bool = True) -> None:
+            nonlocal resolved
+            with self.__lock:
+                if resolved:
+                    return
+                resolved = True
+                # the entry is gone if `clear` was called while the request was in flight
+                if self.__pending.get(key) is waiters:
+                    del self.__pending[key]
+                if cache and generation == self.__generation:
+                    self.__values[key] = result
+            for waiter in waiters:
+                waiter(result)
+
+        resolved = False
+
+        try:
+            start_request(resolve)
+        except Exception as e:
+            with self.__lock:
+                if resolved:
+                    raise
+                resolved = True
+                if self.__pending.get(key) is waiters:
+                    del self.__pending[key]
+            error = on_error(e)
+            for waiter in waiters[1:]:
+                waiter(error)
+            raise
+
+    def get_or_compute(self, key, compute, cache_if=lambda value: True):
+        """
+        Returns the value for `key`, computing it synchronously if needed.
+
+        Concurrent callers for the same key wait for the first caller's computation
+        instead of computing it again.
+
+        :param key: The cache key.
+        :param compute: A callable taking no arguments and returning the value.
+        :param cache_if: A predicate deciding whether the computed value is stored.
+        :return: The cached or computed value.
+        """
+        while True:
+            with self.__lock:
+                if key in self.__values:
+                    return self.__values[key]
+                event = self.__computing.get(key)
+                if event is None:
+                    event = self.__computing[key] = threading.Event()
+                    generation = self.__generation
+                    break
+            event.wait()
+
+        try:
+            value = compute()
+            with self.__lock:
+                if cache_if(value) and generation == self.__generation:
+                    self.__values[key] = value
+            return value
+        finally:
+            with self.__lock:
+                self.__computing.pop(key, None)
+            event.set()
+
+
+class NegativeCache:
+    """
+    A thread-safe cache of keys known to be unavailable, each remembered for a TTL that
+    depends on the status code it was reported with.
+
+    ::
+
+        cache = NegativeCache({PRODUCT_NOT_FOUND: 6 * 3600}, default_ttl=300)
+        cache.add(("inapp", "old_sku"), PRODUCT_NOT_FOUND)
+        ("inapp", "old_sku") in cache  # True until the TTL expires
+    """
+
+    def __init__(self, ttls: Optional[Dict[int, float]] = None, default_ttl: float = 300.0) -> None:
+        """
+        :param ttls: Mapping of status code to the number of seconds a key reported with
+            that status is remembered.
+        :param default_ttl: The TTL of status codes missing from `ttls`.
+        """
+        self.ttls = dict(ttls or {})
+        self.default_ttl = default_ttl
+        self.__lock = threading.Lock()
+        self.__entries = {}
+
+    def add(self, key, status_code: int) -> None:
+        ttl = self.ttls.get(status_code, self.default_ttl)
+        with self.__lock:
+            self.__entries[key] = (status_code, time.monotonic() + ttl)
+
+    def __contains__(self, key) -> bool:
+        return self.get(key) is not None
+
+    def get(self, key) -> Optional[QueryDict]:
+        """
+        Returns the unexpired entry for `key` with its `key`, `status_code` and the
+        number of seconds until it expires (`expires_in`), or None.
+        """
+        now = time.monotonic()
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= now:
+                del self.__entries[key]
+                return None
+            return QueryDict(key=key, status_code=entry[0], expires_in=entry[1] - now)
+
+    def discard(self, key) -> None:
+        with self.__lock:
+            self.__entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self.__lock:
+            self.__entries.clear()
+
+    def entries(self) -> List[QueryDict]:
+        """
+        Returns the unexpired entries with their `key`, `status_code` and the number of
+        seconds until they expire (`expires_in`).
+        """
+        now = time.monotonic()
+        with self.__lock:
+            for key in [key for key, (_, expires_at) in self.__entries.items() if expires_at <= now]:
+                del self.__entries[key]
+            return [
+                QueryDict(key=key, status_code=status_code, expires_in=expires_at - now)
+                for key, (status_code, expires_at) in self.__entries.items()
+            ]
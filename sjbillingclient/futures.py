@@ -0,0 +1,161 @@
+__all__ = ("BillingTimeoutError", "DEFAULT_TIMEOUT", "callback_future", "gather")
+
+import heapq
+import itertools
+import threading
+import time
+import weakref
+from concurrent.futures import (
+    ALL_COMPLETED,
+    FIRST_EXCEPTION,
+    CancelledError,
+    Future,
+    InvalidStateError,
+    wait,
+)
+from typing import Iterable, List, Optional
+
+# Seconds a billing operation future waits for its listener before it times out.
+DEFAULT_TIMEOUT = 30.0
+
+
+class BillingTimeoutError(TimeoutError):
+    """
+    Set on a billing operation future whose listener did not fire before its deadline.
+    """
+
+
+class _DeadlineScheduler:
+    """
+    Times out futures from a single daemon thread instead of one timer thread per call.
+
+    Entries are not removed when their future completes early; they are skipped once
+    their deadline is reached. Futures are held weakly so a completed result (and the
+    Java objects in it) is not kept alive until the deadline.
+    """
+
+    def __init__(self) -> None:
+        self.__condition = threading.Condition()
+        self.__heap = []
+        self.__counter = itertools.count()
+        self.__thread = None
+
+    def schedule(self, deadline: float, future: Future, message: str) -> None:
+        with self.__condition:
+            heapq.heappush(self.__heap, (deadline, next(self.__counter), weakref.ref(future), message))
+            if self.__thread is None:
+                self.__thread = threading.Thread(target=self._run, daemon=True)
+                self.__thread.start()
+            self.__condition.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self.__condition:
+                while True:
+                    now = time.monotonic()
+                    if self.__heap and self.__heap[0][0] <= now:
+                        _, _, future_ref, message = heapq.heappop(self.__heap)
+                        break
+                    self.__condition.wait(self.__heap[0][0] - now if self.__heap else None)
+            future = future_ref()
+            if future is not None:
+                _resolve(future, exception=BillingTimeoutError(message))
+            del future
+
+
+_deadlines = _DeadlineScheduler()
+
+
+def _resolve(future: Future, result=None, exception: Optional[BaseException] = None) -> bool:
+    """
+    Completes `future` unless it is already done (timed out, cancelled or resolved).
+
+    :return: True if the future was completed by this call.
+    """
+    try:
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+    except InvalidStateError:
+        return False
+    return True
+
+
+def callback_future(start, timeout: Optional[float] = DEFAULT_TIMEOUT, name: str = "billing operation") -> Future:
+    """
+    Runs a callback-based operation and returns a future for its callback arguments.
+
+    `start(callback)` must issue the operation and arrange for `callback` to be invoked
+    with the listener's arguments. The future resolves with a tuple of those arguments,
+    or with a single value when the callback receives exactly one. If the callback has
+    not fired `timeout` seconds after the call, the future fails with
+    :class:`BillingTimeoutError`. Callbacks arriving after the future timed out or was
+    cancelled are ignored.
+
+    Cancelling the future stops waiting for the result; the underlying billing call
+    cannot be aborted and still reaches Play.
+
+    :param start: A callable issuing the operation, taking the callback as its only
+        argument.
+    :param timeout: Seconds to wait for the callback, or `None` to wait forever.
+    :param name: The operation name used in the timeout message.
+    :return: A pending future, which is never set running so it can be cancelled
+        until it completes.
+    :rtype: Future
+    """
+    future = Future()
+    # a cancelled future only counts as done for `concurrent.futures.wait` once notified
+    future.add_done_callback(lambda f: f.cancelled() and f.set_running_or_notify_cancel())
+
+    def callback(*args) -> None:
+        _resolve(future, args[0] if len(args) == 1 else args)
+
+    if timeout is not None:
+        _deadlines.schedule(
+            time.monotonic() + timeout,
+            future,
+            "%s did not complete within %.3g seconds" % (name, timeout),
+        )
+    try:
+        start(callback)
+    except Exception as e:
+        _resolve(future, exception=e)
+    return future
+
+
+def gather(
+    futures: Iterable[Future], timeout: Optional[float] = None, return_exceptions: bool = False
+) -> List:
+    """
+    Waits for several billing operation futures and returns their results in order.
+
+    Unless `return_exceptions` is set, the first failed or cancelled future raises its
+    exception without waiting for the others.
+
+    :param futures: The futures to wait for.
+    :param timeout: Seconds to wait overall, or `None` to rely on the deadline of each
+        future.
+    :param return_exceptions: Whether failed, timed out or cancelled futures yield
+        their exception in the result list instead of raising it.
+    :return: The results of the futures, in the order they were given.
+    :rtype: List
+    :raises BillingTimeoutError: If `timeout` expires before every future completed.
+    """
+    futures = list(futures)
+    done, not_done = wait(futures, timeout, ALL_COMPLETED if return_exceptions else FIRST_EXCEPTION)
+    if not return_exceptions:
+        for future in futures:
+            if future in done and (future.cancelled() or future.exception() is not None):
+                future.result()
+    if not_done:
+        raise BillingTimeoutError(
+            "%d of %d billing operations did not complete" % (len(not_done), len(futures))
+        )
+
+    if not return_exceptions:
+        return [future.result() for future in futures]
+    return [
+        CancelledError() if future.cancelled() else future.exception() or future.result()
+        for future in futures
+    ]
@@ -1,8 +1,9 @@
 from jnius import JavaClass, MetaJavaClass, JavaStaticMethod, JavaStaticField, JavaMethod, JavaMultipleMethod
 
 __all__ = ("BillingClient", "BillingFlowParams", "BillingFlowParamsBuilder", "ProductType", "GetBillingConfigParams",
-           "ProductDetailsParams", "BillingResponseCode", "SubscriptionUpdateParams", "SubscriptionUpdateParamsBuilder",
-           "ReplacementMode")
+           "GetBillingConfigParamsBuilder", "BillingConfig", "FeatureType", "ProductDetailsParams",
+           "BillingResponseCode", "BillingResult", "BillingResultBuilder", "SubscriptionUpdateParams",
+           "SubscriptionUpdateParamsBuilder", "ReplacementMode")
 
 
 class BillingClient(JavaClass, metaclass=MetaJavaClass):
@@ -83,6 +84,17 @@ class ProductType(JavaClass, metaclass=MetaJavaClass):
     SUBS = JavaStaticField("Ljava/lang/String;")
 
 
+class FeatureType(JavaClass, metaclass=MetaJavaClass):
+    __javaclass__ = "com/android/billingclient/api/BillingClient$FeatureType"
+    ALTERNATIVE_BILLING_ONLY = JavaStaticField("Ljava/lang/String;")
+    BILLING_CONFIG = JavaStaticField("Ljava/lang/String;")
+    EXTERNAL_OFFER = JavaStaticField("Ljava/lang/String;")
+    IN_APP_MESSAGING = JavaStaticField("Ljava/lang/String;")
+    PRODUCT_DETAILS = JavaStaticField("Ljava/lang/String;")
+    SUBSCRIPTIONS = JavaStaticField("Ljava/lang/String;")
+    SUBSCRIPTIONS_UPDATE = JavaStaticField("Ljava/lang/String;")
+
+
 class BillingResponseCode(JavaClass, metaclass=MetaJavaClass):
     __javaclass__ = "com/android/billingclient/api/BillingClient$BillingResponseCode"
     BILLING_UNAVAILABLE = JavaStaticField("I")
@@ -99,6 +111,20 @@ class BillingResponseCode(JavaClass, metaclass=MetaJavaClass):
     USER_CANCELED = JavaStaticField("I")
 
 
+class BillingResult(JavaClass, metaclass=MetaJavaClass):
+    __javaclass__ = "com/android/billingclient/api/BillingResult"
+    newBuilder = JavaStaticMethod("()Lcom/android/billingclient/api/BillingResult$Builder;")
+    getDebugMessage = JavaMethod("()Ljava/lang/String;")
+    getResponseCode = JavaMethod("()I")
+
+
+class BillingResultBuilder(JavaClass, metaclass=MetaJavaClass):
+    __javaclass__ = "com/android/billingclient/api/BillingResult$Builder"
+    build = JavaMethod("()Lcom/android/billingclient/api/BillingResult;")
+    setDebugMessage = JavaMethod("(Ljava/lang/String;)Lcom/android/billingclient/api/BillingResult$Builder;")
+    setResponseCode = JavaMethod("(I)Lcom/android/billingclient/api/BillingResult$Builder;")
+
+
 class BillingFlowParams(JavaClass, metaclass=MetaJavaClass):
     __javaclass__ = "com/android/billingclient/api/BillingFlowParams"
     newBuilder = JavaStaticMethod("()Lcom/android/billingclient/api/BillingFlowParams$Builder;")
@@ -122,6 +148,16 @@ class GetBillingConfigParams(JavaClass, metaclass=MetaJavaClass):
     newBuilder = JavaStaticMethod("()Lcom/android/billingclient/api/GetBillingConfigParams$Builder;")
 
 
+class GetBillingConfigParamsBuilder(JavaClass, metaclass=MetaJavaClass):
+    __javaclass__ = "com/android/billingclient/api/GetBillingConfigParams$Builder"
+    build = JavaMethod("()Lcom/android/billingclient/api/GetBillingConfigParams;")
+
+
+class BillingConfig(JavaClass, metaclass=MetaJavaClass):
+    __javaclass__ = "com/android/billingclient/api/BillingConfig"
+    getCountryCode = JavaMethod("()Ljava/lang/String;")
+
+
 class ProductDetailsParams(JavaClass, metaclass=MetaJavaClass):
     __javaclass__ = "com/android/billingclient/api/BillingFlowParams$ProductDetailsParams"
     newBuilder = JavaStaticMethod("()Lcom/android/billingclient/api/BillingFlowParams$ProductDetailsParams$Builder;")
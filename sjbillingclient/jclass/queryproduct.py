@@ -1,6 +1,7 @@
-from jnius import JavaClass, MetaJavaClass, JavaStaticMethod, JavaMethod
+from jnius import JavaClass, MetaJavaClass, JavaStaticMethod, JavaMethod, JavaStaticField
 
-__all__ = ("QueryProductDetailsParams", "QueryProductDetailsParamsProduct", "QueryProductDetailsParamsBuilder", "QueryProductDetailsParamsProductBuilder")
+__all__ = ("QueryProductDetailsParams", "QueryProductDetailsParamsProduct", "QueryProductDetailsParamsBuilder",
+           "QueryProductDetailsParamsProductBuilder", "QueryProductDetailsResult", "UnfetchedProductStatusCode")
 
 
 class QueryProductDetailsParams(JavaClass, metaclass=MetaJavaClass):
@@ -34,3 +35,11 @@ class QueryProductDetailsResult(JavaClass, metaclass=MetaJavaClass):
                               "Lcom/android/billingclient/api/QueryProductDetailsResult;")
     getProductDetailsList = JavaMethod("()Ljava/util/List;")
     getUnfetchedProductList = JavaMethod("()Ljava/util/List;")
+
+
+class UnfetchedProductStatusCode(JavaClass, metaclass=MetaJavaClass):
+    __javaclass__ = "com/android/billingclient/api/UnfetchedProduct$StatusCode"
+    INVALID_PRODUCT_ID_FORMAT = JavaStaticField("I")
+    NO_ELIGIBLE_OFFER = JavaStaticField("I")
+    PRODUCT_NOT_FOUND = JavaStaticField("I")
+    UNKNOWN = JavaStaticField("I")
@@ -1,6 +1,6 @@
 from jnius import PythonJavaClass, java_method
 
-__all__ = ("BillingClientStateListener", )
+__all__ = ("BillingClientStateListener", "BillingConfigResponseListener")
 
 
 class BillingClientStateListener(PythonJavaClass):
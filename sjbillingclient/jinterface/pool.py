@@ -0,0 +1,188 @@
+__all__ = ("DEFAULT_MAX_IDLE", "ListenerPool", )
+
+import logging
+import threading
+from collections import deque
+from typing import Optional
+
+from sjbillingclient.utils import QueryDict
+
+logger = logging.getLogger(__name__)
+
+# Idle listener proxies kept per pool unless configured otherwise.
+DEFAULT_MAX_IDLE = 16
+
+
+class ListenerPool:
+    """
+    Recycles `PythonJavaClass` listener proxies across asynchronous billing calls.
+
+    Creating a listener proxy builds a Java dynamic proxy and registers a global
+    reference for it, which is costly on hot paths such as bulk consumes. A pool hands
+    out an idle proxy per request, binds the request's callback to it and takes the
+    proxy back once the callback has fired, so steady-state calls create no proxies.
+    At most `max_idle` released proxies are kept; proxies released beyond that are
+    dropped, so a burst of calls does not pin one global reference per call for the
+    lifetime of the pool.
+
+    Each in-flight request owns its proxy until its callback fires, which keeps routing
+    exact even for callbacks that carry no request key (e.g.
+    `onAcknowledgePurchaseResponse`), and keeps the proxy referenced from Python so it
+    cannot be collected while Java still holds it. A request's callback runs at most
+    once: a duplicate callback on the same proxy, or a late one arriving while the
+    proxy is idle, is logged and dropped. Idle proxies are handed out again in release
+    order, so the proxy reused is the one released longest ago.
+
+    The listener class must accept the callback as its only constructor argument and
+    store it in a `callback` attribute.
+
+    ::
+
+        pool = ListenerPool(ConsumeResponseListener)
+        pool.submit(on_consume_response,
+                    lambda listener: billing_client.consumeAsync(params, listener))
+    """
+
+    def __init__(self, listener_class, max_idle: Optional[int] = DEFAULT_MAX_IDLE) -> None:
+        """
+        :param listener_class: The `PythonJavaClass` listener class pooled.
+        :param max_idle: The maximum number of idle proxies kept, or `None` to keep
+            every released proxy.
+        """
+        self.__listener_class = listener_class
+        self.__max_idle = max_idle
+        self.__lock = threading.Lock()
+        # idle listeners, oldest release first
+        self.__idle = deque()
+        # id(listener) -> (listener, lease) of the proxies bound to a request
+        self.__in_use = {}
+        self.created = 0
+        self.reused = 0
+        self.peak_in_use = 0
+        self.late_callbacks = 0
+
+    def acquire(self, callback):
+        """
+        Returns a listener proxy whose callback invokes `callback` once and then
+        returns the proxy to the pool.
+
+        :param callback: The callback of the request the listener is used for.
+        :return: A listener proxy.
+        """
+        with self.__lock:
+            if self.__idle:
+                listener = self.__idle.popleft()
+                self.reused += 1
+            else:
+                listener = None
+                self.created += 1
+        if listener is None:
+            listener = self.__listener_class(None)
+
+        lease = object()
+
+        def dispatch(*args):
+            if not self.__release(listener, lease):
+                self.__late_callback(*args)
+                return
+            callback(*args)
+
+        listener.callback = dispatch
+        with self.__lock:
+            self.__in_use[id(listener)] = (listener, lease)
+            self.peak_in_use = max(self.peak_in_use, len(self.__in_use))
+        return listener
+
+    def release(self, listener) -> None:
+        """
+        Returns a listener proxy to the pool and drops its callback. Releasing a proxy
+        that is not in use has no effect.
+
+        :param listener: A listener proxy returned by :meth:`acquire`.
+        :return: None
+        """
+        with self.__lock:
+            entry = self.__in_use.get(id(listener))
+        if entry is not None and entry[0] is listener:
+            self.__release(listener, entry[1])
+
+    def __release(self, listener, lease) -> bool:
+        """
+        Releases `listener` if it is still bound to the request holding `lease`.
+
+        :return: True if the proxy was released by this call.
+        """
+        with self.__lock:
+            entry = self.__in_use.get(id(listener))
+            if entry is None or entry[1] is not lease:
+                return False
+            del self.__in_use[id(listener)]
+            listener.callback = self.__late_callback
+            if self.__max_idle is None or len(self.__idle) < self.__max_idle:
+                self.__idle.append(listener)
+        return True
+
+    def __late_callback(self, *args) -> None:
+        with self.__lock:
+            self.late_callbacks += 1
+        logger.warning("Dropped a callback on a %s that is not bound to a request",
+                       self.__listener_class.__name__)
+
+    def submit(self, callback, request) -> None:
+        """
+        Acquires a listener for `callback` and passes it to `request`, releasing the
+        listener again if `request` raises.
+
+        :param callback: The callback of the request.
+        :param request: A callable issuing the Java call with the listener as its only
+            argument.
+        :return: None
+        """
+        listener = self.acquire(callback)
+        try:
+            request(listener)
+        except Exception:
+            self.release(listener)
+            raise
+
+    def prefill(self, count: int) -> None:
+        """
+        Creates idle listener proxies ahead of time, up to `count` or the pool's idle limit.
+
+        :param count: The number of idle proxies wanted.
+        :return: None
+        """
+        with self.__lock:
+            if self.__max_idle is not None:
+                count = min(count, self.__max_idle)
+            missing = max(count - len(self.__idle), 0)
+            self.created += missing
+        listeners = [self.__listener_class(None) for _ in range(missing)]
+        for listener in listeners:
+            listener.callback = self.__late_callback
+        with self.__lock:
+            # prefilled proxies were never bound to a request, so hand them out first
+            self.__idle.extendleft(listeners)
+
+    def clear(self) -> None:
+        """
+        Drops every idle listener proxy. Proxies of in-flight requests are kept until
+        their callbacks fire.
+        """
+        with self.__lock:
+            self.__idle.clear()
+
+    def stats(self) -> QueryDict:
+        """
+        Returns the number of proxies created and reused, the number currently idle and
+        in use, the peak number in use at once and the number of dropped late callbacks.
+        """
+        with self.__lock:
+            return QueryDict(
+                created=self.created,
+                reused=self.reused,
+                idle=len(self.__idle),
+                in_use=len(self.__in_use),
+                peak_in_use=self.peak_in_use,
+                late_callbacks=self.late_callbacks,
+            )
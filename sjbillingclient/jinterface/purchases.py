@@ -1,7 +1,7 @@
 __all__ = ("PurchasesUpdatedListener", "PurchasesResponseListener")
 
 from jnius import PythonJavaClass, java_method
-from sjbillingclient import is_jnull
+from sjbillingclient.utils import is_jnull
 
 
 class PurchasesUpdatedListener(PythonJavaClass):
@@ -0,0 +1,289 @@
+"""
+Adaptive tracking of purchases in the `PurchaseState.PENDING` state.
+
+Pending purchases (cash payments and similar) can take hours to complete or be
+cancelled. :class:`PendingPurchaseTracker` polls `query_purchase_async` for the product
+types that still have tracked pending tokens, using one query per product type for all
+of them, and backs off while nothing changes. It speeds up again when the app resumes
+and fires a callback only when a tracked token leaves the pending state. A poll whose
+callback does not arrive within `poll_timeout` seconds is given up, so a lost callback
+does not stop polling.
+
+Example:
+    ```python
+    def on_state_changed(purchase_token, purchase):
+        if purchase is None:
+            print("pending purchase was cancelled", purchase_token)
+        elif purchase.purchase_state == PurchaseState.PURCHASED:
+            print("pending purchase completed", purchase_token)
+
+    tracker = PendingPurchaseTracker(client, on_state_changed)
+    tracker.track_all([client.get_purchase(p) for p in purchases], ProductType.INAPP)
+    ```
+"""
+
+__all__ = ("PendingPurchaseTracker", )
+
+import logging
+import threading
+import time
+from typing import Dict, Iterable
+
+from sjbillingclient.utils import QueryDict, detach_thread
+
+logger = logging.getLogger(__name__)
+
+# `BillingResponseCode.OK` and `PurchaseState.PENDING`, kept as literals so this module
+# does not need pyjnius
+RESPONSE_CODE_OK = 0
+PURCHASE_STATE_PENDING = 2
+
+
+class PendingPurchaseTracker:
+    """
+    Polls the state of pending purchases with adaptive backoff.
+
+    :ivar interval: The current polling interval, in seconds.
+    :type interval: float
+    :ivar polls: The number of purchase queries issued.
+    :type polls: int
+    :ivar timed_out_polls: The number of purchase queries given up after `poll_timeout`.
+    :type timed_out_polls: int
+    """
+
+    def __init__(
+        self,
+        billing_client,
+        on_state_changed,
+        min_interval: float = 30.0,
+        max_interval: float = 3600.0,
+        backoff: float = 2.0,
+        poll_timeout: float = 60.0,
+    ) -> None:
+        """
+        :param billing_client: The `BillingClient` used to query purchases.
+        :param on_state_changed: A callable invoked with the purchase token and the
+            converted purchase (see `BillingClient.get_purchase`) when a tracked token
+            leaves the pending state, or with `None` as the purchase if the token is no
+            longer returned (e.g. the payment was cancelled).
+        :param min_interval: The polling interval after a change or an app resume.
+        :param max_interval: The longest polling interval reached while idle.
+        :param backoff: The factor applied to the interval after a poll without changes.
+        :param poll_timeout: Seconds to wait for the callback of a purchase query before
+            the poll is completed without changes. Later callbacks of that query are
+            ignored.
+        """
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.poll_timeout = poll_timeout
+        self.interval = min_interval
+        self.polls = 0
+        self.timed_out_polls = 0
+
+        self.__billing_client = billing_client
+        self.__on_state_changed = on_state_changed
+        self.__condition = threading.Condition()
+        self.__tracked = {}
+        self.__in_flight = set()
+        # sequence number and `time.monotonic()` deadline of the latest poll
+        self.__poll = 0
+        self.__poll_deadline = None
+        self.__changed = False
+        self.__next_poll = None
+        self.__thread = None
+        self.__closed = False
+
+    def track(self, purchase: Dict, product_type: str) -> bool:
+        """
+        Starts tracking a purchase if it is pending.
+
+        :param purchase: A purchase dictionary as returned by `BillingClient.get_purchase`.
+        :param product_type: The type of the purchased product (e.g., "inapp" or "subs").
+        :return: True if the purchase is pending and is now tracked, otherwise False.
+        :rtype: bool
+        """
+        if purchase.purchase_state != PURCHASE_STATE_PENDING:
+            return False
+
+        with self.__condition:
+            if self.__closed:
+                return False
+            self.__tracked[purchase.purchase_token] = QueryDict(
+                product_type=product_type, purchase_state=purchase.purchase_state
+            )
+            if self.__next_poll is None:
+                self.__schedule(self.min_interval)
+            if self.__thread is None:
+                self.__thread = threading.Thread(target=self._poll_loop, daemon=True)
+                self.__thread.start()
+        return True
+
+    def track_all(self, purchases: Iterable[Dict], product_type: str) -> int:
+        """
+        Tracks every pending purchase of an iterable of purchase dictionaries.
+
+        :return: The number of purchases now tracked.
+        :rtype: int
+        """
+        return sum(self.track(purchase, product_type) for purchase in purchases)
+
+    def untrack(self, purchase_token: str) -> None:
+        with self.__condition:
+            self.__tracked.pop(purchase_token, None)
+
+    @property
+    def tracked_tokens(self):
+        with self.__condition:
+            return list(self.__tracked)
+
+    def on_resume(self) -> None:
+        """
+        Resets the polling interval and polls right away, as pending purchases are
+        often completed while the app is in the background.
+        """
+        with self.__condition:
+            self.interval = self.min_interval
+            if self.__tracked:
+                self.__schedule(0)
+
+    def on_pause(self) -> None:
+        """
+        Slows polling down to the maximum interval while the app is idle.
+        """
+        with self.__condition:
+            self.interval = self.max_interval
+            if self.__tracked:
+                self.__schedule(self.interval)
+
+    def poll_now(self) -> None:
+        with self.__condition:
+            self.__schedule(0)
+
+    def close(self) -> None:
+        """
+        Stops polling and forgets every tracked token.
+        """
+        with self.__condition:
+            self.__closed = True
+            self.__tracked.clear()
+            self.__condition.notify_all()
+
+    def __schedule(self, delay: float) -> None:
+        self.__next_poll = time.monotonic() + delay
+        self.__condition.notify_all()
+
+    def _poll_loop(self) -> None:
+        try:
+            while True:
+                with self.__condition:
+                    while True:
+                        if self.__closed:
+                            return
+                        now = time.monotonic()
+                        timed_out = None
+                        if self.__in_flight:
+                            wait = self.__poll_deadline - now
+                            if wait <= 0:
+                                timed_out = list(self.__in_flight)
+                                break
+                        elif self.__next_poll is not None:
+                            wait = self.__next_poll - now
+                            if wait <= 0:
+                                break
+                        else:
+                            wait = None
+                        self.__condition.wait(wait)
+
+                    if timed_out is None:
+                        self.__next_poll = None
+                        product_types = {entry.product_type for entry in self.__tracked.values()}
+                        self.__in_flight.update(product_types)
+                        self.__poll += 1
+                        self.__poll_deadline = now + self.poll_timeout
+                        self.__changed = False
+                    poll = self.__poll
+
+                if timed_out is not None:
+                    logger.warning("pending purchase poll of %s timed out", ", ".join(timed_out))
+                    self.timed_out_polls += len(timed_out)
+                    for product_type in timed_out:
+                        self._complete_poll(product_type, [], poll)
+                    continue
+
+                for product_type in product_types:
+                    self.polls += 1
+                    try:
+                        self.__billing_client.query_purchase_async(
+                            product_type,
+                            lambda billing_result, purchases, product_type=product_type, poll=poll: (
+                                self._on_query_purchases_response(
+                                    product_type, billing_result, purchases, poll
+                                )
+                            ),
+                        )
+                    except Exception:
+                        logger.exception("pending purchase poll failed")
+                        self._complete_poll(product_type, [], poll)
+        finally:
+            # the poll thread calls into Java through the billing client
+            detach_thread()
+
+    def _on_query_purchases_response(self, product_type: str, billing_result, purchases, poll: int) -> None:
+        """
+        Converts only the tracked purchases of the response and reports the tokens that
+        left the pending state, unless the poll already timed out.
+        """
+        with self.__condition:
+            if poll != self.__poll or product_type not in self.__in_flight:
+                logger.warning("ignored a late pending purchase poll response for %s", product_type)
+                return
+        is_ok = billing_result.getResponseCode() == RESPONSE_CODE_OK
+        changes = []
+        with self.__condition:
+            tracked = {
+                token: entry for token, entry in self.__tracked.items()
+                if entry.product_type == product_type
+            }
+
+        if is_ok:
+            returned = set()
+            for purchase in purchases:
+                token = purchase.getPurchaseToken()
+                entry = tracked.get(token)
+                if entry is None:
+                    continue
+                returned.add(token)
+                if purchase.getPurchaseState() != entry.purchase_state:
+                    changes.append((token, self.__billing_client.get_purchase(purchase)))
+            changes.extend((token, None) for token in tracked if token not in returned)
+
+        if not self._complete_poll(product_type, changes, poll):
+            return
+        for token, purchase in changes:
+            self.__on_state_changed(token, purchase)
+
+    def _complete_poll(self, product_type: str, changes, poll: int) -> bool:
+        """
+        Stops tracking the changed tokens and, once every query of the poll has
+        completed, adapts the interval and schedules the next poll.
+
+        :return: False if the query of `product_type` in `poll` was already completed
+            (e.g. it timed out), in which case nothing is changed.
+        """
+        with self.__condition:
+            if poll != self.__poll or product_type not in self.__in_flight:
+                return False
+            for token, _ in changes:
+                self.__tracked.pop(token, None)
+            self.__changed = self.__changed or bool(changes)
+            self.__in_flight.discard(product_type)
+            if not self.__in_flight:
+                if self.__changed:
+                    self.interval = self.min_interval
+                else:
+                    self.interval = min(self.interval * self.backoff, self.max_interval)
+                if self.__tracked and self.__next_poll is None:
+                    self.__schedule(self.interval)
+            self.__condition.notify_all()
+        return True
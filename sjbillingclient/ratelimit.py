@@ -0,0 +1,181 @@
+__all__ = ("TokenBucket", "RateLimiter")
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional, Tuple
+
+from sjbillingclient.utils import QueryDict, detach_thread
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    A token bucket allowing `rate` calls per second on average and bursts of up to
+    `burst` calls.
+    """
+
+    def __init__(self, rate: float, burst: int) -> None:
+        if rate <= 0 or burst < 1:
+            raise ValueError("rate must be positive and burst at least 1")
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated_at = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def delay(self) -> float:
+        """
+        Returns the number of seconds until a token is available, assuming the bucket
+        was just refilled.
+        """
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+
+class RateLimiter:
+    """
+    Limits calls per operation type with one token bucket each.
+
+    Calls within the limit run immediately on the calling thread. Excess calls are
+    queued in FIFO order per operation and run on a scheduler thread as tokens become
+    available, so callers are served fairly and never rejected. Operations without a
+    configured limit always run immediately.
+
+    ::
+
+        limiter = RateLimiter({"query_purchases": (2.0, 4)})
+        limiter.submit("query_purchases", lambda: billing_client.queryPurchasesAsync(...))
+    """
+
+    def __init__(self, limits: Optional[Dict[str, Tuple[float, int]]] = None) -> None:
+        """
+        :param limits: Mapping of operation type to a `(rate, burst)` tuple, where `rate`
+            is the sustained number of calls per second and `burst` the number of calls
+            allowed back to back.
+        """
+        self.__condition = threading.Condition()
+        self.__buckets = {
+            operation: TokenBucket(rate, burst) for operation, (rate, burst) in (limits or {}).items()
+        }
+        self.__queues = {operation: deque() for operation in self.__buckets}
+        self.__stats = {
+            operation: QueryDict(calls=0, delayed=0, total_wait=0.0, max_wait=0.0)
+            for operation in self.__buckets
+        }
+        self.__thread = None
+        self.__closed = False
+
+    def is_limited(self, operation: str) -> bool:
+        return operation in self.__buckets
+
+    def submit(self, operation: str, call) -> None:
+        """
+        Runs `call` now if the operation is within its limit, otherwise queues it.
+
+        :param operation: The operation type.
+        :param call: A callable taking no arguments.
+        :return: None
+        """
+        bucket = self.__buckets.get(operation)
+        if bucket is None:
+            call()
+            return
+
+        with self.__condition:
+            if self.__closed:
+                raise RuntimeError("rate limiter is closed")
+            queue = self.__queues[operation]
+            bucket.refill(time.monotonic())
+            if not queue and bucket.tokens >= 1:
+                bucket.tokens -= 1
+                self.__record(operation, 0.0)
+            else:
+                queue.append((time.monotonic(), call))
+                if self.__thread is None:
+                    self.__thread = threading.Thread(target=self._schedule_loop, daemon=True)
+                    self.__thread.start()
+                self.__condition.notify()
+                return
+        call()
+
+    def __record(self, operation: str, wait: float) -> None:
+        stats = self.__stats[operation]
+        stats.calls += 1
+        if wait > 0:
+            stats.delayed += 1
+            stats.total_wait += wait
+            stats.max_wait = max(stats.max_wait, wait)
+
+    def _schedule_loop(self) -> None:
+        """
+        Runs queued calls as tokens become available, until the limiter is closed.
+        """
+        try:
+            while True:
+                ready = []
+                with self.__condition:
+                    while not ready:
+                        if self.__closed:
+                            return
+                        now = time.monotonic()
+                        timeout = None
+                        for operation, queue in self.__queues.items():
+                            if not queue:
+                                continue
+                            bucket = self.__buckets[operation]
+                            bucket.refill(now)
+                            while queue and bucket.tokens >= 1:
+                                queued_at, call = queue.popleft()
+                                bucket.tokens -= 1
+                                self.__record(operation, now - queued_at)
+                                ready.append(call)
+                            if queue:
+                                delay = bucket.delay()
+                                timeout = delay if timeout is None else min(timeout, delay)
+                        if not ready:
+                            self.__condition.wait(timeout)
+
+                for call in ready:
+                    try:
+                        call()
+                    except Exception:
+                        logger.exception("rate limited call failed")
+        finally:
+            # queued calls reach Java on this thread
+            detach_thread()
+
+    def close(self) -> None:
+        """
+        Drops the queued calls without running them and stops the scheduler thread.
+        """
+        with self.__condition:
+            self.__closed = True
+            for queue in self.__queues.values():
+                queue.clear()
+            self.__condition.notify_all()
+
+    def stats(self) -> Dict[str, QueryDict]:
+        """
+        Returns, per limited operation, the number of calls, how many were delayed, the
+        total and maximum wait in seconds, the mean wait of delayed calls and the number
+        of calls currently queued.
+
+        :rtype: Dict[str, QueryDict]
+        """
+        with self.__condition:
+            return QueryDict(
+                (
+                    operation,
+                    QueryDict(
+                        stats,
+                        mean_wait=stats.total_wait / stats.delayed if stats.delayed else 0.0,
+                        queued=len(self.__queues[operation]),
+                    ),
+                )
+                for operation, stats in self.__stats.items()
+            )
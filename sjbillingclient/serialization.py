@@ -0,0 +1,315 @@
+"""
+Compact serialization of converted purchases and product details.
+
+Records produced by `BillingClient.get_purchase`, `BillingClient.get_product_details`
+and `BillingClient.get_unfetched_product` can be encoded either in a compact binary
+format or as JSON. The binary format replaces every known field name with a small
+integer from :data:`FIELDS`, writes integers as zigzag varints and stores
+`original_json` and `signature` as raw UTF-8 bytes that are decoded back to `bytes`
+without being parsed or re-encoded, ready to be forwarded for signature verification.
+
+Long lists are encoded and decoded as streams, one length-prefixed record at a time::
+
+    with open("purchases.bin", "wb") as fp:
+        dump_stream((client.get_purchase(p) for p in purchases), fp)
+
+    with open("purchases.bin", "rb") as fp:
+        for purchase in load_stream(fp):
+            ...
+
+This module does not depend on pyjnius, so it can be used by a backend as well.
+"""
+
+__all__ = ("FORMAT_BINARY", "FORMAT_JSON", "FIELDS", "RAW_FIELDS", "dumps", "loads", "dump_stream", "load_stream")
+
+import json
+import struct
+from typing import Any, BinaryIO, Dict, Iterable, Iterator
+
+from sjbillingclient.utils import QueryDict
+
+FORMAT_BINARY = "binary"
+FORMAT_JSON = "json"
+
+MAGIC = b"SJB"
+VERSION = 1
+
+# Field names known to the binary format. The position of a name is its wire id, so
+# new names must only ever be appended.
+FIELDS = (
+    # purchase
+    "products", "purchase_token", "purchase_state", "purchase_time", "order_id", "quantity",
+    "is_acknowledged", "is_auto_renewing", "original_json", "signature", "package_name",
+    "developer_payload", "account_identifiers", "obfuscated_account_id", "obfuscated_profile_id",
+    "pending_purchase_update",
+    # product details
+    "description", "name", "product_id", "product_type", "title", "offer_details",
+    "base_plan_id", "installment_plan_details", "installment_plan_commitment_payments_count",
+    "subsequent_installment_plan_commitment_payments_count", "offer_id", "offer_tags",
+    "offer_token", "pricing_phases", "billing_cycle_count", "billing_period", "formatted_price",
+    "price_amount_micros", "price_currency_code", "recurrence_mode", "discount_display_info",
+    "discount_amount", "discount_amount_currency_code", "get_discount_amount_micros",
+    "formatted_discount_amount", "percentage_discount", "full_price_micros",
+    "limited_quantity_info", "maximum_quantity", "remaining_quantity", "preorder_details",
+    "preorder_presale_end_time_millis", "preorder_release_time_millis", "purchase_option_id",
+    "rental_details", "rental_expiration_period", "rental_period", "valid_time_window",
+    "end_time_millis", "start_time_millis",
+    # unfetched product
+    "status_code",
+)
+FIELD_IDS = {name: index for index, name in enumerate(FIELDS)}
+
+# Fields kept as raw bytes instead of text.
+RAW_FIELDS = frozenset(("original_json", "signature"))
+
+_NONE, _FALSE, _TRUE, _INT, _STR, _BYTES, _LIST, _DICT, _FLOAT = range(9)
+_DOUBLE = struct.Struct("<d")
+
+
+def _write_varint(buffer: bytearray, value: int) -> None:
+    while value > 0x7F:
+        buffer.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def _read_varint(data: bytes, offset: int):
+    result = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, offset
+        shift += 7
+
+
+def _write_value(buffer: bytearray, value: Any, raw: bool = False) -> None:
+    if value is None:
+        buffer.append(_NONE)
+    elif value is True:
+        buffer.append(_TRUE)
+    elif value is False:
+        buffer.append(_FALSE)
+    elif isinstance(value, int):
+        buffer.append(_INT)
+        _write_varint(buffer, value << 1 if value >= 0 else (-value << 1) - 1)
+    elif isinstance(value, float):
+        buffer.append(_FLOAT)
+        buffer += _DOUBLE.pack(value)
+    elif isinstance(value, (bytes, bytearray)) or (raw and isinstance(value, str)):
+        if isinstance(value, str):
+            value = value.encode("utf-8")
+        buffer.append(_BYTES)
+        _write_varint(buffer, len(value))
+        buffer += value
+    elif isinstance(value, str):
+        encoded = value.encode("utf-8")
+        buffer.append(_STR)
+        _write_varint(buffer, len(encoded))
+        buffer += encoded
+    elif isinstance(value, dict):
+        buffer.append(_DICT)
+        _write_varint(buffer, len(value))
+        for key, item in value.items():
+            field_id = FIELD_IDS.get(key)
+            if field_id is None:
+                encoded = key.encode("utf-8")
+                buffer.append(0)
+                _write_varint(buffer, len(encoded))
+                buffer += encoded
+            else:
+                _write_varint(buffer, field_id + 1)
+            _write_value(buffer, item, key in RAW_FIELDS)
+    elif isinstance(value, (list, tuple)):
+        buffer.append(_LIST)
+        _write_varint(buffer, len(value))
+        for item in value:
+            _write_value(buffer, item)
+    else:
+        raise TypeError("cannot serialize %r" % type(value).__name__)
+
+
+def _read_value(data: bytes, offset: int):
+    tag = data[offset]
+    offset += 1
+    if tag == _NONE:
+        return None, offset
+    if tag == _TRUE:
+        return True, offset
+    if tag == _FALSE:
+        return False, offset
+    if tag == _INT:
+        value, offset = _read_varint(data, offset)
+        return (value >> 1) ^ -(value & 1), offset
+    if tag == _FLOAT:
+        return _DOUBLE.unpack_from(data, offset)[0], offset + _DOUBLE.size
+    if tag in (_STR, _BYTES):
+        length, offset = _read_varint(data, offset)
+        value = bytes(data[offset:offset + length])
+        return (value.decode("utf-8") if tag == _STR else value), offset + length
+    if tag == _LIST:
+        count, offset = _read_varint(data, offset)
+        items = []
+        for _ in range(count):
+            item, offset = _read_value(data, offset)
+            items.append(item)
+        return items, offset
+    if tag == _DICT:
+        count, offset = _read_varint(data, offset)
+        record = QueryDict()
+        for _ in range(count):
+            field_id, offset = _read_varint(data, offset)
+            if field_id:
+                key = FIELDS[field_id - 1]
+            else:
+                length, offset = _read_varint(data, offset)
+                key = bytes(data[offset:offset + length]).decode("utf-8")
+                offset += length
+            record[key], offset = _read_value(data, offset)
+        return record, offset
+    raise ValueError("unknown value tag %d" % tag)
+
+
+def _decode(data: bytes, offset: int):
+    try:
+        return _read_value(data, offset)[0]
+    except (IndexError, struct.error):
+        raise ValueError("truncated record") from None
+
+
+def _to_json(record: Dict) -> str:
+    return json.dumps(
+        record,
+        separators=(",", ":"),
+        default=lambda value: bytes(value).decode("utf-8"),
+    )
+
+
+def _from_json(line) -> QueryDict:
+    def hook(pairs):
+        return QueryDict(
+            (key, value.encode("utf-8") if key in RAW_FIELDS and isinstance(value, str) else value)
+            for key, value in pairs
+        )
+    return json.loads(line, object_pairs_hook=hook)
+
+
+def _check_format(format: str) -> None:
+    if format not in (FORMAT_BINARY, FORMAT_JSON):
+        raise ValueError("format must be `FORMAT_BINARY` or `FORMAT_JSON`")
+
+
+def _check_header(header: bytes) -> None:
+    if header[:3] != MAGIC:
+        raise ValueError("not an sjbillingclient binary stream")
+    if len(header) < 4:
+        raise ValueError("truncated header")
+    if header[3] > VERSION:
+        raise ValueError("unsupported binary format version %d" % header[3])
+
+
+def dumps(record: Dict, format: str = FORMAT_BINARY) -> bytes:
+    """
+    Encodes a single purchase or product details record.
+
+    :param record: The record to encode.
+    :param format: `FORMAT_BINARY` or `FORMAT_JSON`.
+    :return: The encoded record.
+    :rtype: bytes
+    """
+    _check_format(format)
+    if format == FORMAT_JSON:
+        return _to_json(record).encode("utf-8")
+    buffer = bytearray(MAGIC)
+    buffer.append(VERSION)
+    _write_value(buffer, record)
+    return bytes(buffer)
+
+
+def loads(data: bytes, format: str = FORMAT_BINARY) -> QueryDict:
+    """
+    Decodes a single record encoded with :func:`dumps`.
+
+    :param data: The encoded record.
+    :param format: `FORMAT_BINARY` or `FORMAT_JSON`.
+    :return: The decoded record; `original_json` and `signature` are returned as bytes.
+    :rtype: QueryDict
+    :raises ValueError: If the data is not a binary record or is truncated.
+    """
+    _check_format(format)
+    if format == FORMAT_JSON:
+        return _from_json(data)
+    _check_header(data[:4])
+    return _decode(data, 4)
+
+
+def dump_stream(records: Iterable[Dict], fp: BinaryIO, format: str = FORMAT_BINARY) -> int:
+    """
+    Encodes records one at a time into a binary file object, so long lists never need
+    to be held in memory in their encoded form.
+
+    The binary format writes a header followed by length-prefixed records; the JSON
+    format writes one JSON document per line.
+
+    :param records: An iterable of records, e.g. a generator of `get_purchase` results.
+    :param fp: A writable binary file object.
+    :param format: `FORMAT_BINARY` or `FORMAT_JSON`.
+    :return: The number of records written.
+    :rtype: int
+    """
+    _check_format(format)
+    if format == FORMAT_BINARY:
+        fp.write(MAGIC + bytes((VERSION,)))
+
+    count = 0
+    for record in records:
+        if format == FORMAT_JSON:
+            fp.write(_to_json(record).encode("utf-8") + b"\n")
+        else:
+            buffer = bytearray()
+            _write_value(buffer, record)
+            header = bytearray()
+            _write_varint(header, len(buffer))
+            fp.write(bytes(header) + bytes(buffer))
+        count += 1
+    return count
+
+
+def load_stream(fp: BinaryIO, format: str = FORMAT_BINARY) -> Iterator[QueryDict]:
+    """
+    Decodes records written by :func:`dump_stream`, yielding them one at a time.
+
+    :param fp: A readable binary file object.
+    :param format: `FORMAT_BINARY` or `FORMAT_JSON`.
+    :return: An iterator over the decoded records.
+    :rtype: Iterator[QueryDict]
+    :raises ValueError: If the stream is not a binary stream or is truncated.
+    """
+    _check_format(format)
+    if format == FORMAT_JSON:
+        for line in fp:
+            if line.strip():
+                yield _from_json(line)
+        return
+
+    header = fp.read(4)
+    if not header:
+        return
+    _check_header(header)
+    while True:
+        length = shift = 0
+        while True:
+            byte = fp.read(1)
+            if not byte:
+                if shift:
+                    raise ValueError("truncated record length")
+                return
+            length |= (byte[0] & 0x7F) << shift
+            if not byte[0] & 0x80:
+                break
+            shift += 7
+        payload = fp.read(length)
+        if len(payload) != length:
+            raise ValueError("truncated record")
+        yield _decode(payload, 0)
@@ -0,0 +1,102 @@
+__all__ = ("PurchaseSnapshotDiffer", "purchase_fingerprint")
+
+import threading
+from typing import Dict, List
+
+from sjbillingclient.utils import QueryDict
+
+
+def purchase_fingerprint(purchase) -> tuple:
+    """
+    Returns a compact fingerprint of a purchase object: its state, acknowledged and
+    auto-renewing flags and a hash of its original JSON. Two fingerprints of the same
+    purchase token differ whenever anything reported for the purchase changed.
+
+    :param purchase: The purchase object.
+    :type purchase: Purchase
+    :rtype: tuple
+    """
+    return (
+        purchase.getPurchaseState(),
+        purchase.isAcknowledged(),
+        purchase.isAutoRenewing(),
+        hash(purchase.getOriginalJson()),
+    )
+
+
+class PurchaseSnapshotDiffer:
+    """
+    Diffs successive purchase lists (e.g. `queryPurchasesAsync` responses) by purchase token.
+
+    Only a fingerprint is read from each purchase (see :func:`purchase_fingerprint`);
+    full conversion is limited to purchases that are new or whose fingerprint changed,
+    the conversion of unchanged purchases is reused from the previous snapshot.
+
+    ::
+
+        differ = PurchaseSnapshotDiffer(BillingClient.get_purchase)
+        changes = differ.diff(purchases)
+        for purchase in changes.added + changes.changed:
+            ...
+    """
+
+    def __init__(self, convert) -> None:
+        """
+        :param convert: A callable converting a purchase object into a dictionary,
+            typically `BillingClient.get_purchase`.
+        """
+        self.__convert = convert
+        self.__lock = threading.Lock()
+        self.__entries = {}
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def diff(self, purchases) -> QueryDict:
+        """
+        Compares a purchase list with the previous one and makes it the new snapshot.
+
+        :param purchases: An iterable of purchase objects.
+        :return: A dictionary with the `added`, `changed` and `removed` purchase
+            dictionaries, the number of `unchanged` purchases and all current
+            `purchases` converted, in the order they were given.
+        :rtype: QueryDict
+        """
+        with self.__lock:
+            previous = self.__entries
+            entries = {}
+            added, changed, current = [], [], []
+
+            for purchase in purchases:
+                token = purchase.getPurchaseToken()
+                fingerprint = purchase_fingerprint(purchase)
+                entry = previous.get(token)
+                if entry is not None and entry[0] == fingerprint:
+                    converted = entry[1]
+                else:
+                    converted = self.__convert(purchase)
+                    (added if entry is None else changed).append(converted)
+                entries[token] = (fingerprint, converted)
+                current.append(converted)
+
+            removed = [entry[1] for token, entry in previous.items() if token not in entries]
+            self.__entries = entries
+
+        return QueryDict(
+            added=added,
+            changed=changed,
+            removed=removed,
+            unchanged=len(current) - len(added) - len(changed),
+            purchases=current,
+        )
+
+    def snapshot(self) -> List[Dict]:
+        """
+        Returns the converted purchases of the current snapshot.
+        """
+        with self.__lock:
+            return [entry[1] for entry in self.__entries.values()]
+
+    def clear(self) -> None:
+        with self.__lock:
+            self.__entries = {}
@@ -0,0 +1,299 @@
+__all__ = ("DEFAULT_BLOCK_TIMEOUT", "OverflowPolicy", "PurchaseEventStream", "PurchaseSubscription", "StreamClosedError")
+
+import asyncio
+import threading
+import time
+from collections import deque
+from queue import Empty
+from typing import Optional
+
+from sjbillingclient.utils import QueryDict
+
+
+class OverflowPolicy:
+    """
+    Policies applied by a :class:`PurchaseSubscription` when an event arrives while its
+    buffer is full.
+
+    - `BLOCK`: the publisher waits until the subscriber makes room (backpressure), at
+      most the subscription's `block_timeout`; the event is dropped if no room is made.
+      Publishing runs on the billing callback thread, so long waits delay every
+      further billing callback.
+    - `DROP_OLDEST`: the oldest buffered event is discarded.
+    - `COALESCE`: a buffered event for the same purchase token is replaced in place;
+      events for new tokens fall back to `DROP_OLDEST`.
+    """
+
+    BLOCK = "block"
+    DROP_OLDEST = "drop_oldest"
+    COALESCE = "coalesce"
+
+
+class StreamClosedError(Exception):
+    """
+    Raised by :meth:`PurchaseSubscription.get` when the subscription is closed and its
+    buffer has been drained.
+    """
+
+
+# Seconds a `BLOCK` subscription may hold up the billing callback thread per publish.
+DEFAULT_BLOCK_TIMEOUT = 1.0
+
+
+def _set_future_done(future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class PurchaseSubscription:
+    """
+    A bounded buffer of purchase events read by a single consumer.
+
+    A subscription can be read with :meth:`get`, iterated synchronously
+    (``for event in subscription``) or asynchronously (``async for event in
+    subscription``). Each event is a dictionary with the `response_code` and
+    `debug_message` of the `BillingResult`, and the converted `purchase` (see
+    `BillingClient.get_purchase`), which is `None` for results without purchases.
+
+    :ivar dropped: The number of events discarded or replaced because the buffer was
+        full, including events not buffered because a `BLOCK` wait timed out.
+    :type dropped: int
+    """
+
+    def __init__(
+        self, stream, maxsize: int, overflow: str, block_timeout: Optional[float] = DEFAULT_BLOCK_TIMEOUT
+    ) -> None:
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        if overflow not in (OverflowPolicy.BLOCK, OverflowPolicy.DROP_OLDEST, OverflowPolicy.COALESCE):
+            raise ValueError("overflow must be one of the `OverflowPolicy` values")
+
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self.dropped = 0
+        self.__stream = stream
+        self.__buffer = deque()
+        self.__lock = threading.Lock()
+        self.__not_empty = threading.Condition(self.__lock)
+        self.__not_full = threading.Condition(self.__lock)
+        self.__async_waiters = []
+        self.__closed = False
+
+    @property
+    def closed(self) -> bool:
+        return self.__closed
+
+    def __len__(self) -> int:
+        with self.__lock:
+            return len(self.__buffer)
+
+    def put(self, event, timeout: Optional[float] = None) -> bool:
+        """
+        Adds an event to the buffer, applying the overflow policy if it is full.
+
+        :param event: The event to add.
+        :param timeout: With the `BLOCK` policy, the maximum number of seconds to wait
+            for room in the buffer. `None` waits until room is made or the subscription
+            is closed.
+        :return: False if the event was not buffered because the subscription is
+            closed or the wait timed out (counted in `dropped`), otherwise True.
+        :rtype: bool
+        """
+        with self.__lock:
+            if self.__closed:
+                return False
+
+            if len(self.__buffer) >= self.maxsize:
+                if self.overflow == OverflowPolicy.BLOCK:
+                    if not self.__not_full.wait_for(
+                        lambda: self.__closed or len(self.__buffer) < self.maxsize, timeout
+                    ):
+                        self.dropped += 1
+                        return False
+                    if self.__closed:
+                        return False
+                elif self.overflow == OverflowPolicy.COALESCE and self.__coalesce(event):
+                    self.dropped += 1
+                    return True
+                else:
+                    self.__buffer.popleft()
+                    self.dropped += 1
+
+            self.__buffer.append(event)
+            self.__wake_consumers()
+            return True
+
+    def __coalesce(self, event) -> bool:
+        token = event.purchase.purchase_token if event.purchase else None
+        if token is None:
+            return False
+        for index, buffered in enumerate(self.__buffer):
+            if buffered.purchase and buffered.purchase.purchase_token == token:
+                self.__buffer[index] = event
+                self.__wake_consumers()
+                return True
+        return False
+
+    def __wake_consumers(self) -> None:
+        self.__not_empty.notify()
+        self.__wake_async_waiters()
+
+    def __wake_async_waiters(self) -> None:
+        for loop, future in self.__async_waiters:
+            # a reader whose loop has since been closed has nothing left to wake
+            if loop.is_closed():
+                continue
+            try:
+                loop.call_soon_threadsafe(_set_future_done, future)
+            except RuntimeError:
+                # the loop closed after the check
+                pass
+        self.__async_waiters.clear()
+
+    def get(self, timeout: Optional[float] = None):
+        """
+        Removes and returns the oldest buffered event, waiting for one if needed.
+
+        :param timeout: The maximum number of seconds to wait, or `None` to wait until an
+            event arrives or the subscription is closed.
+        :return: The oldest buffered event.
+        :raises queue.Empty: If no event arrived before the timeout.
+        :raises StreamClosedError: If the subscription is closed and drained.
+        """
+        with self.__lock:
+            if not self.__not_empty.wait_for(lambda: self.__buffer or self.__closed, timeout):
+                raise Empty
+            if not self.__buffer:
+                raise StreamClosedError("subscription is closed")
+            event = self.__buffer.popleft()
+            self.__not_full.notify()
+            return event
+
+    def close(self) -> None:
+        """
+        Closes the subscription. Buffered events can still be read, blocked publishers
+        are released and further events are discarded.
+        """
+        with self.__lock:
+            if self.__closed:
+                return
+            self.__closed = True
+            self.__not_full.notify_all()
+            self.__not_empty.notify_all()
+            self.__wake_async_waiters()
+        self.__stream.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return self.get()
+        except StreamClosedError:
+            raise StopIteration
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            with self.__lock:
+                if self.__buffer:
+                    event = self.__buffer.popleft()
+                    self.__not_full.notify()
+                    return event
+                if self.__closed:
+                    raise StopAsyncIteration
+                future = loop.create_future()
+                waiter = (loop, future)
+                self.__async_waiters.append(waiter)
+            try:
+                await future
+            finally:
+                # a cancelled reader must not stay registered
+                with self.__lock:
+                    if waiter in self.__async_waiters:
+                        self.__async_waiters.remove(waiter)
+
+
+class PurchaseEventStream:
+    """
+    Fans purchase update events out to any number of independent subscriptions.
+
+    Every subscription has its own bounded buffer and overflow policy, so a slow
+    consumer only applies backpressure (or loses events) according to its own policy.
+    """
+
+    def __init__(self) -> None:
+        self.__lock = threading.Lock()
+        self.__subscriptions = []
+
+    def subscribe(
+        self,
+        maxsize: int = 64,
+        overflow: str = OverflowPolicy.DROP_OLDEST,
+        block_timeout: Optional[float] = DEFAULT_BLOCK_TIMEOUT,
+    ) -> PurchaseSubscription:
+        """
+        Creates a new subscription receiving every event published from now on.
+
+        :param maxsize: The maximum number of buffered events.
+        :param overflow: The `OverflowPolicy` applied when the buffer is full.
+        :param block_timeout: With `OverflowPolicy.BLOCK`, the maximum number of seconds
+            a publish waits for room in the buffer, or `None` to wait without limit.
+        :return: The new subscription.
+        :rtype: PurchaseSubscription
+        """
+        subscription = PurchaseSubscription(self, maxsize, overflow, block_timeout)
+        with self.__lock:
+            self.__subscriptions = self.__subscriptions + [subscription]
+        return subscription
+
+    def unsubscribe(self, subscription: PurchaseSubscription) -> None:
+        with self.__lock:
+            self.__subscriptions = [s for s in self.__subscriptions if s is not subscription]
+
+    def has_subscribers(self) -> bool:
+        return bool(self.__subscriptions)
+
+    def publish(self, response_code: int, debug_message: str, purchases) -> None:
+        """
+        Publishes one event per purchase to every subscription, or a single event with
+        `purchase` set to `None` if there are no purchases.
+
+        A `BLOCK` subscription holds up the publish for at most its `block_timeout` in
+        total; events it has no room for by then are dropped.
+
+        :param response_code: The response code of the `BillingResult`.
+        :param debug_message: The debug message of the `BillingResult`.
+        :param purchases: The converted purchases (see `BillingClient.get_purchase`).
+        :return: None
+        """
+        events = [
+            QueryDict(response_code=response_code, debug_message=debug_message, purchase=purchase)
+            for purchase in (purchases or [None])
+        ]
+        for subscription in self.__subscriptions:
+            deadline = (
+                None if subscription.block_timeout is None
+                else time.monotonic() + subscription.block_timeout
+            )
+            for event in events:
+                subscription.put(
+                    event, None if deadline is None else max(0.0, deadline - time.monotonic())
+                )
+
+    def close(self) -> None:
+        """
+        Closes every subscription.
+        """
+        for subscription in self.__subscriptions:
+            subscription.close()
@@ -9,6 +9,17 @@ the BillingClient class. It handles various billing operations, including:
 - Processing purchase flows
 - Handling consumption of purchased items
 - Managing purchase acknowledgments
+- Querying the billing configuration and feature support (cached per connection)
+- Streaming purchase updates to bounded, independent subscriptions
+- Preparing billing flow params ahead of time for fast purchase launches
+- Optional warm-up that resolves bindings and prefetches a declared catalog on connect
+- Optional client-side rate limiting per operation type
+- Incremental purchase queries reporting added, changed and removed purchases
+- Future-returning variants of the billing calls with per-call deadlines
+- Subscription upgrades and downgrades resolved from the cached purchase snapshot
+- Optional tracing of the purchase funnel from launch to acknowledgement or consumption
+- Explicit `close()` (or `with` block) releasing Java references, listeners and caches
+- Combined product details and purchase queries for mixed INAPP and SUBS catalogs
 
 Key Features:
 - Asynchronous billing operations
@@ -35,39 +46,92 @@ Dependencies:
     - android.activity: For access to the Android activity context
 """
 
-from typing import List, Dict, Optional, Any
-from jnius import autoclass, JavaException
-
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from functools import lru_cache
+from typing import List, Dict, Optional, Any, Tuple
+from jnius import autoclass, detach, JavaException
+
+from sjbillingclient.cache import ConnectionCache, NegativeCache
+from sjbillingclient.futures import DEFAULT_TIMEOUT, callback_future
+from sjbillingclient.ratelimit import RateLimiter
+from sjbillingclient.snapshot import PurchaseSnapshotDiffer
+from sjbillingclient.stream import (
+    DEFAULT_BLOCK_TIMEOUT,
+    OverflowPolicy,
+    PurchaseEventStream,
+    PurchaseSubscription,
+)
+from sjbillingclient.tracing import STAGE_ACKNOWLEDGE, STAGE_CONSUME
 from sjbillingclient.utils import is_jnull, QueryDict
 from sjbillingclient.jclass.acknowledge import AcknowledgePurchaseParams
 from sjbillingclient.jclass.billing import (
     BillingClient as SJBillingClient,
+    BillingResponseCode,
     ProductType,
     ProductDetailsParams,
     BillingFlowParams,
+    GetBillingConfigParams,
+    BillingResult,
+    SubscriptionUpdateParams,
+    ReplacementMode,
 )
 from android import mActivity as activity  # noqa
 from sjbillingclient.jclass.consume import ConsumeParams
-from sjbillingclient.jclass.purchase import PendingPurchasesParams
+from sjbillingclient.jclass.purchase import PendingPurchasesParams, PurchaseState
 from sjbillingclient.jclass.queryproduct import (
     QueryProductDetailsParams,
     QueryProductDetailsParamsProduct,
+    QueryProductDetailsResult,
+    UnfetchedProductStatusCode,
 )
 from sjbillingclient.jclass.querypurchases import QueryPurchasesParams
 from sjbillingclient.jinterface.acknowledge import AcknowledgePurchaseResponseListener
-from sjbillingclient.jinterface.billing import BillingClientStateListener
+from sjbillingclient.jinterface.billing import (
+    BillingClientStateListener,
+    BillingConfigResponseListener,
+)
 from sjbillingclient.jinterface.consume import ConsumeResponseListener
+from sjbillingclient.jinterface.pool import DEFAULT_MAX_IDLE, ListenerPool
 from sjbillingclient.jinterface.product import ProductDetailsResponseListener
 from sjbillingclient.jinterface.purchases import (
     PurchasesUpdatedListener,
     PurchasesResponseListener,
 )
 
+logger = logging.getLogger(__name__)
+
 ERROR_NO_BASE_PLAN = "You don't have a base plan"
 ERROR_NO_BASE_PLAN_ID = "You don't have a base plan id"
 ERROR_INVALID_PRODUCT_TYPE = (
     "product_type not supported. Must be one of `ProductType.SUBS`, `ProductType.INAPP`"
 )
+ERROR_NO_BASE_PLAN_OFFER = "No offer found for base plan %r"
+ERROR_NO_SUBSCRIPTION_TO_REPLACE = "No active subscription to replace"
+ERROR_CLIENT_CLOSED = "BillingClient is closed"
+
+BILLING_CONFIG_CACHE_KEY = "billing_config"
+
+OPERATION_QUERY_PURCHASES = "query_purchases"
+OPERATION_QUERY_PRODUCT_DETAILS = "query_product_details"
+OPERATION_CONSUME = "consume"
+OPERATION_ACKNOWLEDGE_PURCHASE = "acknowledge_purchase"
+MAX_PREPARED_BILLING_FLOWS = 32
+# Seconds a cached purchase snapshot is trusted by `change_subscription` without a new query.
+PURCHASE_SNAPSHOT_MAX_AGE = 300
+# Seconds an unfetched product ID is left out of product details queries, per status code.
+# A malformed ID never becomes valid, while offer eligibility can change at any time.
+UNFETCHED_PRODUCT_TTL_INVALID_FORMAT = 24 * 3600
+UNFETCHED_PRODUCT_TTL_NOT_FOUND = 6 * 3600
+UNFETCHED_PRODUCT_TTL_NO_ELIGIBLE_OFFER = 3600
+UNFETCHED_PRODUCT_TTL_UNKNOWN = 300
+
+
+@lru_cache(maxsize=None)
+def _java_list():
+    return autoclass("java.util.List")
 
 
 class BillingClient:
@@ -85,15 +149,46 @@ class BillingClient:
     :type __purchase_update_listener: PurchasesUpdatedListener
     :ivar __billing_client_state_listener: Listener for tracking the state of the billing client connection.
     :type __billing_client_state_listener: BillingClientStateListener | None
-    :ivar __product_details_response_listener: Listener that handles the response for product details queries.
-    :type __product_details_response_listener: ProductDetailsResponseListener | None
-    :ivar __consume_response_listener: Listener handling responses for consumption requests.
-    :type __consume_response_listener: ConsumeResponseListener | None
-    :ivar __acknowledge_purchase_response_listener: Listener handling responses for acknowledging purchases.
-    :type __acknowledge_purchase_response_listener: AcknowledgePurchaseResponseListener | None
-    :type __purchases_response_listener: PurchasesResponseListener | None handling responses for purchase queries.
+    :ivar __product_details_response_listeners: Pool of listeners handling responses for product details queries.
+    :type __product_details_response_listeners: ListenerPool
+    :ivar __consume_response_listeners: Pool of listeners handling responses for consumption requests.
+    :type __consume_response_listeners: ListenerPool
+    :ivar __acknowledge_purchase_response_listeners: Pool of listeners handling responses for acknowledging
+        purchases.
+    :type __acknowledge_purchase_response_listeners: ListenerPool
+    :ivar __purchases_response_listeners: Pool of listeners handling responses for purchase queries.
+    :type __purchases_response_listeners: ListenerPool
+    :ivar __billing_config_response_listeners: Listeners of the billing config requests in flight.
+    :type __billing_config_response_listeners: Set[BillingConfigResponseListener]
+    :ivar __purchase_event_stream: Stream fanning purchase updates out to subscriptions created
+        with :meth:`purchase_updates`.
+    :type __purchase_event_stream: PurchaseEventStream
+    :ivar __prepared_billing_flows: The product details objects and the `BillingFlowParams` built
+        from them, keyed by product IDs and offer token, dropped when the details of one of the
+        products are refreshed.
+    :type __prepared_billing_flows: Dict[tuple, Tuple[tuple, BillingFlowParams]]
+    :ivar __product_details_cache: The latest product details returned for each product ID,
+        converted with :meth:`get_product_details` so no Java object is kept.
+    :type __product_details_cache: Dict[str, Dict]
+    :ivar __purchases_cache: The latest converted purchases per product type, with the
+        `time.monotonic()` timestamp they were fetched at.
+    :type __purchases_cache: Dict[str, Dict]
+    :ivar __purchase_differs: Differs holding the fingerprinted purchase snapshot per product type.
+    :type __purchase_differs: Dict[str, PurchaseSnapshotDiffer]
+    :ivar __rate_limiter: Token-bucket limiter applied to billing calls per operation type.
+    :type __rate_limiter: RateLimiter
+    :ivar __connection_cache: Cache for billing config and feature support results, cleared whenever
+        the connection is started, ended or lost.
+    :type __connection_cache: ConnectionCache
+    :ivar __unfetched_products: Product IDs Play reported as unfetched, keyed by product type and
+        ID and left out of product details queries until their status code's TTL expires.
+    :type __unfetched_products: NegativeCache
     """
 
+    # The Java BillingClient class (or any object with a compatible `newBuilder`) the
+    # client is built from. Replaced by a simulated backend in `sjbillingclient.tools.stress`.
+    _java_client_class = SJBillingClient
+
     def __init__(
         self,
         on_purchases_updated,
@@ -101,29 +196,72 @@ class BillingClient:
         enable_one_time_products: bool = True,
         enable_prepaid_plans: bool = False,
         enable_external_offer: bool = False,
+        rate_limits: Optional[Dict[str, Tuple[float, int]]] = None,
+        tracer=None,
+        max_idle_listeners: Optional[int] = DEFAULT_MAX_IDLE,
     ) -> None:
         """
         Initializes an instance of the class with the given purchase update callback.
 
         :param on_purchases_updated: A callback function that will be triggered when purchases
             are updated. This function typically handles updates to purchases such as
-            processing the results or actions related to the purchases.
-        :type on_purchases_updated: callable
+            processing the results or actions related to the purchases. May be `None` when
+            purchase updates are only consumed through :meth:`purchase_updates`.
+        :type on_purchases_updated: callable | None
+        :param rate_limits: Optional mapping of operation type (`OPERATION_QUERY_PURCHASES`,
+            `OPERATION_QUERY_PRODUCT_DETAILS`, `OPERATION_CONSUME`,
+            `OPERATION_ACKNOWLEDGE_PURCHASE`) to a `(rate, burst)` token bucket, where
+            `rate` is the sustained number of calls per second and `burst` the number of
+            calls allowed back to back. Calls over the limit are queued in order instead
+            of reaching Play, which throttles clients with `SERVICE_UNAVAILABLE`.
+        :type rate_limits: Dict[str, Tuple[float, int]] | None
+        :param tracer: Optional `PurchaseTracer` recording the launch, purchase update,
+            acknowledge and consume stages of each purchase as spans.
+        :type tracer: PurchaseTracer | None
+        :param max_idle_listeners: The maximum number of idle listener proxies kept per
+            operation type for reuse, or `None` to keep every proxy, so each pool grows
+            to the peak number of calls of its type in flight at once.
+        :type max_idle_listeners: int | None
         """
         self.__billing_client_state_listener = None
-        self.__product_details_response_listener = None
-        self.__consume_response_listener = None
-        self.__acknowledge_purchase_response_listener = None
-        self.__purchases_response_listener = None
+        self.__product_details_response_listeners = ListenerPool(
+            ProductDetailsResponseListener, max_idle_listeners
+        )
+        self.__consume_response_listeners = ListenerPool(ConsumeResponseListener, max_idle_listeners)
+        self.__acknowledge_purchase_response_listeners = ListenerPool(
+            AcknowledgePurchaseResponseListener, max_idle_listeners
+        )
+        self.__purchases_response_listeners = ListenerPool(PurchasesResponseListener, max_idle_listeners)
+        self.__billing_config_response_listeners = set()
+        self.__connection_cache = ConnectionCache()
+        self.__rate_limiter = RateLimiter(rate_limits)
+        self.__on_purchases_updated = on_purchases_updated
+        self.__purchase_event_stream = PurchaseEventStream()
+        self.__prepared_billing_flows = {}
+        self.__prepared_billing_flows_lock = threading.Lock()
+        self.__product_details_cache = {}
+        self.__purchases_cache = {}
+        self.__purchase_differs = {}
+        self.__tracer = tracer
+        self.__unfetched_products = NegativeCache(
+            {
+                UnfetchedProductStatusCode.INVALID_PRODUCT_ID_FORMAT: UNFETCHED_PRODUCT_TTL_INVALID_FORMAT,
+                UnfetchedProductStatusCode.PRODUCT_NOT_FOUND: UNFETCHED_PRODUCT_TTL_NOT_FOUND,
+                UnfetchedProductStatusCode.NO_ELIGIBLE_OFFER: UNFETCHED_PRODUCT_TTL_NO_ELIGIBLE_OFFER,
+            },
+            default_ttl=UNFETCHED_PRODUCT_TTL_UNKNOWN,
+        )
 
-        self.__purchase_update_listener = PurchasesUpdatedListener(on_purchases_updated)
+        self.__purchase_update_listener = PurchasesUpdatedListener(
+            self._dispatch_purchases_updated
+        )
         pending_purchase_params = PendingPurchasesParams.newBuilder()
         if enable_one_time_products:
             pending_purchase_params.enableOneTimeProducts()
         if enable_prepaid_plans:
             pending_purchase_params.enablePrepaidPlans()
 
-        billing_client = SJBillingClient.newBuilder(activity.context)
+        billing_client = self._java_client_class.newBuilder(activity.context)
         if enable_external_offer:
             billing_client.enableExternalOffer()
         if enable_auto_service_reconnection:
@@ -134,24 +272,322 @@ class BillingClient:
             .build()
         )
 
+    def __java_client(self):
+        if self.__billing_client is None:
+            raise RuntimeError(ERROR_CLIENT_CLOSED)
+        return self.__billing_client
+
+    def close(self) -> None:
+        """
+        Ends the connection and drops every reference the client holds to Java objects
+        and callbacks: prepared billing flows, idle listener proxies, queued rate limited
+        calls and the listeners registered with the Java client. The product details,
+        purchase and billing config caches are cleared and purchase update subscriptions
+        are closed.
+
+        Listener proxies of requests still in flight stay referenced until their
+        callbacks fire, as Java may still call them. Calling any billing method after
+        `close` raises `RuntimeError`; calling `close` again has no effect.
+
+        The client can also be used as a context manager, which closes it on exit.
+
+        :return: None
+        """
+        if self.__billing_client is None:
+            return
+        try:
+            self.__billing_client.endConnection()
+        finally:
+            self.__billing_client = None
+            self.__purchase_update_listener = None
+            self.__billing_client_state_listener = None
+            self.__billing_config_response_listeners.clear()
+            self.__on_purchases_updated = None
+            self.__rate_limiter.close()
+            self.__purchase_event_stream.close()
+            self.__connection_cache.clear()
+            self.__product_details_cache.clear()
+            self.__purchases_cache.clear()
+            self.__purchase_differs.clear()
+            self.__unfetched_products.clear()
+            with self.__prepared_billing_flows_lock:
+                self.__prepared_billing_flows.clear()
+            for pool in (
+                self.__product_details_response_listeners,
+                self.__consume_response_listeners,
+                self.__acknowledge_purchase_response_listeners,
+                self.__purchases_response_listeners,
+            ):
+                pool.clear()
+
+    def __enter__(self) -> "BillingClient":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def _dispatch_purchases_updated(self, billing_result, is_null, purchases) -> None:
+        """
+        Forwards an `onPurchasesUpdated` callback to the `on_purchases_updated` callback
+        and, if there are any, to the subscriptions of the purchase event stream.
+
+        Purchases are only converted when at least one subscription exists.
+        """
+        if billing_result.getResponseCode() == BillingResponseCode.OK and not is_null:
+            # the update may replace a cached purchase, keep the data but stop trusting it
+            for product_type, snapshot in list(self.__purchases_cache.items()):
+                self.__purchases_cache[product_type] = QueryDict(snapshot, fetched_at=None)
+
+        if self.__tracer is not None:
+            self.__tracer.purchases_updated(
+                billing_result.getResponseCode(),
+                [] if is_null else [
+                    (purchase.getPurchaseToken(), self._get_products(purchase))
+                    for purchase in purchases
+                ],
+            )
+
+        if self.__on_purchases_updated is not None:
+            self.__on_purchases_updated(billing_result, is_null, purchases)
+
+        if self.__purchase_event_stream.has_subscribers():
+            self.__purchase_event_stream.publish(
+                billing_result.getResponseCode(),
+                billing_result.getDebugMessage(),
+                [] if is_null else [self.get_purchase(purchase) for purchase in purchases],
+            )
+
+    def purchase_updates(
+        self,
+        maxsize: int = 64,
+        overflow: str = OverflowPolicy.DROP_OLDEST,
+        block_timeout: Optional[float] = DEFAULT_BLOCK_TIMEOUT,
+    ) -> PurchaseSubscription:
+        """
+        Subscribes to purchase updates as a stream of events.
+
+        The returned subscription buffers up to `maxsize` events and can be consumed
+        as a sync iterator, an async iterator or with `get(timeout)`. Each subscription
+        is independent; when its buffer is full the `overflow` policy decides whether
+        the oldest event is dropped (`OverflowPolicy.DROP_OLDEST`), events are merged by
+        purchase token (`OverflowPolicy.COALESCE`) or the billing callback waits for
+        room (`OverflowPolicy.BLOCK`). Events are published from the Play
+        `onPurchasesUpdated` listener, so a `BLOCK` wait is bounded by `block_timeout`
+        and events that still find no room are dropped.
+
+        :param maxsize: The maximum number of buffered events.
+        :type maxsize: int
+        :param overflow: The overflow policy applied when the buffer is full.
+        :type overflow: str
+        :param block_timeout: With `OverflowPolicy.BLOCK`, the maximum number of seconds
+            the billing callback waits for room per update.
+        :type block_timeout: float | None
+        :return: A subscription that must be closed when no longer needed.
+        :rtype: PurchaseSubscription
+        """
+        return self.__purchase_event_stream.subscribe(maxsize, overflow, block_timeout)
+
     def start_connection(
-        self, on_billing_setup_finished, on_billing_service_disconnected=lambda: None
+        self,
+        on_billing_setup_finished,
+        on_billing_service_disconnected=lambda: None,
+        warm_up_catalog: Optional[Dict[str, List[str]]] = None,
+        on_warm_up_finished=None,
     ) -> None:
         """
         Starts a connection with the billing client and initializes the billing
         client state listener. This method sets up a listener to handle billing
         setup finished and billing service disconnection callbacks.
 
+        Cached billing config and feature support results belong to a single
+        connection, so they are dropped when a connection is started and when
+        the billing service disconnects.
+
+        When a `warm_up_catalog` is given, the Java bindings used by the billing
+        calls are resolved on a background thread while the connection is being
+        set up. Once setup finishes with `OK`, the product details and purchases of
+        every product type in the catalog are prefetched concurrently, so they are
+        available from :meth:`get_cached_product_details` and
+        :meth:`get_cached_purchases`. A failure to start the prefetch is logged and
+        does not keep `on_billing_setup_finished` from being called.
+
         :param on_billing_setup_finished: A callable that will be invoked when
             the billing setup has finished.
         :param on_billing_service_disconnected: A callable that will be invoked
             when the billing service gets disconnected.
+        :param warm_up_catalog: Optional mapping of product type (`ProductType.INAPP`,
+            `ProductType.SUBS`) to the product IDs to prefetch.
+        :param on_warm_up_finished: Optional callable invoked once every prefetch
+            query has completed, with a dictionary holding the response codes of the
+            `product_details` and `purchases` queries per product type.
         :return: None
         """
+
+        def on_setup_finished(billing_result):
+            if warm_up_catalog and billing_result.getResponseCode() == BillingResponseCode.OK:
+                try:
+                    self._prefetch_catalog(warm_up_catalog, on_warm_up_finished)
+                except Exception:
+                    logger.exception("Failed to prefetch the warm-up catalog")
+            on_billing_setup_finished(billing_result)
+
+        def on_disconnected():
+            self.__connection_cache.clear()
+            on_billing_service_disconnected()
+
+        if warm_up_catalog:
+            threading.Thread(
+                target=self._resolve_bindings, args=(warm_up_catalog,), daemon=True
+            ).start()
+
+        self.__connection_cache.clear()
         self.__billing_client_state_listener = BillingClientStateListener(
-            on_billing_setup_finished, on_billing_service_disconnected
+            on_setup_finished, on_disconnected
+        )
+        self.__java_client().startConnection(self.__billing_client_state_listener)
+
+    def _resolve_bindings(self, catalog: Dict[str, List[str]]) -> None:
+        """
+        Resolves the Java classes and methods used by billing calls and creates the
+        listener proxies needed by the catalog prefetch, so neither cost is paid on
+        the first user-visible query. Runs on a background thread.
+
+        :param catalog: Mapping of product type to the product IDs to prefetch.
+        :return: None
+        """
+        try:
+            _java_list()
+            autoclass("java.util.Objects")
+            self.__product_details_response_listeners.prefill(len(catalog))
+            self.__purchases_response_listeners.prefill(len(catalog))
+            for product_type, product_ids in catalog.items():
+                QueryProductDetailsParams.newBuilder().setProductList(
+                    _java_list().of(
+                        *[
+                            self._build_product_params(product_id, product_type)
+                            for product_id in product_ids
+                        ]
+                    )
+                ).build()
+                QueryPurchasesParams.newBuilder().setProductType(product_type).build()
+            BillingFlowParams.newBuilder()
+            ProductDetailsParams.newBuilder()
+            ConsumeParams.newBuilder()
+            AcknowledgePurchaseParams.newBuilder()
+        finally:
+            detach()
+
+    def _prefetch_catalog(self, catalog: Dict[str, List[str]], on_warm_up_finished) -> None:
+        """
+        Queries the product details and purchases of every product type in the catalog
+        concurrently, filling the product details and purchases caches.
+
+        :param catalog: Mapping of product type to the product IDs to prefetch.
+        :param on_warm_up_finished: Optional callable invoked with the response codes
+            once every query has completed.
+        :return: None
+        """
+        lock = threading.Lock()
+        results = QueryDict(product_details={}, purchases={})
+        remaining = [2 * len(catalog)]
+
+        def complete(kind, product_type, response_code):
+            with lock:
+                results[kind][product_type] = response_code
+                remaining[0] -= 1
+                done = remaining[0] == 0
+            if done and on_warm_up_finished is not None:
+                on_warm_up_finished(results)
+
+        def on_product_details_response(product_type):
+            def callback(billing_result, product_details_result):
+                complete("product_details", product_type, billing_result.getResponseCode())
+            return callback
+
+        def on_query_purchases_response(product_type):
+            def callback(billing_result, purchases):
+                if billing_result.getResponseCode() == BillingResponseCode.OK:
+                    self._update_purchase_snapshot(product_type, purchases)
+                complete("purchases", product_type, billing_result.getResponseCode())
+            return callback
+
+        for product_type, product_ids in catalog.items():
+            self.query_product_details_async(
+                product_type, product_ids, on_product_details_response(product_type)
+            )
+            self.query_purchase_async(product_type, on_query_purchases_response(product_type))
+
+    def get_cached_product_details(self, product_id: str) -> Optional[Dict]:
+        """
+        Returns the latest product details fetched for a product ID by
+        :meth:`query_product_details_async` or the connection warm-up.
+
+        The details are converted with :meth:`get_product_details` when they arrive and
+        the Java `ProductDetails` object is not kept; use the object passed to the
+        query callback to launch a billing flow.
+
+        :param product_id: The ID of the product.
+        :type product_id: str
+        :return: The product details dictionary, or None if it has not been fetched.
+        :rtype: Dict | None
+        """
+        return self.__product_details_cache.get(product_id)
+
+    def get_cached_purchases(self, product_type: str) -> Optional[List[Dict]]:
+        """
+        Returns the converted purchases (see :meth:`get_purchase`) of a product type
+        fetched by the connection warm-up or :meth:`query_purchase_changes_async`.
+
+        :param product_type: The type of the products (e.g., "inapp" or "subs").
+        :type product_type: str
+        :return: The list of purchase dictionaries, or None if they have not been fetched.
+        :rtype: List[Dict] | None
+        """
+        snapshot = self.__purchases_cache.get(product_type)
+        return snapshot.purchases if snapshot else None
+
+    def get_fresh_cached_purchases(
+        self, product_type: str, max_age: float = PURCHASE_SNAPSHOT_MAX_AGE
+    ) -> Optional[List[Dict]]:
+        """
+        Returns the cached purchases of a product type like :meth:`get_cached_purchases`,
+        but only if they were fetched less than `max_age` seconds ago and no purchase
+        update arrived since.
+
+        :param product_type: The type of the products (e.g., "inapp" or "subs").
+        :type product_type: str
+        :param max_age: The maximum age of the snapshot, in seconds.
+        :type max_age: float
+        :return: The list of purchase dictionaries, or None if there is no fresh snapshot.
+        :rtype: List[Dict] | None
+        """
+        snapshot = self.__purchases_cache.get(product_type)
+        if snapshot is None or snapshot.fetched_at is None:
+            return None
+        if time.monotonic() - snapshot.fetched_at > max_age:
+            return None
+        return snapshot.purchases
+
+    def _update_purchase_snapshot(self, product_type: str, purchases) -> Dict:
+        """
+        Diffs a purchase list against the cached snapshot of its product type and
+        replaces the snapshot with it.
+
+        :param product_type: The type of the products the purchases belong to.
+        :param purchases: The purchase objects returned by `queryPurchasesAsync`.
+        :return: The changes, as returned by `PurchaseSnapshotDiffer.diff`.
+        :rtype: Dict
+        """
+        differ = self.__purchase_differs.get(product_type)
+        if differ is None:
+            differ = self.__purchase_differs.setdefault(
+                product_type, PurchaseSnapshotDiffer(self.get_purchase)
+            )
+        changes = differ.diff(purchases)
+        self.__purchases_cache[product_type] = QueryDict(
+            fetched_at=time.monotonic(), purchases=changes.purchases
         )
-        self.__billing_client.startConnection(self.__billing_client_state_listener)
+        return changes
 
     def end_connection(self) -> None:
         """
@@ -163,7 +599,109 @@ class BillingClient:
 
         :return: None
         """
-        self.__billing_client.endConnection()
+        self.__connection_cache.clear()
+        self.__java_client().endConnection()
+
+    def get_billing_config_async(
+        self, on_billing_config_response, force_refresh: bool = False
+    ) -> None:
+        """
+        Retrieves the billing configuration (e.g. the user's country code) asynchronously.
+
+        A successful result is cached until the connection is ended or lost, so later
+        calls are answered without an IPC round trip. Callers asking while a request is
+        already in flight share that request; if issuing it raises, the exception
+        propagates to the caller that issued it and the callers that joined it get an
+        `ERROR` result. Only the response code, debug message and converted config are
+        kept; callers get a `BillingResult` rebuilt from them, so no Java result object
+        stays referenced for the lifetime of the connection.
+
+        :param on_billing_config_response: A callback function that is triggered with
+            the `BillingResult` and the billing config dictionary (see
+            :meth:`get_billing_config`), or `None` if the request failed.
+        :param force_refresh: Whether to drop the cached config and query it again.
+        :return: None
+        """
+        if force_refresh:
+            self.__connection_cache.invalidate(BILLING_CONFIG_CACHE_KEY)
+
+        def start_request(resolve):
+            def on_response(billing_result, billing_config):
+                response_code = billing_result.getResponseCode()
+                config = (
+                    self.get_billing_config(billing_config)
+                    if response_code == BillingResponseCode.OK and not is_jnull(billing_config)
+                    else None
+                )
+                # the response arrived, Java no longer needs the listener
+                self.__billing_config_response_listeners.discard(listener)
+                resolve(
+                    (response_code, billing_result.getDebugMessage(), config),
+                    cache=config is not None,
+                )
+
+            params = GetBillingConfigParams.newBuilder().build()
+            listener = BillingConfigResponseListener(on_response)
+            self.__billing_config_response_listeners.add(listener)
+            try:
+                self.__java_client().getBillingConfigAsync(params, listener)
+            except Exception:
+                self.__billing_config_response_listeners.discard(listener)
+                raise
+
+        def deliver(response):
+            response_code, debug_message, config = response
+            billing_result = (
+                BillingResult.newBuilder()
+                .setResponseCode(response_code)
+                .setDebugMessage(debug_message)
+                .build()
+            )
+            on_billing_config_response(billing_result, config)
+
+        def on_error(e):
+            # callers that joined a request whose Java call raised get an error result
+            return BillingResponseCode.ERROR, str(e), None
+
+        self.__connection_cache.request(BILLING_CONFIG_CACHE_KEY, start_request, deliver, on_error)
+
+    @staticmethod
+    def get_billing_config(billing_config) -> Dict:
+        """
+        Retrieves detailed information from a billing config object.
+
+        :param billing_config: The billing config object to extract information from.
+        :type billing_config: BillingConfig
+        :return: A dictionary containing the country code of the billing config.
+        :rtype: Dict
+        """
+        return QueryDict(country_code=billing_config.getCountryCode())
+
+    def is_feature_supported(self, feature: str, force_refresh: bool = False) -> bool:
+        """
+        Checks whether a feature (see `FeatureType`) is supported on the current device.
+
+        The response code is cached until the connection is ended or lost, so repeated
+        checks do not make an IPC round trip. `SERVICE_DISCONNECTED` responses are never
+        cached.
+
+        :param feature: The feature to check, e.g. `FeatureType.SUBSCRIPTIONS`.
+        :type feature: str
+        :param force_refresh: Whether to drop the cached result and check again.
+        :type force_refresh: bool
+        :return: True if the feature is supported, otherwise False.
+        :rtype: bool
+        """
+        key = ("feature", feature)
+        if force_refresh:
+            self.__connection_cache.invalidate(key)
+
+        response_code = self.__connection_cache.get_or_compute(
+            key,
+            lambda: self.__java_client().isFeatureSupported(feature).getResponseCode(),
+            cache_if=lambda code: code != BillingResponseCode.SERVICE_DISCONNECTED,
+        )
+        return response_code == BillingResponseCode.OK
 
     def query_purchase_async(
         self, product_type: str, on_query_purchases_response
@@ -182,29 +720,88 @@ class BillingClient:
 
         params = QueryPurchasesParams.newBuilder().setProductType(product_type).build()
 
-        self.__purchases_response_listener = PurchasesResponseListener(
-            on_query_purchases_response
-        )
-        self.__billing_client.queryPurchasesAsync(
-            params, self.__purchases_response_listener
+        self.__rate_limiter.submit(
+            OPERATION_QUERY_PURCHASES,
+            lambda: self.__purchases_response_listeners.submit(
+                on_query_purchases_response,
+                lambda listener: self.__java_client().queryPurchasesAsync(params, listener),
+            ),
         )
 
+    def query_purchase_changes_async(
+        self, product_type: str, on_purchase_changes
+    ) -> None:
+        """
+        Queries purchases asynchronously for a given product type and reports what changed
+        since the previous snapshot of that product type.
+
+        Only a fingerprint (state, acknowledged and auto-renewing flags, original JSON
+        hash) is read from each purchase; purchases whose fingerprint did not change reuse
+        their previous conversion. The snapshot is shared with the connection warm-up and
+        is available from :meth:`get_cached_purchases`.
+
+        :param product_type: The type of the products to query purchases for (e.g., "inapp" or "subs").
+        :param on_purchase_changes: A callback function triggered with the `BillingResult`
+            and a dictionary of `added`, `changed` and `removed` purchase dictionaries, the
+            number of `unchanged` purchases and all current `purchases`, or `None` if the
+            query failed.
+        :return: None
+        """
+
+        def on_response(billing_result, purchases):
+            changes = (
+                self._update_purchase_snapshot(product_type, purchases)
+                if billing_result.getResponseCode() == BillingResponseCode.OK
+                else None
+            )
+            on_purchase_changes(billing_result, changes)
+
+        self.query_purchase_async(product_type, on_response)
+
     def query_product_details_async(
-        self, product_type: str, products_ids: List[str], on_product_details_response
+        self,
+        product_type: str,
+        products_ids: List[str],
+        on_product_details_response,
+        force_recheck: bool = False,
     ) -> None:
         """
         Queries product details asynchronously for a given list of product IDs and product type.
 
         This function utilizes the provided product details response callback to handle the
-        resulting response from the query.
+        resulting response from the query. A successful response refreshes the queried
+        products, so billing flows prepared for them are dropped.
+
+        Product IDs reported in the unfetched product list of an earlier response are left
+        out of the query until the TTL of their status code expires. They do not appear in
+        the result passed to the callback; :meth:`get_unfetched_products` lists them, and
+        :meth:`query_catalog_async` reports them with its unfetched products. If no
+        product ID is left, the callback is invoked right away with an OK result and empty
+        product lists.
 
         :param product_type: The type of the products to be queried (e.g., "inapp" or "subs").
         :param products_ids: A list of product IDs to query details for.
         :param on_product_details_response: A callback function that is triggered when the
                                              product details query is complete.
+        :param force_recheck: Whether to query product IDs known to be unfetched anyway.
+        :type force_recheck: bool
         :return: None
         """
-        JavaList = autoclass("java.util.List")
+        JavaList = _java_list()
+        products_ids = self._split_unfetched_products(product_type, products_ids, force_recheck)[0]
+        if not products_ids:
+            # Play rejects empty product lists, answer locally instead
+            billing_result = (
+                BillingResult.newBuilder()
+                .setResponseCode(BillingResponseCode.OK)
+                .setDebugMessage("All product IDs are known to be unfetched")
+                .build()
+            )
+            on_product_details_response(
+                billing_result, QueryProductDetailsResult.create(JavaList.of(), JavaList.of())
+            )
+            return
+
         product_list = [
             self._build_product_params(product_id, product_type)
             for product_id in products_ids
@@ -216,12 +813,219 @@ class BillingClient:
             .build()
         )
 
-        self.__product_details_response_listener = ProductDetailsResponseListener(
-            on_product_details_response
+        def on_response(billing_result, product_details_result):
+            if billing_result.getResponseCode() == BillingResponseCode.OK:
+                self._invalidate_billing_flows(products_ids)
+                for product_details in product_details_result.getProductDetailsList():
+                    product_id = product_details.getProductId()
+                    try:
+                        self.__product_details_cache[product_id] = self.get_product_details(
+                            product_details, product_details.getProductType()
+                        )
+                    except Exception:
+                        # leave the product uncached rather than failing the callback
+                        self.__product_details_cache.pop(product_id, None)
+                for unfetched_product in product_details_result.getUnfetchedProductList():
+                    self.__unfetched_products.add(
+                        (unfetched_product.getProductType(), unfetched_product.getProductId()),
+                        unfetched_product.getStatusCode(),
+                    )
+            on_product_details_response(billing_result, product_details_result)
+
+        self.__rate_limiter.submit(
+            OPERATION_QUERY_PRODUCT_DETAILS,
+            lambda: self.__product_details_response_listeners.submit(
+                on_response,
+                lambda listener: self.__java_client().queryProductDetailsAsync(params, listener),
+            ),
         )
-        self.__billing_client.queryProductDetailsAsync(
-            params, self.__product_details_response_listener
+
+    def _split_unfetched_products(
+        self, product_type: str, products_ids: List[str], force_recheck: bool
+    ) -> Tuple[List[str], List[Dict]]:
+        """
+        Splits product IDs into those to query and those known to be unfetched. With
+        `force_recheck`, the known unfetched products are forgotten and all are queried.
+
+        :return: The product IDs to query, and the skipped unfetched products with their
+            `product_id`, `product_type`, `status_code` and `expires_in`.
+        :rtype: Tuple[List[str], List[Dict]]
+        """
+        if force_recheck:
+            for product_id in products_ids:
+                self.__unfetched_products.discard((product_type, product_id))
+            return list(products_ids), []
+
+        queried = []
+        skipped = []
+        for product_id in products_ids:
+            entry = self.__unfetched_products.get((product_type, product_id))
+            if entry is None:
+                queried.append(product_id)
+            else:
+                skipped.append(QueryDict(
+                    product_id=product_id,
+                    product_type=product_type,
+                    status_code=entry.status_code,
+                    expires_in=entry.expires_in,
+                ))
+        return queried, skipped
+
+    def get_unfetched_products(self) -> List[Dict]:
+        """
+        Returns the product IDs currently left out of product details queries.
+
+        :return: A list of dictionaries with the `product_id`, `product_type` and
+            `status_code` of each unfetched product and the number of seconds until it is
+            queried again (`expires_in`).
+        :rtype: List[Dict]
+        """
+        return [
+            QueryDict(
+                product_id=entry.key[1],
+                product_type=entry.key[0],
+                status_code=entry.status_code,
+                expires_in=entry.expires_in,
+            )
+            for entry in self.__unfetched_products.entries()
+        ]
+
+    def clear_unfetched_products(self, product_ids: Optional[List[str]] = None) -> None:
+        """
+        Forgets unfetched products so the next product details query includes them again,
+        e.g. after products were published in the Play Console.
+
+        :param product_ids: The product IDs to forget, or `None` to forget every one.
+        :return: None
+        """
+        if product_ids is None:
+            self.__unfetched_products.clear()
+            return
+        product_ids = set(product_ids)
+        for entry in self.__unfetched_products.entries():
+            if entry.key[1] in product_ids:
+                self.__unfetched_products.discard(entry.key)
+
+    def query_catalog_async(
+        self,
+        catalog: Dict[str, str],
+        on_catalog_response,
+        include_purchases: bool = True,
+        force_recheck: bool = False,
+    ) -> None:
+        """
+        Queries the product details of a mixed catalog of one-time products and
+        subscriptions, and optionally the purchases of their product types, with a single
+        merged callback.
+
+        One product details query per product type and one incremental purchase query
+        per product type (see :meth:`query_purchase_changes_async`) are issued
+        concurrently, so the callback fires after the slowest query rather than after all
+        of them in turn. Each product is converted using its own `getProductType()`.
+
+        :param catalog: Mapping of product ID to product type (`ProductType.INAPP` or
+            `ProductType.SUBS`).
+        :type catalog: Dict[str, str]
+        :param on_catalog_response: A callable invoked once every query has completed,
+            with a dictionary holding:
+
+            - `ok`: whether every query succeeded and every returned product was
+              converted,
+            - `response_codes`: the response codes of the `product_details` and
+              `purchases` queries per product type,
+            - `products`: the converted product details (see
+              :meth:`get_product_details`, including the `product_type`) per product ID,
+            - `unfetched_products`: the unfetched products (see
+              :meth:`get_unfetched_product`), including the ones left out of the query
+              because an earlier response reported them, which also carry the seconds
+              until they are queried again (`expires_in`),
+            - `errors`: the `product_id`, `product_type` and `error` message of each
+              returned product that could not be converted,
+            - `purchases`: the converted purchases per product type.
+        :param include_purchases: Whether to query the purchases of the catalog's product
+            types as well.
+        :param force_recheck: Whether to query product IDs known to be unfetched anyway.
+        :return: None
+        :raises Exception: If the catalog contains an invalid product type.
+        """
+        products_ids_by_type = {}
+        for product_id, product_type in catalog.items():
+            if product_type not in (ProductType.INAPP, ProductType.SUBS):
+                raise Exception(ERROR_INVALID_PRODUCT_TYPE)
+            products_ids_by_type.setdefault(product_type, []).append(product_id)
+
+        lock = threading.Lock()
+        result = QueryDict(
+            ok=True,
+            response_codes=QueryDict(product_details={}, purchases={}),
+            products={},
+            unfetched_products=[],
+            errors=[],
+            purchases={},
         )
+        remaining = [len(products_ids_by_type) * (2 if include_purchases else 1)]
+
+        def complete(kind, product_type, response_code):
+            with lock:
+                result.response_codes[kind][product_type] = response_code
+                result.ok = result.ok and response_code == BillingResponseCode.OK
+                remaining[0] -= 1
+                done = remaining[0] == 0
+            if done:
+                on_catalog_response(result)
+
+        def on_product_details_response(product_type):
+            def callback(billing_result, product_details_result):
+                if billing_result.getResponseCode() == BillingResponseCode.OK:
+                    products = {}
+                    errors = []
+                    for product_details in product_details_result.getProductDetailsList():
+                        product_id = product_details.getProductId()
+                        try:
+                            products[product_id] = self.get_product_details(
+                                product_details, product_details.getProductType()
+                            )
+                        except Exception as e:
+                            errors.append(QueryDict(
+                                product_id=product_id,
+                                product_type=product_details.getProductType(),
+                                error=str(e),
+                            ))
+                    unfetched_products = [
+                        self.get_unfetched_product(unfetched_product)
+                        for unfetched_product in product_details_result.getUnfetchedProductList()
+                    ]
+                    with lock:
+                        result.products.update(products)
+                        result.unfetched_products.extend(unfetched_products)
+                        result.errors.extend(errors)
+                        result.ok = result.ok and not errors
+                complete("product_details", product_type, billing_result.getResponseCode())
+            return callback
+
+        def on_purchase_changes(product_type):
+            def callback(billing_result, changes):
+                if changes is not None:
+                    with lock:
+                        result.purchases[product_type] = changes.purchases
+                complete("purchases", product_type, billing_result.getResponseCode())
+            return callback
+
+        if not products_ids_by_type:
+            on_catalog_response(result)
+            return
+
+        for product_type, products_ids in products_ids_by_type.items():
+            products_ids, skipped = self._split_unfetched_products(
+                product_type, products_ids, force_recheck
+            )
+            with lock:
+                result.unfetched_products.extend(skipped)
+            self.query_product_details_async(
+                product_type, products_ids, on_product_details_response(product_type), force_recheck
+            )
+            if include_purchases:
+                self.query_purchase_changes_async(product_type, on_purchase_changes(product_type))
 
     @staticmethod
     def _build_product_params(product_id: str, product_type: str):
@@ -246,6 +1050,15 @@ class BillingClient:
             .build()
         )
 
+    @staticmethod
+    def _get_products(purchase) -> List[str]:
+        """
+        Returns the product IDs of a purchase (or pending purchase update) as a list,
+        empty if Java returned a null list.
+        """
+        products = purchase.getProducts()
+        return [] if is_jnull(products) else list(products)
+
     @staticmethod
     def get_purchase(purchase) -> Dict:
         """
@@ -264,9 +1077,7 @@ class BillingClient:
         pending_purchase_update = purchase.getPendingPurchaseUpdate()
 
         return QueryDict(
-            products=list(
-                purchase.getProducts() if not is_jnull(purchase.getProducts()) else []
-            ),
+            products=BillingClient._get_products(purchase),
             purchase_token=purchase.getPurchaseToken(),
             purchase_state=purchase.getPurchaseState(),
             purchase_time=purchase.getPurchaseTime(),
@@ -284,11 +1095,7 @@ class BillingClient:
             ),
             pending_purchase_update=(
                 QueryDict(
-                    products=list(
-                        pending_purchase_update.getProducts()
-                        if not is_jnull(pending_purchase_update.getProducts())
-                        else []
-                    ),
+                    products=BillingClient._get_products(pending_purchase_update),
                     purchase_token=pending_purchase_update.getPurchaseToken(),
                 )
                 if pending_purchase_update
@@ -498,6 +1305,10 @@ class BillingClient:
         offer token. The method constructs billing flow parameters using the provided product
         details and triggers the billing process.
 
+        Billing flow parameters are memoized, so launching a flow that was prepared with
+        :meth:`prepare_billing_flow` (or launched before) from the same product details
+        objects skips building them again.
+
         :param product_details: A list of product detail objects representing the items
                                 available for purchase through the billing flow.
         :param offer_token: Optional string representing a unique token to identify
@@ -505,19 +1316,219 @@ class BillingClient:
         :return: An integer identifier returned by the billing client representing the
                  result of the billing flow launch attempt.
         """
-        JavaList = autoclass("java.util.List")
+        billing_flow_params = self.prepare_billing_flow(product_details, offer_token)
+        return self._launch_billing_flow(
+            [product_detail.getProductId() for product_detail in product_details],
+            billing_flow_params,
+        )
+
+    def _launch_billing_flow(self, product_ids: List[str], billing_flow_params):
+        """
+        Launches a billing flow, tracing the launch stage when a tracer is set.
+        """
+        if self.__tracer is None:
+            return self.__java_client().launchBillingFlow(activity, billing_flow_params)
+
+        trace = self.__tracer.begin_purchase(product_ids)
+        try:
+            billing_result = self.__java_client().launchBillingFlow(activity, billing_flow_params)
+        except Exception as e:
+            self.__tracer.launch_failed(trace, e)
+            raise
+        self.__tracer.launch_finished(trace, billing_result.getResponseCode())
+        return billing_result
+
+    def prepare_billing_flow(
+        self, product_details: List, offer_token: Optional[str] = None
+    ):
+        """
+        Builds and caches the billing flow parameters for the specified product details and
+        optional offer token, so a later :meth:`launch_billing_flow` call with the same
+        products and offer token goes straight to `launchBillingFlow`.
+
+        Prepared parameters are reused only when the same product details objects are
+        passed again; other objects for the same products rebuild them. They are dropped
+        when the details of one of their products are refreshed through
+        :meth:`query_product_details_async`.
+
+        :param product_details: A list of product detail objects representing the items
+                                available for purchase through the billing flow.
+        :param offer_token: Optional string representing a unique token to identify
+                            specific offers for the product being purchased.
+        :return: The prepared billing flow parameters.
+        :rtype: BillingFlowParams
+        """
+        key = (
+            tuple(product_detail.getProductId() for product_detail in product_details),
+            offer_token,
+        )
+        product_details = tuple(product_details)
+        with self.__prepared_billing_flows_lock:
+            prepared = self.__prepared_billing_flows.get(key)
+        # a flow prepared from other product details objects (e.g. a stale query result
+        # passed after a refresh) is rebuilt from the ones given
+        if prepared is not None and len(prepared[0]) == len(product_details) and all(
+            source is given for source, given in zip(prepared[0], product_details)
+        ):
+            return prepared[1]
+
         product_params_list = [
             self._create_product_params(product_detail, offer_token)
             for product_detail in product_details
         ]
-
         billing_flow_params = (
             BillingFlowParams.newBuilder()
-            .setProductDetailsParamsList(JavaList.of(*product_params_list))
+            .setProductDetailsParamsList(_java_list().of(*product_params_list))
             .build()
         )
 
-        return self.__billing_client.launchBillingFlow(activity, billing_flow_params)
+        with self.__prepared_billing_flows_lock:
+            self.__prepared_billing_flows.pop(key, None)
+            self.__prepared_billing_flows[key] = (product_details, billing_flow_params)
+            while len(self.__prepared_billing_flows) > MAX_PREPARED_BILLING_FLOWS:
+                self.__prepared_billing_flows.pop(next(iter(self.__prepared_billing_flows)))
+        return billing_flow_params
+
+    def change_subscription(
+        self,
+        product_details,
+        on_billing_flow_launched,
+        old_product_id: Optional[str] = None,
+        offer_token: Optional[str] = None,
+        base_plan_id: Optional[str] = None,
+        replacement_mode: Optional[int] = None,
+        max_age: float = PURCHASE_SNAPSHOT_MAX_AGE,
+    ) -> None:
+        """
+        Launches a billing flow upgrading or downgrading the user's current subscription
+        to the given subscription product.
+
+        The purchase token of the subscription being replaced is taken from the cached
+        `ProductType.SUBS` purchase snapshot (see :meth:`get_fresh_cached_purchases`),
+        filled by the connection warm-up or :meth:`query_purchase_changes_async`. While
+        the snapshot is fresh the flow is launched right away; otherwise the purchases
+        are queried first.
+
+        :param product_details: The product details object of the target subscription.
+        :type product_details: ProductDetails
+        :param on_billing_flow_launched: A callable invoked with the `BillingResult` of
+            `launchBillingFlow`, or of the failed purchase query. It receives an
+            `ITEM_NOT_OWNED` result if there is no subscription to replace.
+        :param old_product_id: The product ID of the subscription to replace. Defaults
+            to the first active subscription for another product.
+        :param offer_token: The offer token of the target subscription. Takes
+            precedence over `base_plan_id`.
+        :param base_plan_id: The base plan whose first offer is used when no
+            `offer_token` is given. Defaults to the first offer of the product.
+        :param replacement_mode: The `ReplacementMode` applied to the change. Defaults
+            to `ReplacementMode.WITH_TIME_PRORATION`.
+        :param max_age: The maximum age, in seconds, of a purchase snapshot used
+            without querying purchases again.
+        :return: None
+        :raises JavaException: When no offer matches the target product or base plan.
+        """
+        if offer_token is None and base_plan_id is not None:
+            offer_token = self._find_base_plan_offer_token(product_details, base_plan_id)
+        product_params = self._create_product_params(product_details, offer_token)
+        if replacement_mode is None:
+            replacement_mode = ReplacementMode.WITH_TIME_PRORATION
+
+        def launch(purchases):
+            old_purchase = self._find_subscription_to_replace(
+                purchases, product_details.getProductId(), old_product_id
+            )
+            if old_purchase is None:
+                on_billing_flow_launched(
+                    BillingResult.newBuilder()
+                    .setResponseCode(BillingResponseCode.ITEM_NOT_OWNED)
+                    .setDebugMessage(ERROR_NO_SUBSCRIPTION_TO_REPLACE)
+                    .build()
+                )
+                return
+
+            subscription_update_params = (
+                SubscriptionUpdateParams.newBuilder()
+                .setOldPurchaseToken(old_purchase.purchase_token)
+                .setSubscriptionReplacementMode(replacement_mode)
+                .build()
+            )
+            billing_flow_params = (
+                BillingFlowParams.newBuilder()
+                .setProductDetailsParamsList(_java_list().of(product_params))
+                .setSubscriptionUpdateParams(subscription_update_params)
+                .build()
+            )
+            on_billing_flow_launched(
+                self._launch_billing_flow([product_details.getProductId()], billing_flow_params)
+            )
+
+        purchases = self.get_fresh_cached_purchases(ProductType.SUBS, max_age)
+        if purchases is not None:
+            launch(purchases)
+            return
+
+        def on_purchase_changes(billing_result, changes):
+            if changes is None:
+                on_billing_flow_launched(billing_result)
+            else:
+                launch(changes.purchases)
+
+        self.query_purchase_changes_async(ProductType.SUBS, on_purchase_changes)
+
+    @staticmethod
+    def _find_subscription_to_replace(
+        purchases: List[Dict], new_product_id: str, old_product_id: Optional[str]
+    ) -> Optional[Dict]:
+        """
+        Picks the purchased subscription a subscription change replaces.
+
+        :param purchases: The converted subscription purchases.
+        :param new_product_id: The product ID of the target subscription.
+        :param old_product_id: The product ID of the subscription to replace, or None to
+            pick the first subscription for another product.
+        :return: The purchase dictionary, or None if no subscription matches.
+        :rtype: Dict | None
+        """
+        purchased = [
+            purchase for purchase in purchases
+            if purchase.purchase_state == PurchaseState.PURCHASED
+        ]
+        if old_product_id is not None:
+            candidates = [purchase for purchase in purchased if old_product_id in purchase.products]
+        else:
+            candidates = [
+                purchase for purchase in purchased if new_product_id not in purchase.products
+            ] or purchased
+        return candidates[0] if candidates else None
+
+    @staticmethod
+    def _find_base_plan_offer_token(product_detail, base_plan_id: str) -> str:
+        """
+        Returns the offer token of the first offer of a subscription base plan.
+
+        :raises JavaException: When the product has no offer for the base plan.
+        """
+        offer_list = product_detail.getSubscriptionOfferDetails()
+        if offer_list:
+            for offer in offer_list:
+                if offer.getBasePlanId() == base_plan_id:
+                    return offer.getOfferToken()
+        raise JavaException(ERROR_NO_BASE_PLAN_OFFER % base_plan_id)
+
+    def _invalidate_billing_flows(self, product_ids) -> None:
+        """
+        Drops the prepared billing flow parameters that include any of the given product IDs.
+
+        :param product_ids: The IDs of the products whose details were refreshed.
+        :return: None
+        """
+        product_ids = set(product_ids)
+        with self.__prepared_billing_flows_lock:
+            for key in [
+                key for key in self.__prepared_billing_flows
+                if product_ids.intersection(key[0])
+            ]:
+                del self.__prepared_billing_flows[key]
 
     def _create_product_params(self, product_detail, offer_token: Optional[str]):
         """
@@ -595,14 +1606,19 @@ class BillingClient:
         :type on_consume_response: Callable
         :return: None
         """
+        purchase_token = purchase.getPurchaseToken()
         consume_params = (
             ConsumeParams.newBuilder()
-            .setPurchaseToken(purchase.getPurchaseToken())
+            .setPurchaseToken(purchase_token)
             .build()
         )
-        self.__consume_response_listener = ConsumeResponseListener(on_consume_response)
-        self.__billing_client.consumeAsync(
-            consume_params, self.__consume_response_listener
+        on_consume_response = self._trace_stage(purchase_token, STAGE_CONSUME, on_consume_response)
+        self.__rate_limiter.submit(
+            OPERATION_CONSUME,
+            lambda: self.__consume_response_listeners.submit(
+                on_consume_response,
+                lambda listener: self.__java_client().consumeAsync(consume_params, listener),
+            ),
         )
 
     def acknowledge_purchase(self, purchase_token, on_acknowledge_purchase_response):
@@ -625,10 +1641,234 @@ class BillingClient:
             .setPurchaseToken(purchase_token)
             .build()
         )
+        on_acknowledge_purchase_response = self._trace_stage(
+            purchase_token, STAGE_ACKNOWLEDGE, on_acknowledge_purchase_response
+        )
 
-        self.__acknowledge_purchase_response_listener = (
-            AcknowledgePurchaseResponseListener(on_acknowledge_purchase_response)
+        self.__rate_limiter.submit(
+            OPERATION_ACKNOWLEDGE_PURCHASE,
+            lambda: self.__acknowledge_purchase_response_listeners.submit(
+                on_acknowledge_purchase_response,
+                lambda listener: self.__java_client().acknowledgePurchase(
+                    acknowledge_purchase_params, listener
+                ),
+            ),
         )
-        self.__billing_client.acknowledgePurchase(
-            acknowledge_purchase_params, self.__acknowledge_purchase_response_listener
+
+    def _trace_stage(self, purchase_token: str, stage: str, callback):
+        """
+        Starts a traced stage of a purchase and returns `callback` wrapped to end it with
+        the response code, or `callback` itself when no tracer is set.
+        """
+        if self.__tracer is None:
+            return callback
+
+        self.__tracer.start_stage(purchase_token, stage)
+
+        def on_response(billing_result, *args):
+            self.__tracer.end_stage(purchase_token, stage, billing_result.getResponseCode())
+            callback(billing_result, *args)
+
+        return on_response
+
+    def start_connection_future(
+        self,
+        timeout: Optional[float] = DEFAULT_TIMEOUT,
+        on_billing_service_disconnected=lambda: None,
+        warm_up_catalog: Optional[Dict[str, List[str]]] = None,
+        on_warm_up_finished=None,
+    ) -> Future:
+        """
+        Starts a connection like :meth:`start_connection` and returns a future for the
+        setup result.
+
+        The future returned by this and the other `*_future` methods resolves when the
+        listener fires, or fails with `BillingTimeoutError` after `timeout` seconds.
+        Cancelling it stops waiting without aborting the call; late callbacks are
+        ignored. Several futures can be awaited with `sjbillingclient.futures.gather`.
+
+        :param timeout: Seconds to wait for the listener, or `None` to wait forever.
+        :return: A future resolving with the `BillingResult` of the setup.
+        :rtype: Future
+        """
+        return callback_future(
+            lambda callback: self.start_connection(
+                callback, on_billing_service_disconnected, warm_up_catalog, on_warm_up_finished
+            ),
+            timeout,
+            "start_connection",
+        )
+
+    def get_billing_config_future(
+        self, timeout: Optional[float] = DEFAULT_TIMEOUT, force_refresh: bool = False
+    ) -> Future:
+        """
+        Future-returning variant of :meth:`get_billing_config_async`.
+
+        :return: A future resolving with a `(billing_result, billing_config)` tuple.
+        :rtype: Future
+        """
+        return callback_future(
+            lambda callback: self.get_billing_config_async(callback, force_refresh),
+            timeout,
+            "get_billing_config",
+        )
+
+    def query_purchase_future(
+        self, product_type: str, timeout: Optional[float] = DEFAULT_TIMEOUT
+    ) -> Future:
+        """
+        Future-returning variant of :meth:`query_purchase_async`.
+
+        :return: A future resolving with a `(billing_result, purchases)` tuple.
+        :rtype: Future
+        """
+        return callback_future(
+            lambda callback: self.query_purchase_async(product_type, callback),
+            timeout,
+            OPERATION_QUERY_PURCHASES,
+        )
+
+    def query_purchase_changes_future(
+        self, product_type: str, timeout: Optional[float] = DEFAULT_TIMEOUT
+    ) -> Future:
+        """
+        Future-returning variant of :meth:`query_purchase_changes_async`.
+
+        :return: A future resolving with a `(billing_result, changes)` tuple.
+        :rtype: Future
+        """
+        return callback_future(
+            lambda callback: self.query_purchase_changes_async(product_type, callback),
+            timeout,
+            OPERATION_QUERY_PURCHASES,
+        )
+
+    def query_product_details_future(
+        self,
+        product_type: str,
+        products_ids: List[str],
+        timeout: Optional[float] = DEFAULT_TIMEOUT,
+        force_recheck: bool = False,
+    ) -> Future:
+        """
+        Future-returning variant of :meth:`query_product_details_async`.
+
+        :return: A future resolving with a `(billing_result, product_details_result)` tuple.
+        :rtype: Future
+        """
+        return callback_future(
+            lambda callback: self.query_product_details_async(
+                product_type, products_ids, callback, force_recheck
+            ),
+            timeout,
+            OPERATION_QUERY_PRODUCT_DETAILS,
+        )
+
+    def query_catalog_future(
+        self,
+        catalog: Dict[str, str],
+        timeout: Optional[float] = DEFAULT_TIMEOUT,
+        include_purchases: bool = True,
+        force_recheck: bool = False,
+    ) -> Future:
+        """
+        Future-returning variant of :meth:`query_catalog_async`.
+
+        :return: A future resolving with the merged catalog dictionary.
+        :rtype: Future
+        """
+        return callback_future(
+            lambda callback: self.query_catalog_async(
+                catalog, callback, include_purchases, force_recheck
+            ),
+            timeout,
+            "query_catalog",
+        )
+
+    def consume_future(self, purchase, timeout: Optional[float] = DEFAULT_TIMEOUT) -> Future:
+        """
+        Future-returning variant of :meth:`consume_async`.
+
+        :return: A future resolving with a `(billing_result, purchase_token)` tuple.
+        :rtype: Future
+        """
+        return callback_future(
+            lambda callback: self.consume_async(purchase, callback),
+            timeout,
+            OPERATION_CONSUME,
+        )
+
+    def acknowledge_purchase_future(
+        self, purchase_token: str, timeout: Optional[float] = DEFAULT_TIMEOUT
+    ) -> Future:
+        """
+        Future-returning variant of :meth:`acknowledge_purchase`.
+
+        :return: A future resolving with the `BillingResult`.
+        :rtype: Future
+        """
+        return callback_future(
+            lambda callback: self.acknowledge_purchase(purchase_token, callback),
+            timeout,
+            OPERATION_ACKNOWLEDGE_PURCHASE,
+        )
+
+    def change_subscription_future(
+        self,
+        product_details,
+        old_product_id: Optional[str] = None,
+        offer_token: Optional[str] = None,
+        base_plan_id: Optional[str] = None,
+        replacement_mode: Optional[int] = None,
+        max_age: float = PURCHASE_SNAPSHOT_MAX_AGE,
+        timeout: Optional[float] = DEFAULT_TIMEOUT,
+    ) -> Future:
+        """
+        Future-returning variant of :meth:`change_subscription`. The future fails with
+        the `JavaException` raised when no offer matches the target product or base plan.
+
+        :return: A future resolving with the `BillingResult` of `launchBillingFlow`, or
+            of the failed purchase query.
+        :rtype: Future
+        """
+        return callback_future(
+            lambda callback: self.change_subscription(
+                product_details, callback, old_product_id, offer_token, base_plan_id,
+                replacement_mode, max_age,
+            ),
+            timeout,
+            "change_subscription",
         )
+
+    def listener_stats(self) -> Dict[str, Dict]:
+        """
+        Returns usage statistics of the listener proxy pools, keyed by operation.
+
+        Each entry reports how many proxies were created and reused, how many are
+        currently idle and in use, the peak number in use at once and how many late or
+        duplicate callbacks were dropped. While no more than `max_idle_listeners` calls
+        of an operation are in flight at once, `created` stays flat and `reused` grows
+        with every call.
+
+        :return: A dictionary of pool statistics per operation.
+        :rtype: Dict[str, Dict]
+        """
+        return QueryDict({
+            OPERATION_QUERY_PURCHASES: self.__purchases_response_listeners.stats(),
+            OPERATION_QUERY_PRODUCT_DETAILS: self.__product_details_response_listeners.stats(),
+            OPERATION_CONSUME: self.__consume_response_listeners.stats(),
+            OPERATION_ACKNOWLEDGE_PURCHASE: self.__acknowledge_purchase_response_listeners.stats(),
+        })
+
+    def rate_limit_stats(self) -> Dict[str, Dict]:
+        """
+        Returns the wait-time metrics of the rate limiter, keyed by limited operation.
+
+        Each entry reports the number of calls, how many were delayed, the total,
+        maximum and mean wait in seconds, and the number of calls currently queued.
+
+        :return: A dictionary of rate limiter statistics per operation.
+        :rtype: Dict[str, Dict]
+        """
+        return self.__rate_limiter.stats()
@@ -0,0 +1,721 @@
+"""
+Load and stress harness for purchase update throughput.
+
+The harness drives a :class:`~sjbillingclient.tools.BillingClient` built on a simulated
+Play Billing backend. Producer threads push synthetic `onPurchasesUpdated` events
+through the client's `PurchasesUpdatedListener` and issue `queryPurchasesAsync` calls
+answered through `PurchasesResponseListener`. Every purchase is converted with
+`BillingClient.get_purchase`. The report covers throughput, tail latency, peak RSS,
+callbacks that never arrived and listener proxies left in use.
+
+:func:`run_leak_check` issues thousands of mixed billing calls and checks that the number
+of simulated Java result objects still referenced from Python (each standing for a JNI
+global reference), the listener proxies and the traced memory stay bounded, and that
+`BillingClient.close` releases every Java result object. The check counts Python
+stand-ins: it verifies that the wrapper drops its references, which is what releases the
+JNI global references on a device, without reading the JVM's reference table. It runs
+off-device with stub `jnius` and `android` modules (see `tests/conftest.py`).
+:func:`run_pool_benchmark` compares the cost of creating a listener proxy per call with
+pooling them.
+
+Example:
+    ```python
+    from sjbillingclient.tools.stress import run_stress
+
+    report = run_stress(events=20000, producers=8, purchases_per_event=10)
+    print(report.events_per_second, report.latency.p99, report.lost_callbacks)
+
+    leaks = run_leak_check(calls=5000)
+    assert leaks.ok, leaks
+    ```
+"""
+
+__all__ = ("SimulatedPlayBilling", "SimulatedPurchase", "StressBillingClient", "run_leak_check",
+           "run_pool_benchmark", "run_stress")
+
+import gc
+import json
+import queue
+import random
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+import weakref
+from typing import Optional
+
+from jnius import PythonJavaClass, detach
+
+from sjbillingclient.jclass.billing import BillingResponseCode, FeatureType, ProductType
+from sjbillingclient.jclass.purchase import PurchaseState
+from sjbillingclient.jclass.queryproduct import UnfetchedProductStatusCode
+from sjbillingclient.jinterface.pool import DEFAULT_MAX_IDLE
+from sjbillingclient.tools import OPERATION_CONSUME, BillingClient
+from sjbillingclient.utils import QueryDict
+
+
+# Simulated Java objects handed to Python callbacks, each standing for a JNI global
+# reference held while Python keeps the object alive.
+live_java_objects = weakref.WeakSet()
+
+
+class SimulatedBillingResult:
+    def __init__(self, response_code: int, debug_message: str = "") -> None:
+        self.response_code = response_code
+        self.debug_message = debug_message
+        live_java_objects.add(self)
+
+    def getResponseCode(self) -> int:
+        return self.response_code
+
+    def getDebugMessage(self) -> str:
+        return self.debug_message
+
+
+class SimulatedAccountIdentifiers:
+    def getObfuscatedAccountId(self):
+        return None
+
+    def getObfuscatedProfileId(self):
+        return None
+
+
+class SimulatedPurchase:
+    """
+    A Python stand-in for `com.android.billingclient.api.Purchase`.
+    """
+
+    def __init__(
+        self,
+        purchase_token: str,
+        product_id: str,
+        purchase_state: Optional[int] = None,
+        is_acknowledged: bool = False,
+        is_auto_renewing: bool = False,
+    ) -> None:
+        self.purchase_token = purchase_token
+        self.product_id = product_id
+        self.purchase_state = PurchaseState.PURCHASED if purchase_state is None else purchase_state
+        self.is_acknowledged = is_acknowledged
+        self.is_auto_renewing = is_auto_renewing
+        self.purchase_time = int(time.time() * 1000)
+        self.original_json = json.dumps({
+            "productId": product_id,
+            "purchaseToken": purchase_token,
+            "purchaseState": self.purchase_state,
+            "purchaseTime": self.purchase_time,
+        })
+
+    def getProducts(self):
+        return [self.product_id]
+
+    def getPurchaseToken(self) -> str:
+        return self.purchase_token
+
+    def getPurchaseState(self) -> int:
+        return self.purchase_state
+
+    def getPurchaseTime(self) -> int:
+        return self.purchase_time
+
+    def getOrderId(self) -> str:
+        return "GPA." + self.purchase_token[:16]
+
+    def getQuantity(self) -> int:
+        return 1
+
+    def isAcknowledged(self) -> bool:
+        return self.is_acknowledged
+
+    def isAutoRenewing(self) -> bool:
+        return self.is_auto_renewing
+
+    def getOriginalJson(self) -> str:
+        return self.original_json
+
+    def getSignature(self) -> str:
+        return "simulated-signature"
+
+    def getPackageName(self) -> str:
+        return "org.example.simulated"
+
+    def getDeveloperPayload(self) -> str:
+        return ""
+
+    def getAccountIdentifiers(self):
+        return SimulatedAccountIdentifiers()
+
+    def getPendingPurchaseUpdate(self):
+        return None
+
+
+class SimulatedProductDetails:
+    """
+    A Python stand-in for a one-time `com.android.billingclient.api.ProductDetails`.
+    """
+
+    def __init__(self, product_id: str, product_type: str = ProductType.INAPP) -> None:
+        self.product_id = product_id
+        self.product_type = product_type
+        live_java_objects.add(self)
+
+    def getProductId(self) -> str:
+        return self.product_id
+
+    def getProductType(self) -> str:
+        return self.product_type
+
+    def getName(self) -> str:
+        return self.product_id
+
+    def getTitle(self) -> str:
+        return self.product_id
+
+    def getDescription(self) -> str:
+        return ""
+
+    def getOneTimePurchaseOfferDetailsList(self):
+        return []
+
+    def getSubscriptionOfferDetails(self):
+        return []
+
+
+class SimulatedUnfetchedProduct:
+    def __init__(self, product_id: str, product_type: str, status_code: int) -> None:
+        self.product_id = product_id
+        self.product_type = product_type
+        self.status_code = status_code
+        live_java_objects.add(self)
+
+    def getProductId(self) -> str:
+        return self.product_id
+
+    def getProductType(self) -> str:
+        return self.product_type
+
+    def getStatusCode(self) -> int:
+        return self.status_code
+
+
+class SimulatedQueryProductDetailsResult:
+    def __init__(self, product_details_list, unfetched_product_list=()) -> None:
+        self.product_details_list = product_details_list
+        self.unfetched_product_list = list(unfetched_product_list)
+        live_java_objects.add(self)
+
+    def getProductDetailsList(self):
+        return self.product_details_list
+
+    def getUnfetchedProductList(self):
+        return self.unfetched_product_list
+
+
+class SimulatedBillingConfig:
+    def __init__(self, country_code: str = "US") -> None:
+        self.country_code = country_code
+        live_java_objects.add(self)
+
+    def getCountryCode(self) -> str:
+        return self.country_code
+
+
+class SimulatedPlayBilling:
+    """
+    A Python stand-in for the Java `BillingClient` (and its builder) that answers
+    asynchronous calls from a pool of worker threads after an optional latency.
+
+    The purchases returned by `queryPurchasesAsync` are taken from :attr:`purchases`,
+    unless the query is issued through :meth:`query_purchases_with`;
+    `queryProductDetailsAsync` returns fresh product details objects for the products
+    named in :attr:`product_ids`, and reports the products named in
+    :attr:`unfetched_product_ids` as not found.
+    """
+
+    def __init__(self, workers: int = 4, latency: float = 0.0) -> None:
+        self.purchases = []
+        self.product_ids = []
+        self.unfetched_product_ids = []
+        self.latency = latency
+        self.__listener = None
+        self.__local = threading.local()
+        self.__tasks = queue.Queue()
+        self.__threads = [
+            threading.Thread(target=self._work_loop, daemon=True) for _ in range(workers)
+        ]
+        for thread in self.__threads:
+            thread.start()
+
+    def newBuilder(self, context):
+        return self
+
+    # builder methods
+    def enableExternalOffer(self):
+        return self
+
+    def enableAutoServiceReconnection(self):
+        return self
+
+    def enablePendingPurchases(self, params):
+        return self
+
+    def setListener(self, listener):
+        self.__listener = listener
+        return self
+
+    def build(self):
+        return self
+
+    def _work_loop(self) -> None:
+        try:
+            while True:
+                task = self.__tasks.get()
+                if task is None:
+                    return
+                if self.latency:
+                    time.sleep(self.latency)
+                task()
+                # don't keep the last listener alive while waiting for the next task
+                del task
+        finally:
+            detach()
+
+    def shutdown(self) -> None:
+        for _ in self.__threads:
+            self.__tasks.put(None)
+        for thread in self.__threads:
+            thread.join()
+
+    def emit_purchases_updated(self, purchases, debug_message: str = "") -> None:
+        """
+        Delivers an `onPurchasesUpdated` callback to the registered listener.
+        """
+        self.__tasks.put(
+            lambda: self.__listener.onPurchasesUpdated(
+                SimulatedBillingResult(BillingResponseCode.OK, debug_message), purchases
+            )
+        )
+
+    def query_purchases_with(self, purchases, query) -> None:
+        """
+        Runs `query`, answering the `queryPurchasesAsync` calls it makes on the calling
+        thread with `purchases` instead of :attr:`purchases`, so concurrent callers each
+        get their own.
+        """
+        self.__local.purchases = purchases
+        try:
+            query()
+        finally:
+            del self.__local.purchases
+
+    # BillingClient methods
+    def isReady(self) -> bool:
+        return True
+
+    def startConnection(self, listener) -> None:
+        self.__tasks.put(
+            lambda: listener.onBillingSetupFinished(SimulatedBillingResult(BillingResponseCode.OK))
+        )
+
+    def endConnection(self) -> None:
+        self.__listener = None
+
+    def isFeatureSupported(self, feature):
+        return SimulatedBillingResult(BillingResponseCode.OK)
+
+    def queryPurchasesAsync(self, params, listener) -> None:
+        purchases = list(getattr(self.__local, "purchases", self.purchases))
+        self.__tasks.put(
+            lambda: listener.onQueryPurchasesResponse(
+                SimulatedBillingResult(BillingResponseCode.OK), purchases
+            )
+        )
+
+    def consumeAsync(self, params, listener) -> None:
+        self.__tasks.put(
+            lambda: listener.onConsumeResponse(SimulatedBillingResult(BillingResponseCode.OK), "")
+        )
+
+    def acknowledgePurchase(self, params, listener) -> None:
+        self.__tasks.put(
+            lambda: listener.onAcknowledgePurchaseResponse(SimulatedBillingResult(BillingResponseCode.OK))
+        )
+
+    def queryProductDetailsAsync(self, params, listener) -> None:
+        product_ids = list(self.product_ids)
+        unfetched_product_ids = list(self.unfetched_product_ids)
+        self.__tasks.put(
+            lambda: listener.onProductDetailsResponse(
+                SimulatedBillingResult(BillingResponseCode.OK),
+                SimulatedQueryProductDetailsResult(
+                    [SimulatedProductDetails(product_id) for product_id in product_ids],
+                    [
+                        SimulatedUnfetchedProduct(
+                            product_id, ProductType.INAPP, UnfetchedProductStatusCode.PRODUCT_NOT_FOUND
+                        )
+                        for product_id in unfetched_product_ids
+                    ],
+                ),
+            )
+        )
+
+    def getBillingConfigAsync(self, params, listener) -> None:
+        self.__tasks.put(
+            lambda: listener.onBillingConfigResponse(
+                SimulatedBillingResult(BillingResponseCode.OK), SimulatedBillingConfig()
+            )
+        )
+
+
+class StressBillingClient(BillingClient):
+    """
+    A `BillingClient` running on a :class:`SimulatedPlayBilling` backend.
+
+    :ivar backend: The simulated backend.
+    :type backend: SimulatedPlayBilling
+    """
+
+    def __init__(self, on_purchases_updated, backend: Optional[SimulatedPlayBilling] = None, **kwargs) -> None:
+        self.backend = backend or SimulatedPlayBilling()
+        self._java_client_class = self.backend
+        super().__init__(on_purchases_updated, **kwargs)
+
+
+def _percentile(sorted_values, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def _peak_rss_kb() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def run_stress(
+    events: int = 10000,
+    producers: int = 4,
+    purchases_per_event: int = 5,
+    query_ratio: float = 0.2,
+    backend_workers: int = 4,
+    backend_latency: float = 0.0,
+    drain_timeout: float = 30.0,
+    seed: Optional[int] = None,
+) -> QueryDict:
+    """
+    Pushes synthetic purchase events through a simulated backend and reports how the
+    wrapper coped.
+
+    :param events: The total number of events produced.
+    :param producers: The number of concurrent producer threads.
+    :param purchases_per_event: The number of purchases carried by each event.
+    :param query_ratio: The fraction of events issued as `query_purchase_async` calls
+        rather than `onPurchasesUpdated` callbacks.
+    :param backend_workers: The number of threads delivering backend callbacks.
+    :param backend_latency: Seconds each backend callback is delayed by.
+    :param drain_timeout: Seconds to wait for outstanding callbacks after producing.
+    :param seed: Optional seed making the generated load reproducible.
+    :return: A report with `events`, `delivered`, `lost_callbacks`, `duration`,
+        `events_per_second`, `purchases_per_second` (purchases converted per second),
+        `mismatched_events` (events answered with another event's purchases), `latency`
+        (`p50`, `p95`, `p99`, `max` in milliseconds), `peak_rss_kb`, `leaked_listeners`
+        and `listener_stats`.
+    :rtype: QueryDict
+    """
+    rng = random.Random(seed)
+
+    lock = threading.Lock()
+    issued_at = {}
+    latencies = []
+    delivered = [0]
+    converted_purchases = [0]
+    mismatched = [0]
+    all_delivered = threading.Event()
+
+    def complete(event_id: str, purchases) -> None:
+        converted = [client.get_purchase(purchase) for purchase in purchases]
+        finished_at = time.perf_counter()
+        prefix = event_id + "-"
+        with lock:
+            started_at = issued_at.pop(event_id, None)
+            if started_at is None:
+                return
+            latencies.append(finished_at - started_at)
+            converted_purchases[0] += len(converted)
+            if any(not purchase.purchase_token.startswith(prefix) for purchase in converted):
+                mismatched[0] += 1
+            delivered[0] += 1
+            if delivered[0] == events:
+                all_delivered.set()
+
+    client = StressBillingClient(
+        on_purchases_updated=lambda billing_result, is_null, purchases: complete(
+            billing_result.getDebugMessage(), [] if is_null else purchases
+        ),
+        backend=SimulatedPlayBilling(backend_workers, backend_latency),
+    )
+    backend = client.backend
+
+    def make_purchases(event_id: str):
+        return [
+            SimulatedPurchase(
+                "%s-%d-%032x" % (event_id, index, rng.getrandbits(128)),
+                "product_%d" % rng.randrange(50),
+                is_auto_renewing=bool(index % 2),
+            )
+            for index in range(purchases_per_event)
+        ]
+
+    def produce(producer: int, count: int) -> None:
+        try:
+            for index in range(count):
+                event_id = "%d:%d" % (producer, index)
+                purchases = make_purchases(event_id)
+                with lock:
+                    issued_at[event_id] = time.perf_counter()
+                if rng.random() < query_ratio:
+                    backend.query_purchases_with(
+                        purchases,
+                        lambda event_id=event_id: client.query_purchase_async(
+                            ProductType.INAPP,
+                            lambda billing_result, result: complete(event_id, result),
+                        ),
+                    )
+                else:
+                    backend.emit_purchases_updated(purchases, event_id)
+        finally:
+            detach()
+
+    per_producer = [events // producers + (1 if p < events % producers else 0) for p in range(producers)]
+    threads = [
+        threading.Thread(target=produce, args=(producer, count), daemon=True)
+        for producer, count in enumerate(per_producer)
+    ]
+
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    all_delivered.wait(drain_timeout)
+    duration = time.perf_counter() - started
+    backend.shutdown()
+
+    listener_stats = client.listener_stats()
+    latencies.sort()
+    return QueryDict(
+        events=events,
+        delivered=delivered[0],
+        lost_callbacks=events - delivered[0],
+        duration=duration,
+        events_per_second=delivered[0] / duration if duration else 0.0,
+        purchases_per_second=converted_purchases[0] / duration if duration else 0.0,
+        mismatched_events=mismatched[0],
+        latency=QueryDict(
+            (name, _percentile(latencies, fraction) * 1000)
+            for name, fraction in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99), ("max", 1.0))
+        ),
+        peak_rss_kb=_peak_rss_kb(),
+        leaked_listeners=sum(stats.in_use for stats in listener_stats.values()),
+        listener_stats=listener_stats,
+    )
+
+
+def _count_live_listeners() -> int:
+    gc.collect()
+    return sum(1 for obj in gc.get_objects() if isinstance(obj, PythonJavaClass))
+
+
+def run_leak_check(
+    calls: int = 5000,
+    warm_up_calls: int = 500,
+    catalog_size: int = 20,
+    purchases: int = 10,
+    backend_workers: int = 4,
+    max_live_java_objects: int = 0,
+    max_live_listeners: Optional[int] = None,
+    max_memory_growth_kb: int = 512,
+    drain_timeout: float = 30.0,
+) -> QueryDict:
+    """
+    Issues `calls` mixed billing calls (purchase queries, incremental purchase queries,
+    product details queries, consumes, acknowledgements and billing config requests)
+    against a simulated backend and checks that nothing accumulates.
+
+    Memory is traced with `tracemalloc` from the end of `warm_up_calls` warm-up calls,
+    so caches filled once (product details, purchase snapshots) do not count as growth.
+
+    :param calls: The number of measured calls.
+    :param warm_up_calls: The number of calls issued before measuring.
+    :param catalog_size: The number of products returned by product details queries.
+    :param purchases: The number of purchases returned by purchase queries.
+    :param backend_workers: The number of threads delivering backend callbacks.
+    :param max_live_java_objects: The maximum number of simulated Java objects allowed
+        to stay referenced after the calls. The client converts the results it caches,
+        so none should be.
+    :param max_live_listeners: The maximum number of listener proxies allowed to stay
+        alive after the calls; defaults to the idle proxies kept by the listener pools
+        plus the purchase update and connection state listeners.
+    :param max_memory_growth_kb: The maximum traced memory growth allowed, in KiB.
+    :param drain_timeout: Seconds to wait for outstanding callbacks.
+    :return: A report with `calls`, `lost_callbacks`, `live_java_objects`,
+        `live_java_objects_after_close`, `live_listeners`, `live_listeners_after_close`,
+        `leaked_listeners`, `memory_growth_kb` and whether every bound held (`ok`).
+    :rtype: QueryDict
+    """
+    backend = SimulatedPlayBilling(backend_workers)
+    backend.product_ids = ["product_%d" % index for index in range(catalog_size)]
+    backend.purchases = [
+        SimulatedPurchase("leak-check-%032x" % index, "product_%d" % (index % catalog_size))
+        for index in range(purchases)
+    ]
+    client = StressBillingClient(None, backend=backend)
+
+    condition = threading.Condition()
+    outstanding = [0]
+
+    def done(*args) -> None:
+        with condition:
+            outstanding[0] -= 1
+            condition.notify_all()
+
+    operations = (
+        lambda: client.query_purchase_async(ProductType.INAPP, done),
+        lambda: client.query_purchase_changes_async(ProductType.INAPP, done),
+        lambda: client.query_product_details_async(ProductType.INAPP, backend.product_ids, done),
+        lambda: client.consume_async(backend.purchases[0], done),
+        lambda: client.acknowledge_purchase(backend.purchases[0].purchase_token, done),
+        lambda: client.get_billing_config_async(done, force_refresh=True),
+    )
+
+    def issue(count: int) -> bool:
+        for index in range(count):
+            with condition:
+                outstanding[0] += 1
+            operations[index % len(operations)]()
+            if index % 2 == 0:
+                client.is_feature_supported(FeatureType.SUBSCRIPTIONS)
+        with condition:
+            return condition.wait_for(lambda: outstanding[0] == 0, drain_timeout)
+
+    issue(warm_up_calls)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        drained = issue(calls)
+        gc.collect()
+        memory_growth_kb = (tracemalloc.get_traced_memory()[0] - baseline) / 1024
+    finally:
+        tracemalloc.stop()
+
+    live_objects = len(live_java_objects)
+    live_listeners = _count_live_listeners()
+    listener_stats = client.listener_stats()
+    leaked_listeners = sum(stats.in_use for stats in listener_stats.values())
+    if max_live_listeners is None:
+        max_live_listeners = sum(stats.idle for stats in listener_stats.values()) + 2
+    client.close()
+    backend.shutdown()
+    live_listeners_after_close = _count_live_listeners()
+    live_objects_after_close = len(live_java_objects)
+
+    return QueryDict(
+        calls=calls,
+        lost_callbacks=outstanding[0],
+        live_java_objects=live_objects,
+        live_java_objects_after_close=live_objects_after_close,
+        live_listeners=live_listeners,
+        live_listeners_after_close=live_listeners_after_close,
+        leaked_listeners=leaked_listeners,
+        memory_growth_kb=memory_growth_kb,
+        ok=(
+            drained
+            and live_objects <= max_live_java_objects
+            and live_objects_after_close == 0
+            and live_listeners <= max_live_listeners
+            and live_listeners_after_close == 0
+            and leaked_listeners == 0
+            and memory_growth_kb <= max_memory_growth_kb
+        ),
+    )
+
+
+def run_pool_benchmark(
+    calls: int = 10000,
+    burst: int = 100,
+    interval: float = 0.0,
+    backend_workers: int = 4,
+    drain_timeout: float = 30.0,
+) -> QueryDict:
+    """
+    Compares creating a listener proxy per call with pooling them.
+
+    The same bursts of `consume_async` calls are issued once through a client whose
+    pools keep no idle proxies (`max_idle_listeners=0`, so every call creates one) and
+    once through a client with the default pools. Memory is traced with `tracemalloc`
+    while the calls run. The pooled client reuses up to `DEFAULT_MAX_IDLE` proxies per
+    burst and creates the rest.
+
+    Off-device the listener proxies are Python stand-ins, so the figures cover the
+    Python side only; on a device each created proxy also costs a Java dynamic proxy
+    and a JNI global reference.
+
+    :param calls: The number of calls issued in each mode.
+    :param burst: The number of calls issued before waiting for their callbacks.
+    :param interval: Seconds between the start of two bursts.
+    :param backend_workers: The number of threads delivering backend callbacks.
+    :param drain_timeout: Seconds to wait for the callbacks of a burst.
+    :return: A report with one entry per mode (`per_call`, `pooled`), each with
+        `created`, `reused`, `lost_callbacks`, `mean_call_us` (microseconds spent
+        issuing each call) and `peak_memory_kb`.
+    :rtype: QueryDict
+    """
+
+    def measure(max_idle_listeners: Optional[int]) -> QueryDict:
+        backend = SimulatedPlayBilling(backend_workers)
+        client = StressBillingClient(None, backend=backend, max_idle_listeners=max_idle_listeners)
+        purchase = SimulatedPurchase("pool-benchmark-%032x" % 0, "product_0")
+        condition = threading.Condition()
+        outstanding = [0]
+
+        def done(*args) -> None:
+            with condition:
+                outstanding[0] -= 1
+                condition.notify_all()
+
+        gc.collect()
+        tracemalloc.start()
+        try:
+            baseline = tracemalloc.get_traced_memory()[0]
+            issuing = 0.0
+            for first in range(0, calls, burst):
+                burst_started = time.perf_counter()
+                count = min(burst, calls - first)
+                with condition:
+                    outstanding[0] += count
+                for _ in range(count):
+                    client.consume_async(purchase, done)
+                issuing += time.perf_counter() - burst_started
+                with condition:
+                    condition.wait_for(lambda: outstanding[0] == 0, drain_timeout)
+                time.sleep(max(burst_started + interval - time.perf_counter(), 0.0))
+            peak_memory_kb = (tracemalloc.get_traced_memory()[1] - baseline) / 1024
+        finally:
+            tracemalloc.stop()
+
+        stats = client.listener_stats()[OPERATION_CONSUME]
+        client.close()
+        backend.shutdown()
+        return QueryDict(
+            created=stats.created,
+            reused=stats.reused,
+            lost_callbacks=outstanding[0],
+            mean_call_us=issuing / calls * 1e6 if calls else 0.0,
+            peak_memory_kb=peak_memory_kb,
+        )
+
+    return QueryDict(per_call=measure(0), pooled=measure(DEFAULT_MAX_IDLE))
+
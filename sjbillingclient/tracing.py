@@ -0,0 +1,342 @@
+"""
+Tracing of the purchase funnel.
+
+A :class:`PurchaseTracer` follows a purchase from `launch_billing_flow` through the
+matching `onPurchasesUpdated` callback, server-side verification and
+`acknowledge_purchase` or `consume_async`. Each stage is recorded as a :class:`Span`
+with wall-clock timestamps and the response code it ended with, parented to a root
+`purchase` span covering the whole funnel. Stages are correlated by product ID until
+the purchase token is known, and by purchase token afterwards.
+
+Finished spans are handed to a pluggable exporter, such as :class:`InMemorySpanExporter`
+for tests or :class:`JsonLinesSpanExporter` for offline analysis.
+
+Example:
+    ```python
+    tracer = PurchaseTracer(JsonLinesSpanExporter("purchase_spans.jsonl"))
+    client = BillingClient(on_purchases_updated, tracer=tracer)
+    verifier = VerificationClient(url, tracer=tracer)
+    ```
+"""
+
+__all__ = (
+    "InMemorySpanExporter",
+    "JsonLinesSpanExporter",
+    "PurchaseTracer",
+    "Span",
+    "SPAN_PURCHASE",
+    "STAGE_ACKNOWLEDGE",
+    "STAGE_CONSUME",
+    "STAGE_LAUNCH",
+    "STAGE_PURCHASES_UPDATED",
+    "STAGE_VERIFICATION",
+)
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sjbillingclient.utils import QueryDict
+
+logger = logging.getLogger(__name__)
+
+SPAN_PURCHASE = "purchase"
+STAGE_LAUNCH = "launch_billing_flow"
+STAGE_PURCHASES_UPDATED = "purchases_updated"
+STAGE_VERIFICATION = "verification"
+STAGE_ACKNOWLEDGE = "acknowledge_purchase"
+STAGE_CONSUME = "consume"
+
+# `BillingResponseCode.OK`, kept as a literal so this module does not need pyjnius
+RESPONSE_CODE_OK = 0
+# Stages after which a purchase needs no further client-side processing.
+FINAL_STAGES = (STAGE_ACKNOWLEDGE, STAGE_CONSUME)
+
+
+def _new_id() -> str:
+    return os.urandom(8).hex()
+
+
+class Span:
+    """
+    A timed stage of a purchase.
+
+    :ivar trace_id: The ID shared by every span of the purchase.
+    :ivar span_id: The ID of the span.
+    :ivar parent_id: The span ID of the root `purchase` span, or None for the root.
+    :ivar name: The stage name (e.g. `STAGE_LAUNCH`).
+    :ivar start_time: The `time.time()` timestamp the stage started at.
+    :ivar end_time: The `time.time()` timestamp the stage ended at, or None.
+    :ivar response_code: The response code the stage ended with, if any.
+    :ivar attributes: Correlation data and stage details (`product_ids`,
+        `purchase_token`, ...).
+    """
+
+    def __init__(self, trace_id: str, name: str, parent_id: Optional[str] = None,
+                 start_time: Optional[float] = None, **attributes) -> None:
+        self.trace_id = trace_id
+        self.span_id = _new_id()
+        self.parent_id = parent_id
+        self.name = name
+        self.start_time = time.time() if start_time is None else start_time
+        self.end_time = None
+        self.response_code = None
+        self.attributes = attributes
+
+    @property
+    def duration(self) -> Optional[float]:
+        return None if self.end_time is None else self.end_time - self.start_time
+
+    def end(self, response_code=None, end_time: Optional[float] = None, **attributes) -> "Span":
+        self.end_time = time.time() if end_time is None else end_time
+        self.response_code = response_code
+        self.attributes.update(attributes)
+        return self
+
+    def to_dict(self) -> Dict:
+        return QueryDict(
+            trace_id=self.trace_id,
+            span_id=self.span_id,
+            parent_id=self.parent_id,
+            name=self.name,
+            start_time=self.start_time,
+            end_time=self.end_time,
+            duration=self.duration,
+            response_code=self.response_code,
+            attributes=dict(self.attributes),
+        )
+
+
+class InMemorySpanExporter:
+    """
+    Keeps exported spans in a list, e.g. for tests.
+    """
+
+    def __init__(self) -> None:
+        self.__lock = threading.Lock()
+        self.__spans = []
+
+    def export(self, span: Span) -> None:
+        with self.__lock:
+            self.__spans.append(span)
+
+    @property
+    def spans(self) -> List[Span]:
+        with self.__lock:
+            return list(self.__spans)
+
+    def clear(self) -> None:
+        with self.__lock:
+            self.__spans.clear()
+
+    def close(self) -> None:
+        pass
+
+
+class JsonLinesSpanExporter:
+    """
+    Appends each exported span as one JSON object per line (see :meth:`Span.to_dict`).
+    """
+
+    def __init__(self, path: str) -> None:
+        self.__lock = threading.Lock()
+        self.__file = open(path, "a", encoding="utf-8")
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), default=str)
+        with self.__lock:
+            self.__file.write(line + "\n")
+            self.__file.flush()
+
+    def close(self) -> None:
+        with self.__lock:
+            self.__file.close()
+
+
+class _Trace:
+    def __init__(self, product_ids, purchase_token: Optional[str] = None) -> None:
+        product_ids = list(product_ids)
+        self.root = Span(_new_id(), SPAN_PURCHASE, product_ids=product_ids,
+                         purchase_token=purchase_token)
+        self.product_ids = set(product_ids)
+        self.stages = {}
+        self.last_end_time = self.root.start_time
+
+    def start(self, name: str, start_time: Optional[float] = None, **attributes) -> Span:
+        span = Span(self.root.trace_id, name, self.root.span_id, start_time, **attributes)
+        self.stages[name] = span
+        return span
+
+
+class PurchaseTracer:
+    """
+    Records the stages of purchases as spans and exports them when they end.
+
+    Stage spans are exported as soon as they end; the root `purchase` span is exported
+    when the purchase is acknowledged or consumed, when the billing flow fails or
+    raises, or, marked `incomplete`, when it is evicted to keep at most
+    `max_open_traces` purchases open (e.g. pending purchases that are never completed).
+    """
+
+    def __init__(self, exporter, max_open_traces: int = 256) -> None:
+        """
+        :param exporter: An object with `export(span)` and `close()` methods.
+        :param max_open_traces: The maximum number of unfinished purchases tracked.
+        """
+        self.exporter = exporter
+        self.max_open_traces = max_open_traces
+        self.__lock = threading.Lock()
+        # traces whose billing flow was launched but no purchase token is known yet
+        self.__launched = []
+        self.__by_token = OrderedDict()
+
+    def begin_purchase(self, product_ids: Iterable[str]):
+        """
+        Opens a purchase trace and its launch stage.
+
+        :param product_ids: The IDs of the products the billing flow is launched for.
+        :return: An opaque trace handle passed to :meth:`launch_finished`.
+        """
+        trace = _Trace(product_ids)
+        trace.start(STAGE_LAUNCH, trace.root.start_time)
+        with self.__lock:
+            self.__launched.append(trace)
+            evicted = self.__evict()
+        self.__export(evicted)
+        return trace
+
+    def launch_finished(self, trace, response_code) -> None:
+        """
+        Ends the launch stage. A failed launch also ends the purchase.
+        """
+        spans = [trace.stages[STAGE_LAUNCH].end(response_code)]
+        trace.last_end_time = spans[0].end_time
+        if response_code != RESPONSE_CODE_OK:
+            with self.__lock:
+                if trace in self.__launched:
+                    self.__launched.remove(trace)
+            spans.append(trace.root.end(response_code, spans[0].end_time))
+        self.__export(spans)
+
+    def launch_failed(self, trace, error: BaseException) -> None:
+        """
+        Ends the launch stage and the purchase of a launch that raised `error`.
+        """
+        with self.__lock:
+            if trace in self.__launched:
+                self.__launched.remove(trace)
+        span = trace.stages[STAGE_LAUNCH].end(error=repr(error))
+        trace.last_end_time = span.end_time
+        self.__export([span, trace.root.end(end_time=span.end_time, error=repr(error))])
+
+    def purchases_updated(self, response_code, purchases: Iterable[Tuple[str, List[str]]]) -> None:
+        """
+        Records an `onPurchasesUpdated` callback.
+
+        Each purchase is matched, by product ID, with the oldest launched purchase
+        still waiting for its token; purchases without a launch (e.g. completed pending
+        purchases) open a new trace. A callback without purchases (e.g. the user
+        cancelled) ends the oldest launched purchase with its response code.
+
+        :param response_code: The response code of the `BillingResult`.
+        :param purchases: `(purchase_token, product_ids)` tuples of the purchases.
+        """
+        now = time.time()
+        spans = []
+        purchases = list(purchases)
+        with self.__lock:
+            if not purchases:
+                if self.__launched:
+                    trace = self.__launched.pop(0)
+                    spans.append(
+                        trace.start(STAGE_PURCHASES_UPDATED, trace.last_end_time).end(response_code, now)
+                    )
+                    spans.append(trace.root.end(response_code, now))
+            for purchase_token, product_ids in purchases:
+                trace = self.__by_token.get(purchase_token)
+                if trace is None:
+                    trace = next(
+                        (trace for trace in self.__launched if trace.product_ids.intersection(product_ids)),
+                        None,
+                    )
+                    if trace is not None:
+                        self.__launched.remove(trace)
+                    else:
+                        trace = _Trace(product_ids)
+                    trace.root.attributes["purchase_token"] = purchase_token
+                    self.__by_token[purchase_token] = trace
+                span = trace.start(
+                    STAGE_PURCHASES_UPDATED, trace.last_end_time, purchase_token=purchase_token
+                ).end(response_code, now)
+                trace.last_end_time = now
+                spans.append(span)
+            spans.extend(self.__evict())
+        self.__export(spans)
+
+    def start_stage(self, purchase_token: str, name: str) -> None:
+        """
+        Starts a stage (`STAGE_VERIFICATION`, `STAGE_ACKNOWLEDGE` or `STAGE_CONSUME`) of
+        the purchase with the given token, opening a trace if none is known for it.
+        """
+        with self.__lock:
+            trace = self.__by_token.get(purchase_token)
+            if trace is None:
+                trace = self.__by_token[purchase_token] = _Trace((), purchase_token)
+            trace.start(name, purchase_token=purchase_token)
+            evicted = self.__evict()
+        self.__export(evicted)
+
+    def end_stage(self, purchase_token: str, name: str, response_code=None, **attributes) -> None:
+        """
+        Ends a stage started with :meth:`start_stage`. Ending `STAGE_ACKNOWLEDGE` or
+        `STAGE_CONSUME` with an OK response code also ends the purchase.
+        """
+        spans = []
+        with self.__lock:
+            trace = self.__by_token.get(purchase_token)
+            span = trace.stages.get(name) if trace is not None else None
+            if span is None or span.end_time is not None:
+                return
+            spans.append(span.end(response_code, **attributes))
+            trace.last_end_time = span.end_time
+            if name in FINAL_STAGES and response_code == RESPONSE_CODE_OK:
+                del self.__by_token[purchase_token]
+                spans.append(trace.root.end(response_code, span.end_time))
+        self.__export(spans)
+
+    @property
+    def open_traces(self) -> int:
+        with self.__lock:
+            return len(self.__launched) + len(self.__by_token)
+
+    def close(self) -> None:
+        """
+        Exports the open purchases as `incomplete` and closes the exporter.
+        """
+        with self.__lock:
+            traces = self.__launched + list(self.__by_token.values())
+            self.__launched = []
+            self.__by_token.clear()
+        self.__export([trace.root.end(incomplete=True) for trace in traces])
+        self.exporter.close()
+
+    def __evict(self) -> List[Span]:
+        evicted = []
+        while len(self.__launched) + len(self.__by_token) > self.max_open_traces:
+            if self.__launched:
+                trace = self.__launched.pop(0)
+            else:
+                trace = self.__by_token.popitem(last=False)[1]
+            evicted.append(trace.root.end(incomplete=True))
+        return evicted
+
+    def __export(self, spans: List[Span]) -> None:
+        for span in spans:
+            try:
+                self.exporter.export(span)
+            except Exception:
+                logger.exception("span export failed")
@@ -1,13 +1,39 @@
-__all__ = ("is_jnull", "QueryDict")
+__all__ = ("detach_thread", "is_jnull", "QueryDict")
 
-from jnius import autoclass
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def _jnius():
+    # imported lazily so QueryDict (and the serialization helpers built on it)
+    # can be used off-device, e.g. by a backend decoding uploaded purchases
+    import jnius
+    return jnius, jnius.autoclass("java.util.Objects")
 
 
 def is_jnull(obj):
-    Objects = autoclass("java.util.Objects")
+    if obj is None:
+        return True
+    jnius, Objects = _jnius()
+    # only Java objects can be null references; skip the JNI call for anything else
+    if not isinstance(obj, (jnius.JavaClass, jnius.JavaObject)):
+        return False
     return Objects.isNull(obj)
 
 
+def detach_thread() -> None:
+    """
+    Detaches the calling thread from the JVM. Background threads that may have made
+    JNI calls must call this before they exit, as a thread exiting while attached
+    aborts the process on Android. Does nothing where pyjnius is not installed.
+    """
+    try:
+        import jnius
+    except ImportError:
+        return
+    jnius.detach()
+
+
 class QueryDict(dict):
     '''QueryDict is a dict() that can be queried with dot.
 
@@ -0,0 +1,348 @@
+"""
+Batched server-side verification of purchase tokens.
+
+:class:`VerificationClient` queues purchases handed to :meth:`VerificationClient.verify`
+and sends them to a verification endpoint in batches, flushed when `batch_size`
+purchases are waiting or the oldest one has waited `flush_interval` seconds. Batches
+are sent by at most `max_concurrency` workers, each reusing one persistent HTTP
+connection.
+
+The endpoint receives a JSON ``POST`` body::
+
+    {"purchases": [{"purchase_token": "...", "products": [...], "original_json": "...",
+                    "signature": "...", "package_name": "..."}, ...]}
+
+and must answer with a JSON object holding one result object per token, each with a
+boolean `valid` verdict and any other fields the app needs::
+
+    {"results": {"<purchase_token>": {"valid": true, ...}, ...}}
+
+Each callback receives a dictionary with the `purchase_token`, whether the endpoint
+accepted the purchase (`ok`, true only for a result with ``"valid": true``), the
+endpoint's result for the token (`response`) and an `error` message if the request
+failed, the result is missing or malformed, or the purchase was rejected.
+
+This module does not depend on pyjnius, so it can be exercised against a local
+stand-in server.
+"""
+
+__all__ = ("VerificationClient", )
+
+import http.client
+import json
+import logging
+import queue
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+from sjbillingclient.tracing import STAGE_VERIFICATION
+from sjbillingclient.utils import QueryDict, detach_thread
+
+logger = logging.getLogger(__name__)
+
+VERIFICATION_FIELDS = ("purchase_token", "products", "original_json", "signature", "package_name")
+
+
+class VerificationClient:
+    """
+    Queues purchase tokens and verifies them against a backend endpoint in batches.
+
+    ::
+
+        verifier = VerificationClient("https://example.com/verify")
+        verifier.verify(client.get_purchase(purchase), on_verified)
+        ...
+        verifier.close()
+
+    :ivar requests: The number of HTTP requests sent.
+    :type requests: int
+    :ivar tokens: The number of purchase tokens sent.
+    :type tokens: int
+    :ivar connections: The number of HTTP connections opened.
+    :type connections: int
+    """
+
+    def __init__(
+        self,
+        url: str,
+        batch_size: int = 50,
+        flush_interval: float = 0.25,
+        max_concurrency: int = 1,
+        timeout: float = 10.0,
+        headers: Optional[Dict[str, str]] = None,
+        max_retries: int = 1,
+        tracer=None,
+    ) -> None:
+        """
+        :param url: The `http` or `https` URL of the verification endpoint.
+        :param batch_size: The maximum number of purchases sent in one request; a batch
+            is flushed as soon as it is full.
+        :param flush_interval: The maximum number of seconds a purchase waits for its
+            batch to fill up.
+        :param max_concurrency: The maximum number of requests in flight, and so the
+            number of persistent connections.
+        :param timeout: The socket timeout of a request, in seconds.
+        :param headers: Extra headers sent with every request (e.g. authorization).
+        :param max_retries: How many times a request is retried on a connection error.
+        :param tracer: Optional `PurchaseTracer` recording a verification stage per token.
+        """
+        parsed = urlsplit(url)
+        if parsed.scheme not in ("http", "https"):
+            raise ValueError("url must use http or https")
+
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.requests = 0
+        self.tokens = 0
+        self.connections = 0
+        self.tracer = tracer
+
+        self.__connection_class = (
+            http.client.HTTPSConnection if parsed.scheme == "https" else http.client.HTTPConnection
+        )
+        self.__host = parsed.hostname
+        self.__port = parsed.port
+        self.__path = (parsed.path or "/") + ("?" + parsed.query if parsed.query else "")
+        self.__headers = {"Content-Type": "application/json", "Connection": "keep-alive"}
+        self.__headers.update(headers or {})
+
+        self.__condition = threading.Condition()
+        self.__pending = {}
+        self.__in_flight = {}
+        self.__batches = queue.Queue(maxsize=max_concurrency)
+        self.__threads = []
+        self.__flush_requested = False
+        self.__closed = False
+
+    def verify(self, purchase, callback) -> None:
+        """
+        Queues a purchase for verification.
+
+        A token that is already queued or in flight is not sent again; `callback` is
+        invoked with the result of the existing request instead.
+
+        :param purchase: A purchase dictionary as returned by `BillingClient.get_purchase`,
+            or a purchase token.
+        :param callback: A callable invoked with the verification result dictionary.
+        :return: None
+        :raises RuntimeError: If the client is closed.
+        """
+        if isinstance(purchase, dict):
+            token = purchase["purchase_token"]
+            item = {
+                field: (
+                    purchase[field].decode("utf-8")
+                    if isinstance(purchase[field], bytes)
+                    else purchase[field]
+                )
+                for field in VERIFICATION_FIELDS
+                if field in purchase
+            }
+        else:
+            token = purchase
+            item = {"purchase_token": token}
+
+        with self.__condition:
+            if self.__closed:
+                raise RuntimeError("verification client is closed")
+            entry = self.__in_flight.get(token) or self.__pending.get(token)
+            if entry is not None:
+                entry.callbacks.append(callback)
+                return
+
+            self.__pending[token] = QueryDict(
+                item=item, callbacks=[callback], queued_at=time.monotonic()
+            )
+            if self.tracer is not None:
+                self.tracer.start_stage(token, STAGE_VERIFICATION)
+            if not self.__threads:
+                self.__start()
+            self.__condition.notify_all()
+
+    def flush(self) -> None:
+        """
+        Sends the queued purchases now instead of waiting for the batch to fill up.
+        """
+        with self.__condition:
+            self.__flush_requested = True
+            self.__condition.notify_all()
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """
+        Sends the queued purchases, waits for the requests in flight and stops the
+        worker threads.
+
+        :param timeout: The maximum number of seconds to wait for each thread.
+        :return: None
+        """
+        with self.__condition:
+            self.__closed = True
+            self.__condition.notify_all()
+        for thread in self.__threads:
+            thread.join(timeout)
+
+    def stats(self) -> QueryDict:
+        """
+        Returns the number of requests sent, tokens sent, connections opened and
+        purchases still queued.
+        """
+        with self.__condition:
+            return QueryDict(
+                requests=self.requests,
+                tokens=self.tokens,
+                connections=self.connections,
+                pending=len(self.__pending) + len(self.__in_flight),
+            )
+
+    def __start(self) -> None:
+        self.__threads = [
+            threading.Thread(target=self._dispatch_loop, daemon=True)
+        ] + [
+            threading.Thread(target=self._worker_loop, daemon=True)
+            for _ in range(self.max_concurrency)
+        ]
+        for thread in self.__threads:
+            thread.start()
+
+    def _dispatch_loop(self) -> None:
+        """
+        Cuts the queued purchases into batches and hands them to the workers.
+        """
+        try:
+            while True:
+                with self.__condition:
+                    while True:
+                        if self.__pending:
+                            oldest = next(iter(self.__pending.values())).queued_at
+                            wait = oldest + self.flush_interval - time.monotonic()
+                            if (
+                                len(self.__pending) >= self.batch_size
+                                or wait <= 0
+                                or self.__flush_requested
+                                or self.__closed
+                            ):
+                                break
+                            self.__condition.wait(wait)
+                        elif self.__closed:
+                            break
+                        else:
+                            self.__flush_requested = False
+                            self.__condition.wait()
+
+                    if not self.__pending:
+                        batch = None
+                    else:
+                        tokens = list(self.__pending)[:self.batch_size]
+                        batch = [(token, self.__pending.pop(token)) for token in tokens]
+                        self.__in_flight.update(batch)
+                        if not self.__pending:
+                            self.__flush_requested = False
+
+                if batch is None:
+                    for _ in range(self.max_concurrency):
+                        self.__batches.put(None)
+                    return
+                self.__batches.put(batch)
+        finally:
+            # detach in case anything run on this thread attached it to the JVM
+            detach_thread()
+
+    def _worker_loop(self) -> None:
+        """
+        Sends batches over a persistent connection and delivers the results.
+        """
+        try:
+            connection = None
+            while True:
+                batch = self.__batches.get()
+                if batch is None:
+                    if connection is not None:
+                        connection.close()
+                    return
+                connection, results, error = self._send(connection, batch)
+                self._deliver(batch, results, error)
+        finally:
+            # callbacks run on this thread and may call into Java
+            detach_thread()
+
+    def _send(self, connection, batch):
+        """
+        Posts a batch, reconnecting and retrying on connection errors.
+
+        :return: The connection to reuse (or None), the results by token and an error
+            message if the request failed.
+        """
+        body = json.dumps({"purchases": [entry.item for _, entry in batch]}).encode("utf-8")
+        with self.__condition:
+            self.requests += 1
+            self.tokens += len(batch)
+
+        error = None
+        payload = None
+        for _ in range(self.max_retries + 1):
+            try:
+                if connection is None:
+                    connection = self.__connection_class(self.__host, self.__port, timeout=self.timeout)
+                    with self.__condition:
+                        self.connections += 1
+                connection.request("POST", self.__path, body, self.__headers)
+                response = connection.getresponse()
+                payload = response.read()
+                if response.will_close:
+                    connection.close()
+                    connection = None
+                if response.status != 200:
+                    return connection, {}, "HTTP %d" % response.status
+                break
+            except (OSError, http.client.HTTPException) as e:
+                if connection is not None:
+                    connection.close()
+                connection = None
+                error = str(e) or type(e).__name__
+        else:
+            return connection, {}, error
+
+        # a malformed answer is not a connection error, posting the batch again won't help
+        try:
+            results = json.loads(payload).get("results", {})
+        except (ValueError, AttributeError):
+            return connection, {}, "malformed response"
+        if not isinstance(results, dict):
+            return connection, {}, "malformed response"
+        return connection, results, None
+
+    def _deliver(self, batch, results: Dict, error: Optional[str]) -> None:
+        with self.__condition:
+            for token, _ in batch:
+                self.__in_flight.pop(token, None)
+
+        for token, entry in batch:
+            response = results.get(token)
+            if error is not None:
+                token_error = error
+            elif response is None:
+                token_error = "missing result"
+            elif not isinstance(response, dict) or not isinstance(response.get("valid"), bool):
+                token_error = "malformed result"
+            elif not response["valid"]:
+                token_error = "purchase rejected"
+            else:
+                token_error = None
+            result = QueryDict(
+                purchase_token=token,
+                ok=token_error is None,
+                response=response,
+                error=token_error,
+            )
+            if self.tracer is not None:
+                self.tracer.end_stage(token, STAGE_VERIFICATION, ok=result.ok, error=result.error)
+            for callback in entry.callbacks:
+                try:
+                    callback(result)
+                except Exception:
+                    logger.exception("verification callback failed")
@@ -0,0 +1,136 @@
+"""
+Stub `jnius` and `android` modules so the package, and the simulated backend in
+`sjbillingclient.tools.stress`, can be imported without a device or a JVM.
+
+Java classes declared with `JavaClass` become plain Python classes: static methods
+return chainable builders, static fields resolve to the constants of the Play Billing
+Library and listener proxies are ordinary Python objects.
+"""
+
+import sys
+import types
+
+# Play Billing Library constants, keyed by the simple name of their declaring class
+STATIC_FIELDS = {
+    "BillingClient$BillingResponseCode": dict(
+        SERVICE_DISCONNECTED=-1, FEATURE_NOT_SUPPORTED=-2, OK=0, USER_CANCELED=1,
+        SERVICE_UNAVAILABLE=2, BILLING_UNAVAILABLE=3, ITEM_UNAVAILABLE=4, DEVELOPER_ERROR=5,
+        ERROR=6, ITEM_ALREADY_OWNED=7, ITEM_NOT_OWNED=8, NETWORK_ERROR=12,
+    ),
+    "BillingClient$ProductType": dict(INAPP="inapp", SUBS="subs"),
+    "Purchase$PurchaseState": dict(UNSPECIFIED=0, PURCHASED=1, PENDING=2),
+    "UnfetchedProduct$StatusCode": dict(
+        UNKNOWN=0, INVALID_PRODUCT_ID_FORMAT=1, PRODUCT_NOT_FOUND=2, NO_ELIGIBLE_OFFER=3,
+    ),
+}
+
+
+class JavaException(Exception):
+    pass
+
+
+class JavaClass:
+    pass
+
+
+class JavaObject:
+    pass
+
+
+class _Builder:
+    """
+    Accepts any chain of builder calls and builds itself. Values passed to a `setX`
+    call are returned by `getX`, so results built locally (e.g. a `BillingResult`)
+    can be read back; list getters that were never set return an empty list.
+    """
+
+    def __init__(self) -> None:
+        self._values = {}
+
+    def build(self):
+        return self
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        if name.startswith("get") and name[3:] in self._values:
+            return lambda: self._values[name[3:]]
+        if name.startswith("get") and name.endswith("List"):
+            return lambda: []
+        if name.startswith("set"):
+            return lambda *args: self._values.update({name[3:]: args[0] if len(args) == 1 else args}) or self
+        return lambda *args: self
+
+
+class JavaMethod:
+    def __init__(self, signature) -> None:
+        self.signature = signature
+
+    def __get__(self, obj, owner):
+        return lambda *args: _Builder()
+
+
+JavaStaticMethod = JavaMultipleMethod = JavaMethod
+
+
+class JavaStaticField:
+    def __init__(self, signature) -> None:
+        self.signature = signature
+
+    def __set_name__(self, owner, name) -> None:
+        self.name = name
+
+    def __get__(self, obj, owner):
+        declaring_class = owner.__javaclass__.rsplit("/", 1)[-1]
+        return STATIC_FIELDS.get(declaring_class, {}).get(self.name, self.name)
+
+
+class PythonJavaClass:
+    pass
+
+
+def java_method(signature):
+    return lambda method: method
+
+
+class _JavaList:
+    @staticmethod
+    def of(*items):
+        return list(items)
+
+
+class _Objects:
+    @staticmethod
+    def isNull(obj):
+        return obj is None
+
+
+def autoclass(name):
+    return {"java.util.List": _JavaList, "java.util.Objects": _Objects}[name]
+
+
+def detach() -> None:
+    pass
+
+
+jnius = types.ModuleType("jnius")
+jnius.__dict__.update(
+    JavaException=JavaException,
+    JavaClass=JavaClass,
+    JavaObject=JavaObject,
+    MetaJavaClass=type,
+    JavaMethod=JavaMethod,
+    JavaStaticMethod=JavaStaticMethod,
+    JavaMultipleMethod=JavaMultipleMethod,
+    JavaStaticField=JavaStaticField,
+    PythonJavaClass=PythonJavaClass,
+    java_method=java_method,
+    autoclass=autoclass,
+    detach=detach,
+)
+
+android = types.ModuleType("android")
+android.mActivity = types.SimpleNamespace(context=None)
+
+sys.modules["jnius"] = jnius
+sys.modules["android"] = android
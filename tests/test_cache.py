@@ -0,0 +1,153 @@
+import threading
+import time
+
+import pytest
+
+from sjbillingclient.cache import ConnectionCache, NegativeCache
+
+NOT_FOUND = 2
+UNKNOWN = 0
+
+
+class Requests:
+    """
+    Records the requests a cache issues and lets the test resolve them.
+    """
+
+    def __init__(self) -> None:
+        self.resolvers = []
+
+    def __call__(self, resolve) -> None:
+        self.resolvers.append(resolve)
+
+
+def fail(e):
+    return "error: %s" % e
+
+
+def test_concurrent_callers_share_the_request_in_flight():
+    cache = ConnectionCache()
+    requests = Requests()
+    values = []
+
+    cache.request("config", requests, values.append, fail)
+    cache.request("config", requests, values.append, fail)
+    assert len(requests.resolvers) == 1 and values == []
+
+    requests.resolvers[0]("US")
+    requests.resolvers[0]("ignored")
+
+    assert values == ["US", "US"]
+    cache.request("config", requests, values.append, fail)
+    assert values == ["US", "US", "US"] and len(requests.resolvers) == 1
+
+
+def test_uncached_results_are_requested_again():
+    cache = ConnectionCache()
+    requests = Requests()
+    values = []
+
+    cache.request("config", requests, values.append, fail)
+    requests.resolvers[0](None, cache=False)
+    cache.request("config", requests, values.append, fail)
+
+    assert values == [None] and len(requests.resolvers) == 2
+
+
+def test_clear_during_a_request_delivers_but_does_not_cache_its_result():
+    cache = ConnectionCache()
+    requests = Requests()
+    old, new = [], []
+
+    cache.request("config", requests, old.append, fail)
+    cache.clear()
+    # a caller after clear() does not join the request of the old connection
+    cache.request("config", requests, new.append, fail)
+    assert len(requests.resolvers) == 2
+
+    requests.resolvers[0]("old")
+    assert old == ["old"] and new == [] and "config" not in cache
+
+    requests.resolvers[1]("new")
+    assert new == ["new"] and cache.get("config") == "new"
+
+
+def test_joined_callers_get_an_error_when_starting_the_request_raises():
+    cache = ConnectionCache()
+    joined = []
+
+    def start_request(resolve):
+        cache.request("config", Requests(), joined.append, fail)
+        raise RuntimeError("not connected")
+
+    with pytest.raises(RuntimeError, match="not connected"):
+        cache.request("config", start_request, pytest.fail, fail)
+
+    assert joined == ["error: not connected"]
+    assert "config" not in cache
+    requests = Requests()
+    cache.request("config", requests, joined.append, fail)
+    assert len(requests.resolvers) == 1
+
+
+def test_get_or_compute_computes_once_for_concurrent_callers():
+    cache = ConnectionCache()
+    started = threading.Event()
+    release = threading.Event()
+    computed = []
+
+    def compute():
+        computed.append(1)
+        started.set()
+        release.wait(timeout=2)
+        return True
+
+    results = []
+    first = threading.Thread(target=lambda: results.append(cache.get_or_compute("feature", compute)))
+    first.start()
+    started.wait(timeout=2)
+    second = threading.Thread(target=lambda: results.append(cache.get_or_compute("feature", compute)))
+    second.start()
+    release.set()
+    first.join()
+    second.join()
+
+    assert results == [True, True] and computed == [1]
+
+
+def test_get_or_compute_skips_values_rejected_by_cache_if():
+    cache = ConnectionCache()
+
+    assert cache.get_or_compute("feature", lambda: -1, cache_if=lambda value: value >= 0) == -1
+    assert "feature" not in cache
+    assert cache.get_or_compute("feature", lambda: 0, cache_if=lambda value: value >= 0) == 0
+    assert cache.get("feature") == 0
+
+
+def test_negative_cache_remembers_keys_for_the_ttl_of_their_status_code():
+    cache = NegativeCache({NOT_FOUND: 60}, default_ttl=0.05)
+    cache.add(("inapp", "old"), NOT_FOUND)
+    cache.add(("inapp", "flaky"), UNKNOWN)
+
+    assert ("inapp", "old") in cache and ("inapp", "flaky") in cache
+    assert cache.get(("inapp", "old")).status_code == NOT_FOUND
+    assert 0 < cache.get(("inapp", "old")).expires_in <= 60
+
+    time.sleep(0.1)
+
+    assert ("inapp", "old") in cache
+    assert ("inapp", "flaky") not in cache
+    assert cache.get(("inapp", "flaky")) is None
+    assert [entry.key for entry in cache.entries()] == [("inapp", "old")]
+
+
+def test_negative_cache_discard_and_clear():
+    cache = NegativeCache(default_ttl=60)
+    cache.add(("inapp", "a"), NOT_FOUND)
+    cache.add(("subs", "b"), NOT_FOUND)
+
+    cache.discard(("inapp", "a"))
+    assert ("inapp", "a") not in cache and ("subs", "b") in cache
+
+    cache.clear()
+    assert cache.entries() == []
@@ -0,0 +1,231 @@
+import threading
+
+import pytest
+
+from sjbillingclient.jclass.billing import BillingResponseCode, ProductType
+from sjbillingclient.jclass.queryproduct import UnfetchedProductStatusCode
+from sjbillingclient.tools import MAX_PREPARED_BILLING_FLOWS
+from sjbillingclient.tools.stress import (
+    SimulatedBillingResult,
+    SimulatedPlayBilling,
+    SimulatedProductDetails,
+    SimulatedPurchase,
+    SimulatedQueryProductDetailsResult,
+    StressBillingClient,
+)
+
+
+@pytest.fixture
+def make_client():
+    clients = []
+
+    def make(product_ids=(), unfetched_product_ids=(), **kwargs):
+        backend = SimulatedPlayBilling(workers=1)
+        backend.product_ids = list(product_ids)
+        backend.unfetched_product_ids = list(unfetched_product_ids)
+        client = StressBillingClient(lambda *args: None, backend=backend, **kwargs)
+        clients.append(client)
+        return client
+
+    yield make
+    for client in clients:
+        client.close()
+        client.backend.shutdown()
+
+
+def wait_for(start):
+    """
+    Runs `start(callback)` and returns the arguments of the callback.
+    """
+    done = threading.Event()
+    received = []
+    start(lambda *args: (received.append(args), done.set()))
+    assert done.wait(timeout=2)
+    return received[0] if len(received[0]) > 1 else received[0][0]
+
+
+def test_warm_up_caches_the_catalog_without_preparing_billing_flows(make_client):
+    client = make_client(["coins"])
+    setup = threading.Event()
+    warmed_up = threading.Event()
+    results = []
+
+    client.start_connection(
+        lambda billing_result: setup.set(),
+        warm_up_catalog={ProductType.INAPP: ["coins"]},
+        on_warm_up_finished=lambda response_codes: (results.append(response_codes), warmed_up.set()),
+    )
+
+    assert setup.wait(timeout=2) and warmed_up.wait(timeout=2)
+    assert results[0].product_details == {ProductType.INAPP: BillingResponseCode.OK}
+    assert results[0].purchases == {ProductType.INAPP: BillingResponseCode.OK}
+    assert client.get_cached_product_details("coins").product_id == "coins"
+    assert client.get_cached_purchases(ProductType.INAPP) == []
+    assert not client._BillingClient__prepared_billing_flows
+
+
+def test_setup_callback_runs_when_the_warm_up_fails(make_client, monkeypatch):
+    client = make_client()
+    setup = []
+    done = threading.Event()
+
+    def fail(catalog, on_warm_up_finished):
+        raise ValueError("bad product type")
+
+    monkeypatch.setattr(client, "_prefetch_catalog", fail)
+    client.start_connection(
+        lambda billing_result: (setup.append(billing_result.getResponseCode()), done.set()),
+        warm_up_catalog={ProductType.INAPP: ["coins"]},
+    )
+
+    assert done.wait(timeout=2)
+    assert setup == [BillingResponseCode.OK]
+
+
+def test_catalog_reports_products_skipped_as_unfetched(make_client):
+    client = make_client(["coins"], unfetched_product_ids=["retired"])
+    queries = []
+    query_product_details = client.backend.queryProductDetailsAsync
+    client.backend.queryProductDetailsAsync = lambda *args: (queries.append(args), query_product_details(*args))
+    catalog = {"coins": ProductType.INAPP, "retired": ProductType.INAPP}
+
+    first = wait_for(lambda callback: client.query_catalog_async(catalog, callback, False))
+    assert [product.product_id for product in first.unfetched_products] == ["retired"]
+    assert "expires_in" not in first.unfetched_products[0]
+
+    second = wait_for(lambda callback: client.query_catalog_async({"retired": ProductType.INAPP}, callback, False))
+    assert len(queries) == 1
+    assert second.ok and second.products == {}
+    (skipped,) = second.unfetched_products
+    assert (skipped.product_id, skipped.product_type) == ("retired", ProductType.INAPP)
+    assert skipped.status_code == UnfetchedProductStatusCode.PRODUCT_NOT_FOUND
+    assert skipped.expires_in > 0
+
+    wait_for(lambda callback: client.query_catalog_async(catalog, callback, False, force_recheck=True))
+    assert len(queries) == 2
+
+
+def test_product_details_query_skips_unfetched_products_until_rechecked(make_client):
+    client = make_client(unfetched_product_ids=["retired"])
+    queries = []
+    query_product_details = client.backend.queryProductDetailsAsync
+    client.backend.queryProductDetailsAsync = lambda *args: (queries.append(args), query_product_details(*args))
+
+    wait_for(lambda callback: client.query_product_details_async(ProductType.INAPP, ["retired"], callback))
+    billing_result, _ = wait_for(
+        lambda callback: client.query_product_details_async(ProductType.INAPP, ["retired"], callback)
+    )
+    assert len(queries) == 1
+    assert billing_result.getResponseCode() == BillingResponseCode.OK
+    assert [product.product_id for product in client.get_unfetched_products()] == ["retired"]
+
+    wait_for(lambda callback: client.query_product_details_async(
+        ProductType.INAPP, ["retired"], callback, force_recheck=True
+    ))
+    assert len(queries) == 2
+
+
+class BrokenProductDetails(SimulatedProductDetails):
+    def getOneTimePurchaseOfferDetailsList(self):
+        raise ValueError("no offer details")
+
+
+def test_catalog_reports_products_that_could_not_be_converted(make_client):
+    client = make_client()
+    client.backend.purchases = [SimulatedPurchase("token-0", "coins")]
+
+    def query_product_details(params, listener):
+        threading.Thread(target=listener.onProductDetailsResponse, args=(
+            SimulatedBillingResult(BillingResponseCode.OK),
+            SimulatedQueryProductDetailsResult(
+                [SimulatedProductDetails("coins"), BrokenProductDetails("broken")]
+            ),
+        )).start()
+
+    client.backend.queryProductDetailsAsync = query_product_details
+    catalog = {"coins": ProductType.INAPP, "broken": ProductType.INAPP}
+
+    result = wait_for(lambda callback: client.query_catalog_async(catalog, callback))
+
+    assert not result.ok
+    assert result.response_codes.product_details == {ProductType.INAPP: BillingResponseCode.OK}
+    assert result.response_codes.purchases == {ProductType.INAPP: BillingResponseCode.OK}
+    assert list(result.products) == ["coins"]
+    (error,) = result.errors
+    assert (error.product_id, error.product_type) == ("broken", ProductType.INAPP)
+    assert "no offer details" in error.error
+    assert [purchase.purchase_token for purchase in result.purchases[ProductType.INAPP]] == ["token-0"]
+    # the product that converted is cached, the other one is left out
+    assert client.get_cached_product_details("coins").product_id == "coins"
+    assert client.get_cached_product_details("broken") is None
+
+
+def prepared_flows(client):
+    return client._BillingClient__prepared_billing_flows
+
+
+def test_prepared_billing_flow_is_reused_for_the_same_product_details(make_client):
+    client = make_client()
+    coins = SimulatedProductDetails("coins")
+    launched = []
+    client.backend.launchBillingFlow = lambda activity, params: (
+        launched.append(params), SimulatedBillingResult(BillingResponseCode.OK)
+    )[1]
+
+    params = client.prepare_billing_flow([coins])
+    client.launch_billing_flow([coins])
+
+    assert client.prepare_billing_flow([coins]) is params
+    assert launched == [params]
+    assert client.prepare_billing_flow([coins], offer_token="intro") is not params
+    assert len(prepared_flows(client)) == 2
+
+
+def test_prepared_billing_flow_is_rebuilt_for_other_product_details_objects(make_client):
+    client = make_client()
+    stale = SimulatedProductDetails("coins")
+    params = client.prepare_billing_flow([stale])
+
+    fresh = SimulatedProductDetails("coins")
+    rebuilt = client.prepare_billing_flow([fresh])
+
+    assert rebuilt is not params
+    assert client.prepare_billing_flow([fresh]) is rebuilt
+    assert client.prepare_billing_flow([stale]) is not rebuilt
+    assert len(prepared_flows(client)) == 1
+
+
+def test_invalidate_billing_flows_drops_flows_including_the_products(make_client):
+    client = make_client()
+    coins, gems = SimulatedProductDetails("coins"), SimulatedProductDetails("gems")
+    client.prepare_billing_flow([coins])
+    client.prepare_billing_flow([coins, gems])
+    gems_params = client.prepare_billing_flow([gems])
+
+    client._invalidate_billing_flows(["coins"])
+
+    assert list(prepared_flows(client)) == [(("gems",), None)]
+    assert client.prepare_billing_flow([gems]) is gems_params
+
+
+def test_refreshing_product_details_drops_their_prepared_flows(make_client):
+    client = make_client(["coins"])
+    client.prepare_billing_flow([SimulatedProductDetails("coins")])
+    client.prepare_billing_flow([SimulatedProductDetails("gems")])
+
+    wait_for(lambda callback: client.query_product_details_async(ProductType.INAPP, ["coins"], callback))
+
+    assert list(prepared_flows(client)) == [(("gems",), None)]
+
+
+def test_prepared_billing_flows_are_bounded(make_client):
+    client = make_client()
+    details = [SimulatedProductDetails("product_%d" % index) for index in range(MAX_PREPARED_BILLING_FLOWS + 2)]
+
+    for product_details in details:
+        client.prepare_billing_flow([product_details])
+
+    assert len(prepared_flows(client)) == MAX_PREPARED_BILLING_FLOWS
+    assert (("product_0",), None) not in prepared_flows(client)
+    client.close()
+    assert not prepared_flows(client)
@@ -0,0 +1,119 @@
+import threading
+from concurrent.futures import CancelledError
+
+import pytest
+from jnius import JavaException
+
+from sjbillingclient.futures import BillingTimeoutError, callback_future, gather
+from sjbillingclient.jclass.billing import ProductType
+from sjbillingclient.tools.stress import SimulatedPlayBilling, SimulatedProductDetails, StressBillingClient
+
+
+def test_resolves_with_the_callback_arguments():
+    assert callback_future(lambda callback: callback("result")).result(timeout=1) == "result"
+    assert callback_future(lambda callback: callback(0, "token")).result(timeout=1) == (0, "token")
+
+
+def test_times_out_when_the_callback_never_fires():
+    future = callback_future(lambda callback: None, timeout=0.05, name="consume")
+
+    with pytest.raises(BillingTimeoutError, match="consume did not complete"):
+        future.result(timeout=2)
+
+
+def test_late_callback_after_timeout_is_ignored():
+    callbacks = []
+    future = callback_future(callbacks.append, timeout=0.05)
+    with pytest.raises(BillingTimeoutError):
+        future.result(timeout=2)
+
+    callbacks[0]("late")
+
+    assert isinstance(future.exception(), BillingTimeoutError)
+
+
+def test_late_callback_after_cancellation_is_ignored():
+    callbacks = []
+    future = callback_future(callbacks.append, timeout=None)
+
+    assert future.cancel()
+    callbacks[0]("late")
+
+    assert future.cancelled()
+    with pytest.raises(CancelledError):
+        future.result(timeout=0)
+
+
+def test_exception_raised_by_start_fails_the_future():
+    def start(callback):
+        raise RuntimeError("not connected")
+
+    with pytest.raises(RuntimeError, match="not connected"):
+        callback_future(start).result(timeout=1)
+
+
+def test_gather_returns_results_in_order():
+    callbacks = []
+    futures = [callback_future(callbacks.append) for _ in range(3)]
+    for index, callback in reversed(list(enumerate(callbacks))):
+        threading.Timer(0.01 * (3 - index), callback, (index,)).start()
+
+    assert gather(futures, timeout=2) == [0, 1, 2]
+
+
+def test_gather_raises_the_first_failure_without_waiting():
+    pending = callback_future(lambda callback: None, timeout=None)
+    failed = callback_future(lambda callback: None, timeout=0.05)
+
+    with pytest.raises(BillingTimeoutError):
+        gather([pending, failed], timeout=5)
+    assert not pending.done()
+
+
+def test_gather_raises_for_a_cancelled_future():
+    cancelled = callback_future(lambda callback: None, timeout=None)
+    cancelled.cancel()
+
+    with pytest.raises(CancelledError):
+        gather([callback_future(lambda callback: callback(1)), cancelled], timeout=1)
+
+
+def test_gather_with_return_exceptions_keeps_every_outcome():
+    def fail(callback):
+        raise RuntimeError("not connected")
+
+    cancelled = callback_future(lambda callback: None, timeout=None)
+    cancelled.cancel()
+    futures = [
+        callback_future(lambda callback: callback("ok")),
+        callback_future(fail),
+        callback_future(lambda callback: None, timeout=0.05),
+        cancelled,
+    ]
+
+    results = gather(futures, timeout=2, return_exceptions=True)
+
+    assert results[0] == "ok"
+    assert isinstance(results[1], RuntimeError)
+    assert isinstance(results[2], BillingTimeoutError)
+    assert isinstance(results[3], CancelledError)
+
+
+def test_gather_times_out_overall():
+    with pytest.raises(BillingTimeoutError, match="1 of 2"):
+        gather([callback_future(lambda callback: callback(1)),
+                callback_future(lambda callback: None, timeout=None)], timeout=0.05)
+
+
+def test_change_subscription_future_fails_when_no_offer_matches():
+    backend = SimulatedPlayBilling(workers=1)
+    client = StressBillingClient(lambda *args: None, backend=backend)
+
+    future = client.change_subscription_future(
+        SimulatedProductDetails("gold", ProductType.SUBS), base_plan_id="monthly", timeout=1
+    )
+
+    with pytest.raises(JavaException, match="monthly"):
+        future.result(timeout=2)
+    client.close()
+    backend.shutdown()
@@ -0,0 +1,55 @@
+import threading
+import time
+
+from sjbillingclient.pending import PURCHASE_STATE_PENDING, PendingPurchaseTracker
+from sjbillingclient.utils import QueryDict
+
+
+class SilentBillingClient:
+    """
+    Loses the callback of every purchase query.
+    """
+
+    def __init__(self) -> None:
+        self.queries = 0
+        self.queried = threading.Event()
+
+    def query_purchase_async(self, product_type, on_query_purchases_response) -> None:
+        self.queries += 1
+        if self.queries >= 3:
+            self.queried.set()
+
+
+def test_lost_callback_does_not_stop_polling():
+    client = SilentBillingClient()
+    tracker = PendingPurchaseTracker(
+        client, lambda token, purchase: None, min_interval=0.01, poll_timeout=0.05
+    )
+    tracker.track(QueryDict(purchase_token="token", purchase_state=PURCHASE_STATE_PENDING), "inapp")
+    try:
+        assert client.queried.wait(5)
+        assert tracker.timed_out_polls >= 2
+        assert tracker.tracked_tokens == ["token"]
+    finally:
+        tracker.close()
+
+
+def test_late_response_is_ignored():
+    responses = []
+    client = SilentBillingClient()
+    client.query_purchase_async = lambda product_type, callback: responses.append(callback)
+    changes = []
+    tracker = PendingPurchaseTracker(
+        client, lambda token, purchase: changes.append(token), min_interval=0.0, poll_timeout=0.05
+    )
+    tracker.track(QueryDict(purchase_token="token", purchase_state=PURCHASE_STATE_PENDING), "inapp")
+    try:
+        deadline = time.monotonic() + 5
+        while len(responses) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        # the first query answers after it timed out, reporting the purchase as gone
+        responses[0](QueryDict(getResponseCode=lambda: 0), [])
+        assert changes == []
+        assert tracker.tracked_tokens == ["token"]
+    finally:
+        tracker.close()
@@ -0,0 +1,131 @@
+import pytest
+
+from sjbillingclient.jinterface.pool import DEFAULT_MAX_IDLE, ListenerPool
+
+
+class Listener:
+    def __init__(self, callback) -> None:
+        self.callback = callback
+
+    def onResponse(self, *args):
+        self.callback(*args)
+
+
+def test_callback_runs_once_and_releases_the_listener():
+    pool = ListenerPool(Listener)
+    calls = []
+    listener = pool.acquire(lambda *args: calls.append(args))
+
+    listener.onResponse(0, "ok")
+
+    assert calls == [(0, "ok")]
+    stats = pool.stats()
+    assert (stats.created, stats.idle, stats.in_use, stats.peak_in_use) == (1, 1, 0, 1)
+
+
+def test_released_listeners_are_reused_in_release_order():
+    pool = ListenerPool(Listener)
+    first = pool.acquire(lambda *args: None)
+    second = pool.acquire(lambda *args: None)
+    second.onResponse()
+    first.onResponse()
+
+    assert pool.acquire(lambda *args: None) is second
+    assert pool.acquire(lambda *args: None) is first
+    assert (pool.stats().created, pool.stats().reused) == (2, 2)
+
+
+def test_duplicate_callback_is_dropped():
+    pool = ListenerPool(Listener)
+    calls = []
+    listener = pool.acquire(lambda *args: calls.append(args))
+
+    listener.onResponse(0)
+    listener.onResponse(0)
+
+    assert calls == [(0,)]
+    assert pool.stats().late_callbacks == 1
+
+
+def test_late_callback_after_release_does_not_reach_the_request():
+    pool = ListenerPool(Listener)
+    calls = []
+    listener = pool.acquire(lambda *args: calls.append(args))
+
+    pool.release(listener)
+    listener.onResponse(0)
+
+    assert calls == []
+    assert pool.stats().late_callbacks == 1
+
+
+def test_stale_dispatch_does_not_release_the_next_lease():
+    pool = ListenerPool(Listener)
+    calls = []
+    listener = pool.acquire(lambda *args: calls.append("first"))
+    stale_dispatch = listener.callback
+    pool.release(listener)
+    assert pool.acquire(lambda *args: calls.append("second")) is listener
+
+    stale_dispatch(0)
+    assert calls == [] and pool.stats().in_use == 1
+
+    listener.onResponse(0)
+    assert calls == ["second"] and pool.stats().in_use == 0
+
+
+def test_double_release_keeps_one_idle_entry():
+    pool = ListenerPool(Listener)
+    listener = pool.acquire(lambda *args: None)
+
+    pool.release(listener)
+    pool.release(listener)
+
+    assert pool.stats().idle == 1
+    assert pool.acquire(lambda *args: None) is listener
+    assert pool.acquire(lambda *args: None) is not listener
+
+
+def test_submit_releases_the_listener_when_the_request_raises():
+    pool = ListenerPool(Listener)
+
+    def request(listener):
+        raise RuntimeError("not connected")
+
+    with pytest.raises(RuntimeError):
+        pool.submit(lambda *args: None, request)
+
+    assert (pool.stats().in_use, pool.stats().idle) == (0, 1)
+
+
+def test_idle_listeners_are_bounded_by_default():
+    pool = ListenerPool(Listener)
+    listeners = [pool.acquire(lambda *args: None) for _ in range(DEFAULT_MAX_IDLE * 2)]
+
+    for listener in listeners:
+        listener.onResponse()
+
+    assert pool.stats().idle == DEFAULT_MAX_IDLE
+
+
+def test_unbounded_pool_keeps_every_listener():
+    pool = ListenerPool(Listener, max_idle=None)
+    listeners = [pool.acquire(lambda *args: None) for _ in range(DEFAULT_MAX_IDLE * 2)]
+
+    for listener in listeners:
+        listener.onResponse()
+
+    assert pool.stats().idle == DEFAULT_MAX_IDLE * 2
+
+
+def test_prefill_respects_the_idle_limit_and_clear_drops_idle_listeners():
+    pool = ListenerPool(Listener, max_idle=2)
+    in_flight = pool.acquire(lambda *args: None)
+
+    pool.prefill(5)
+    assert pool.stats().idle == 2
+    pool.clear()
+
+    assert (pool.stats().idle, pool.stats().in_use) == (0, 1)
+    in_flight.onResponse()
+    assert pool.stats().idle == 1
@@ -0,0 +1,119 @@
+import threading
+import time
+
+import pytest
+
+from sjbillingclient.ratelimit import RateLimiter, TokenBucket
+
+
+def test_token_bucket_refills_up_to_its_burst():
+    bucket = TokenBucket(rate=10.0, burst=2)
+    bucket.tokens = 0.0
+
+    bucket.refill(bucket.updated_at + 0.05)
+    assert bucket.tokens == pytest.approx(0.5)
+    assert bucket.delay() == pytest.approx(0.05)
+
+    bucket.refill(bucket.updated_at + 10)
+    assert bucket.tokens == 2
+    assert bucket.delay() == 0.0
+
+
+@pytest.mark.parametrize("rate, burst", [(0, 1), (-1.0, 1), (1.0, 0)])
+def test_token_bucket_rejects_invalid_limits(rate, burst):
+    with pytest.raises(ValueError):
+        TokenBucket(rate, burst)
+
+
+def test_calls_within_the_burst_run_on_the_calling_thread():
+    limiter = RateLimiter({"consume": (1.0, 3)})
+    threads = []
+
+    for _ in range(3):
+        limiter.submit("consume", lambda: threads.append(threading.current_thread()))
+
+    assert threads == [threading.current_thread()] * 3
+    stats = limiter.stats()["consume"]
+    assert (stats.calls, stats.delayed, stats.queued) == (3, 0, 0)
+    limiter.close()
+
+
+def test_unlimited_operations_always_run_immediately():
+    limiter = RateLimiter({"consume": (1.0, 1)})
+    calls = []
+
+    for index in range(5):
+        limiter.submit("query_purchases", lambda index=index: calls.append(index))
+
+    assert calls == [0, 1, 2, 3, 4]
+    assert not limiter.is_limited("query_purchases")
+    assert "query_purchases" not in limiter.stats()
+    limiter.close()
+
+
+def test_excess_calls_are_queued_in_fifo_order_and_waits_recorded():
+    limiter = RateLimiter({"consume": (50.0, 1)})
+    calls = []
+    done = threading.Event()
+
+    for index in range(5):
+        limiter.submit("consume", lambda index=index: calls.append(index))
+    assert calls == [0]
+    assert limiter.stats()["consume"].queued == 4
+
+    limiter.submit("consume", done.set)
+    assert done.wait(timeout=2)
+
+    assert calls == [0, 1, 2, 3, 4]
+    stats = limiter.stats()["consume"]
+    assert (stats.calls, stats.delayed, stats.queued) == (6, 5, 0)
+    assert 0 < stats.max_wait <= stats.total_wait
+    assert stats.mean_wait == pytest.approx(stats.total_wait / 5)
+    limiter.close()
+
+
+def test_a_failing_queued_call_does_not_stop_the_scheduler():
+    limiter = RateLimiter({"consume": (50.0, 1)})
+    done = threading.Event()
+
+    def fail():
+        raise ValueError("boom")
+
+    limiter.submit("consume", lambda: None)
+    limiter.submit("consume", fail)
+    limiter.submit("consume", done.set)
+
+    assert done.wait(timeout=2)
+    limiter.close()
+
+
+def test_close_drops_queued_calls_and_rejects_new_ones():
+    limiter = RateLimiter({"consume": (1.0, 1)})
+    calls = []
+
+    limiter.submit("consume", lambda: calls.append(0))
+    limiter.submit("consume", lambda: calls.append(1))
+    limiter.close()
+    time.sleep(0.05)
+
+    assert calls == [0]
+    assert limiter.stats()["consume"].queued == 0
+    with pytest.raises(RuntimeError):
+        limiter.submit("consume", lambda: calls.append(2))
+
+
+def test_scheduler_thread_detaches_from_the_jvm_on_close(monkeypatch):
+    import jnius
+
+    detached = []
+    monkeypatch.setattr(jnius, "detach", lambda: detached.append(threading.current_thread()))
+    limiter = RateLimiter({"consume": (1.0, 1)})
+    limiter.submit("consume", lambda: None)
+    limiter.submit("consume", lambda: None)
+
+    limiter.close()
+    deadline = time.monotonic() + 2
+    while not detached and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert len(detached) == 1 and detached[0] is not threading.current_thread()
@@ -0,0 +1,137 @@
+import io
+
+import pytest
+
+from sjbillingclient.serialization import (
+    FORMAT_BINARY,
+    FORMAT_JSON,
+    dump_stream,
+    dumps,
+    load_stream,
+    loads,
+)
+from sjbillingclient.tools import BillingClient
+from sjbillingclient.tools.stress import SimulatedPurchase
+
+PRODUCT = {
+    "product_id": "premium",
+    "product_type": "subs",
+    "name": "Premium",
+    "offer_details": [{
+        "base_plan_id": "monthly",
+        "offer_tags": ["intro"],
+        "pricing_phases": [{"price_amount_micros": 4990000, "billing_cycle_count": -1}],
+    }],
+    "rating": 4.5,
+    "custom_field": "kept by name",
+}
+
+
+def purchase_record(token="token-0"):
+    return BillingClient.get_purchase(SimulatedPurchase(token, "coins"))
+
+
+def expected(record):
+    """
+    Returns `record` as it decodes: raw fields come back as bytes.
+    """
+    return dict(
+        record,
+        original_json=record["original_json"].encode("utf-8"),
+        signature=record["signature"].encode("utf-8"),
+    )
+
+
+@pytest.mark.parametrize("format", [FORMAT_BINARY, FORMAT_JSON])
+def test_purchase_round_trip_returns_raw_fields_as_bytes(format):
+    record = purchase_record()
+
+    decoded = loads(dumps(record, format), format)
+
+    assert decoded == expected(record)
+    assert decoded["original_json"] == record["original_json"].encode("utf-8")
+    assert decoded.account_identifiers == record["account_identifiers"]
+
+
+@pytest.mark.parametrize("format", [FORMAT_BINARY, FORMAT_JSON])
+def test_raw_fields_given_as_bytes_are_kept_byte_for_byte(format):
+    original_json = '{"productId":"coins","note":"café"}'.encode("utf-8")
+    record = dict(purchase_record(), original_json=original_json, signature=b"c2lnbmF0dXJl")
+
+    decoded = loads(dumps(record, format), format)
+
+    assert decoded["original_json"] == original_json
+    assert decoded["signature"] == b"c2lnbmF0dXJl"
+
+
+@pytest.mark.parametrize("format", [FORMAT_BINARY, FORMAT_JSON])
+def test_product_details_round_trip(format):
+    assert loads(dumps(PRODUCT, format), format) == PRODUCT
+
+
+def test_binary_encoding_is_smaller_than_json():
+    record = purchase_record()
+
+    assert len(dumps(record, FORMAT_BINARY)) < len(dumps(record, FORMAT_JSON))
+
+
+def test_negative_and_large_integers_round_trip():
+    record = {"quantity": -1, "purchase_time": 2 ** 62, "status_code": 0}
+
+    assert loads(dumps(record)) == record
+
+
+@pytest.mark.parametrize("format", [FORMAT_BINARY, FORMAT_JSON])
+def test_stream_round_trip(format):
+    records = [purchase_record("token-%d" % index) for index in range(3)] + [PRODUCT]
+    fp = io.BytesIO()
+
+    assert dump_stream(iter(records), fp, format) == 4
+    fp.seek(0)
+
+    assert list(load_stream(fp, format)) == [expected(record) for record in records[:3]] + [PRODUCT]
+
+
+def test_empty_binary_stream_yields_nothing():
+    fp = io.BytesIO()
+    dump_stream([], fp)
+
+    assert list(load_stream(io.BytesIO(fp.getvalue()))) == []
+    assert list(load_stream(io.BytesIO())) == []
+
+
+def test_truncated_stream_yields_complete_records_then_raises():
+    fp = io.BytesIO()
+    dump_stream([purchase_record("token-0"), purchase_record("token-1")], fp)
+    data = fp.getvalue()
+
+    records = load_stream(io.BytesIO(data[:-5]))
+
+    assert next(records).purchase_token == "token-0"
+    with pytest.raises(ValueError, match="truncated record"):
+        next(records)
+
+
+@pytest.mark.parametrize("data, message", [
+    (b"SJ", "not an sjbillingclient"),
+    (b"SJB", "truncated header"),
+    (b"XYZ\x01", "not an sjbillingclient"),
+    (b"SJB\x09", "unsupported binary format version"),
+])
+def test_invalid_headers_are_rejected(data, message):
+    with pytest.raises(ValueError, match=message):
+        list(load_stream(io.BytesIO(data)))
+    with pytest.raises(ValueError, match=message):
+        loads(data)
+
+
+def test_truncated_record_is_rejected():
+    data = dumps(purchase_record())
+
+    with pytest.raises(ValueError, match="truncated record"):
+        loads(data[:-3])
+
+
+def test_unknown_format_is_rejected():
+    with pytest.raises(ValueError):
+        dumps(PRODUCT, "xml")
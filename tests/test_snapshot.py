@@ -0,0 +1,79 @@
+from sjbillingclient.jclass.purchase import PurchaseState
+from sjbillingclient.snapshot import PurchaseSnapshotDiffer, purchase_fingerprint
+from sjbillingclient.tools.stress import SimulatedPurchase
+from sjbillingclient.utils import QueryDict
+
+
+class Converter:
+    def __init__(self) -> None:
+        self.converted = []
+
+    def __call__(self, purchase):
+        self.converted.append(purchase.getPurchaseToken())
+        return QueryDict(
+            purchase_token=purchase.getPurchaseToken(),
+            purchase_state=purchase.getPurchaseState(),
+            is_acknowledged=purchase.isAcknowledged(),
+        )
+
+
+def tokens(purchases):
+    return [purchase.purchase_token for purchase in purchases]
+
+
+def test_first_snapshot_reports_every_purchase_as_added():
+    convert = Converter()
+    differ = PurchaseSnapshotDiffer(convert)
+
+    changes = differ.diff([SimulatedPurchase("a", "coins"), SimulatedPurchase("b", "gems")])
+
+    assert tokens(changes.added) == ["a", "b"]
+    assert (changes.changed, changes.removed, changes.unchanged) == ([], [], 0)
+    assert tokens(changes.purchases) == ["a", "b"]
+    assert len(differ) == 2
+
+
+def test_diff_reports_added_changed_and_removed_purchases():
+    convert = Converter()
+    differ = PurchaseSnapshotDiffer(convert)
+    kept = SimulatedPurchase("kept", "coins")
+    pending = SimulatedPurchase("pending", "gems", purchase_state=PurchaseState.PENDING)
+    differ.diff([kept, pending, SimulatedPurchase("gone", "gold")])
+    convert.converted.clear()
+
+    completed = SimulatedPurchase("pending", "gems")
+    completed.original_json = pending.original_json
+    changes = differ.diff([kept, completed, SimulatedPurchase("new", "coins")])
+
+    assert tokens(changes.added) == ["new"]
+    assert tokens(changes.changed) == ["pending"]
+    assert changes.changed[0].purchase_state == PurchaseState.PURCHASED
+    assert tokens(changes.removed) == ["gone"]
+    assert changes.unchanged == 1
+    assert tokens(changes.purchases) == ["kept", "pending", "new"]
+    # the unchanged purchase reuses its previous conversion
+    assert convert.converted == ["pending", "new"]
+    assert tokens(differ.snapshot()) == ["kept", "pending", "new"]
+
+
+def test_acknowledgement_changes_the_fingerprint():
+    purchase = SimulatedPurchase("a", "coins")
+    differ = PurchaseSnapshotDiffer(Converter())
+    differ.diff([purchase])
+    before = purchase_fingerprint(purchase)
+
+    purchase.is_acknowledged = True
+
+    assert purchase_fingerprint(purchase) != before
+    changes = differ.diff([purchase])
+    assert tokens(changes.changed) == ["a"] and changes.changed[0].is_acknowledged
+
+
+def test_clear_starts_over():
+    differ = PurchaseSnapshotDiffer(Converter())
+    differ.diff([SimulatedPurchase("a", "coins")])
+
+    differ.clear()
+
+    assert len(differ) == 0
+    assert tokens(differ.diff([SimulatedPurchase("a", "coins")]).added) == ["a"]
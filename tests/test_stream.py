@@ -0,0 +1,158 @@
+import asyncio
+import threading
+import time
+from queue import Empty
+
+import pytest
+
+from sjbillingclient.stream import OverflowPolicy, PurchaseEventStream, StreamClosedError
+from sjbillingclient.utils import QueryDict
+
+
+def purchase(token):
+    return QueryDict(purchase_token=token)
+
+
+def tokens(events):
+    return [event.purchase.purchase_token if event.purchase else None for event in events]
+
+
+def test_sync_reader_gets_events_in_order_until_closed():
+    stream = PurchaseEventStream()
+    subscription = stream.subscribe()
+    stream.publish(0, "", [purchase("a"), purchase("b")])
+    stream.publish(1, "cancelled", [])
+    subscription.close()
+
+    events = list(subscription)
+
+    assert tokens(events) == ["a", "b", None]
+    assert events[2].response_code == 1 and events[2].debug_message == "cancelled"
+    with pytest.raises(StreamClosedError):
+        subscription.get()
+    assert not stream.has_subscribers()
+
+
+def test_get_times_out_without_events():
+    subscription = PurchaseEventStream().subscribe()
+
+    with pytest.raises(Empty):
+        subscription.get(timeout=0.01)
+
+
+def test_async_reader_is_woken_by_a_publish_from_another_thread():
+    stream = PurchaseEventStream()
+    subscription = stream.subscribe()
+
+    async def read():
+        threading.Timer(0.05, stream.publish, (0, "", [purchase("a")])).start()
+        return await subscription.__anext__()
+
+    assert asyncio.run(read()).purchase.purchase_token == "a"
+
+
+def test_cancelled_async_reader_does_not_break_later_publishes():
+    stream = PurchaseEventStream()
+    cancelled = stream.subscribe()
+    other = stream.subscribe()
+
+    async def cancel_reader():
+        task = asyncio.ensure_future(cancelled.__anext__())
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_reader())
+    # the reader's loop is closed now
+    stream.publish(0, "", [purchase("a")])
+
+    assert tokens([cancelled.get(timeout=1), other.get(timeout=1)]) == ["a", "a"]
+
+
+def test_publish_skips_waiters_of_closed_loops():
+    stream = PurchaseEventStream()
+    subscription = stream.subscribe()
+    loop = asyncio.new_event_loop()
+    reader = loop.create_task(subscription.__anext__())
+    loop.run_until_complete(asyncio.sleep(0.01))
+    loop.close()
+
+    stream.publish(0, "", [purchase("a")])
+
+    assert subscription.get(timeout=1).purchase.purchase_token == "a"
+    del reader
+
+
+def test_block_timeout_drops_the_event():
+    stream = PurchaseEventStream()
+    subscription = stream.subscribe(maxsize=1, overflow=OverflowPolicy.BLOCK, block_timeout=0.05)
+
+    started = time.monotonic()
+    stream.publish(0, "", [purchase("a"), purchase("b"), purchase("c")])
+
+    assert time.monotonic() - started < 1
+    assert tokens([subscription.get(timeout=0)]) == ["a"]
+    assert subscription.dropped == 2
+
+
+def test_block_waits_for_the_reader():
+    stream = PurchaseEventStream()
+    subscription = stream.subscribe(maxsize=1, overflow=OverflowPolicy.BLOCK, block_timeout=5)
+    received = []
+
+    def read():
+        for _ in range(3):
+            received.append(subscription.get(timeout=5))
+            time.sleep(0.01)
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    stream.publish(0, "", [purchase("a"), purchase("b"), purchase("c")])
+    reader.join()
+
+    assert tokens(received) == ["a", "b", "c"]
+    assert subscription.dropped == 0
+
+
+def test_drop_oldest_keeps_the_newest_events():
+    stream = PurchaseEventStream()
+    subscription = stream.subscribe(maxsize=2, overflow=OverflowPolicy.DROP_OLDEST)
+    stream.publish(0, "", [purchase("a"), purchase("b"), purchase("c")])
+    subscription.close()
+
+    assert tokens(subscription) == ["b", "c"]
+    assert subscription.dropped == 1
+
+
+def test_coalesce_replaces_only_when_the_buffer_is_full():
+    stream = PurchaseEventStream()
+    subscription = stream.subscribe(maxsize=2, overflow=OverflowPolicy.COALESCE)
+    stream.publish(0, "first", [purchase("a")])
+    # room left: the update is buffered as well
+    stream.publish(0, "second", [purchase("a")])
+    # full: the oldest event for "a" is replaced in place
+    stream.publish(0, "third", [purchase("a")])
+    subscription.close()
+
+    assert [event.debug_message for event in subscription] == ["third", "second"]
+    assert subscription.dropped == 1
+
+
+def test_coalesce_falls_back_to_drop_oldest_for_new_tokens():
+    stream = PurchaseEventStream()
+    subscription = stream.subscribe(maxsize=2, overflow=OverflowPolicy.COALESCE)
+    stream.publish(0, "", [purchase("a"), purchase("b"), purchase("c")])
+    subscription.close()
+
+    assert tokens(subscription) == ["b", "c"]
+    assert subscription.dropped == 1
+
+
+def test_closed_subscription_discards_events():
+    stream = PurchaseEventStream()
+    subscription = stream.subscribe()
+    subscription.close()
+
+    assert not subscription.put(QueryDict(purchase=purchase("a")))
+    assert len(subscription) == 0
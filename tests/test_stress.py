@@ -0,0 +1,22 @@
+from sjbillingclient.tools.stress import run_leak_check, run_stress
+
+
+def test_leak_check_bounds():
+    report = run_leak_check(calls=3000, warm_up_calls=300)
+
+    assert report.lost_callbacks == 0
+    assert report.leaked_listeners == 0
+    assert report.live_java_objects == 0
+    assert report.live_java_objects_after_close == 0
+    assert report.live_listeners_after_close == 0
+    assert report.memory_growth_kb <= 512
+    assert report.ok, report
+
+
+def test_stress_delivers_every_event():
+    report = run_stress(events=2000, producers=4, purchases_per_event=3, query_ratio=0.5, seed=1)
+
+    assert report.lost_callbacks == 0
+    assert report.delivered == 2000
+    assert report.mismatched_events == 0
+    assert report.leaked_listeners == 0
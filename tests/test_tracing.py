@@ -0,0 +1,52 @@
+import pytest
+
+from sjbillingclient.tools.stress import SimulatedPlayBilling, SimulatedProductDetails, StressBillingClient
+from sjbillingclient.tracing import (
+    SPAN_PURCHASE,
+    STAGE_LAUNCH,
+    STAGE_PURCHASES_UPDATED,
+    InMemorySpanExporter,
+    PurchaseTracer,
+)
+
+USER_CANCELED = 1
+
+
+def test_a_launch_that_raises_ends_its_trace():
+    exporter = InMemorySpanExporter()
+    tracer = PurchaseTracer(exporter)
+    failed = tracer.begin_purchase(["coins"])
+    cancelled = tracer.begin_purchase(["gems"])
+
+    tracer.launch_failed(failed, RuntimeError("activity destroyed"))
+    tracer.purchases_updated(USER_CANCELED, [])
+
+    assert tracer.open_traces == 0
+    failed_spans = [span for span in exporter.spans if span.trace_id == failed.root.trace_id]
+    assert [span.name for span in failed_spans] == [STAGE_LAUNCH, SPAN_PURCHASE]
+    assert all("activity destroyed" in span.attributes["error"] for span in failed_spans)
+    # the cancel belongs to the launch that did not raise
+    cancelled_spans = [span for span in exporter.spans if span.trace_id == cancelled.root.trace_id]
+    assert [(span.name, span.response_code) for span in cancelled_spans] == [
+        (STAGE_PURCHASES_UPDATED, USER_CANCELED),
+        (SPAN_PURCHASE, USER_CANCELED),
+    ]
+
+
+def test_billing_client_ends_the_trace_when_the_launch_raises():
+    def launch_billing_flow(activity, params):
+        raise RuntimeError("activity destroyed")
+
+    backend = SimulatedPlayBilling(workers=1)
+    backend.launchBillingFlow = launch_billing_flow
+    exporter = InMemorySpanExporter()
+    tracer = PurchaseTracer(exporter)
+    client = StressBillingClient(lambda *args: None, backend=backend, tracer=tracer)
+
+    with pytest.raises(RuntimeError):
+        client.launch_billing_flow([SimulatedProductDetails("coins")])
+
+    assert tracer.open_traces == 0
+    assert [span.name for span in exporter.spans] == [STAGE_LAUNCH, SPAN_PURCHASE]
+    client.close()
+    backend.shutdown()
@@ -0,0 +1,193 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from sjbillingclient.verification import VerificationClient
+
+
+class VerificationServer(ThreadingHTTPServer):
+    """
+    A local verification endpoint answering each batch with `respond(tokens)`.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, respond) -> None:
+        super().__init__(("127.0.0.1", 0), VerificationHandler)
+        self.respond = respond
+        self.batches = []
+        self.client_ports = set()
+
+    @property
+    def url(self) -> str:
+        return "http://127.0.0.1:%d/verify" % self.server_address[1]
+
+
+class VerificationHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        tokens = [purchase["purchase_token"] for purchase in body["purchases"]]
+        self.server.batches.append(body["purchases"])
+        self.server.client_ports.add(self.client_address[1])
+        payload = self.server.respond(tokens)
+        if not isinstance(payload, bytes):
+            payload = json.dumps(payload).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def all_valid(tokens):
+    return {"results": {token: {"valid": True} for token in tokens}}
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def start(respond=all_valid):
+        server = VerificationServer(respond)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+class Results:
+    def __init__(self, expected: int) -> None:
+        self.expected = expected
+        self.results = []
+        self.condition = threading.Condition()
+
+    def __call__(self, result) -> None:
+        with self.condition:
+            self.results.append(result)
+            self.condition.notify_all()
+
+    def wait(self, timeout: float = 5):
+        with self.condition:
+            assert self.condition.wait_for(lambda: len(self.results) >= self.expected, timeout)
+        return {result.purchase_token: result for result in self.results}
+
+
+def test_full_batches_are_sent_without_waiting(serve):
+    server = serve()
+    client = VerificationClient(server.url, batch_size=3, flush_interval=60)
+    results = Results(6)
+
+    for index in range(6):
+        client.verify("token-%d" % index, results)
+
+    assert all(result.ok for result in results.wait().values())
+    assert [len(batch) for batch in server.batches] == [3, 3]
+    client.close()
+
+
+def test_partial_batch_is_sent_after_the_flush_interval(serve):
+    server = serve()
+    client = VerificationClient(server.url, batch_size=50, flush_interval=0.1)
+    results = Results(2)
+    started = time.monotonic()
+
+    client.verify("token-0", results)
+    client.verify("token-1", results)
+
+    results.wait()
+    assert time.monotonic() - started >= 0.1
+    assert [len(batch) for batch in server.batches] == [2]
+    client.close()
+
+
+def test_batches_share_one_persistent_connection(serve):
+    server = serve()
+    client = VerificationClient(server.url, batch_size=1, flush_interval=0)
+    results = Results(5)
+
+    for index in range(5):
+        client.verify("token-%d" % index, results)
+    results.wait()
+    client.close()
+
+    assert client.stats().requests == 5
+    assert client.stats().connections == 1
+    assert len(server.client_ports) == 1
+
+
+def test_duplicate_tokens_share_one_request(serve):
+    server = serve()
+    client = VerificationClient(server.url, batch_size=50, flush_interval=60)
+    results = Results(2)
+    purchase = {"purchase_token": "token-0", "products": ["coins"], "original_json": b"{}",
+                "signature": b"sig"}
+
+    client.verify(purchase, results)
+    client.verify("token-0", results)
+    client.flush()
+    results.wait()
+    client.close()
+
+    assert len(results.results) == 2 and all(result.ok for result in results.results)
+    assert server.batches == [[{"purchase_token": "token-0", "products": ["coins"],
+                                "original_json": "{}", "signature": "sig"}]]
+    assert client.stats().tokens == 1
+
+
+def test_each_token_gets_its_own_result(serve):
+    def respond(tokens):
+        return {"results": {
+            "valid": {"valid": True, "expires": 1},
+            "rejected": {"valid": False},
+            "malformed": {"valid": "yes"},
+        }}
+
+    server = serve(respond)
+    client = VerificationClient(server.url, batch_size=4, flush_interval=60)
+    results = Results(4)
+
+    for token in ("valid", "rejected", "malformed", "missing"):
+        client.verify(token, results)
+    by_token = results.wait()
+    client.close()
+
+    assert by_token["valid"].ok and by_token["valid"].response == {"valid": True, "expires": 1}
+    assert by_token["valid"].error is None
+    assert [(by_token[token].ok, by_token[token].error) for token in ("rejected", "malformed", "missing")] == [
+        (False, "purchase rejected"),
+        (False, "malformed result"),
+        (False, "missing result"),
+    ]
+
+
+def test_malformed_response_fails_the_whole_batch(serve):
+    server = serve(lambda tokens: b"not json")
+    client = VerificationClient(server.url, batch_size=2, flush_interval=60)
+    results = Results(2)
+
+    client.verify("token-0", results)
+    client.verify("token-1", results)
+    by_token = results.wait()
+    client.close()
+
+    assert [(result.ok, result.error) for result in by_token.values()] == [(False, "malformed response")] * 2
+
+
+def test_verify_after_close_raises(serve):
+    client = VerificationClient(serve().url)
+    client.close()
+
+    with pytest.raises(RuntimeError):
+        client.verify("token-0", lambda result: None)